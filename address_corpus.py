@@ -0,0 +1,302 @@
+"""
+負荷試験用の酒屋データ（合成データ）を作成するスクリプト
+
+市区町村マッピング.json の旧市区町村名・現在の市区町村名と、町域名・丁目の語彙から
+実際の入力データに近い行（SAKAYA_DEALER_CODE, SAKAYA_DEALER_NAME, PREFECTURE, ADDRESS）を作成する。
+
+- 全角数字・漢数字・空白・建物名・無効な都道府県名（"不明"）・都道府県名の欠損・
+  住所として解釈できない文字列を、指定した割合で混ぜる
+- 既出の住所を指定した割合で別の店舗として繰り返す（直近の住所から選ぶため使用メモリは一定）
+- 行は1行ずつ作成してCSV・Parquetに書き出すため、数百万行でも使用メモリは一定
+- 同じシード・同じ設定なら同じ行を作成する
+
+使い方:
+    python address_corpus.py --rows 1000000 -o sample_restaurants.csv
+    python address_corpus.py --rows 5000000 --duplicate-rate 0.3 --seed 1 -o corpus.parquet
+"""
+
+import csv
+import random
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from address_utils import VALID_PREFECTURES, extract_prefecture
+from city_mapping import MAPPING_FILE, load_mapping_file
+
+COLUMNS = ['SAKAYA_DEALER_CODE', 'SAKAYA_DEALER_NAME', 'PREFECTURE', 'ADDRESS']
+
+# 各種の表記揺れ・不正データを混ぜる割合（行ごとに独立に判定する）
+DEFAULT_PROPORTIONS = {
+    # 現在の市区町村名の代わりに合併前の旧市区町村名を使う
+    'old_city': 0.3,
+    # 数字を全角にする
+    'fullwidth': 0.15,
+    # 丁目を漢数字にする
+    'kanji': 0.15,
+    # 市区町村名・町域名の間に空白を入れる
+    'space': 0.1,
+    # 番地の後に建物名を付ける
+    'building': 0.2,
+    # PREFECTURE を "不明" にする（住所に都道府県名は含まない）
+    'invalid_prefecture': 0.03,
+    # PREFECTURE を空にし、住所に都道府県名を含める
+    'missing_prefecture': 0.05,
+    # 住所として解釈できない文字列にする
+    'garbage': 0.02
+}
+
+# 既出の住所を別の店舗として繰り返す割合
+DEFAULT_DUPLICATE_RATE = 0.2
+
+# 重複させる住所を選ぶ直近の住所の件数
+DUPLICATE_POOL_SIZE = 10000
+
+# Parquet に書き出す行グループの大きさ
+PARQUET_CHUNK_SIZE = 100000
+
+TOWN_NAMES = [
+    '本町', '栄町', '中央', '幸町', '緑町', '旭町', '新町', '東町', '西町', '南町', '北町', '元町',
+    '大手町', '駅前', '松原', '桜台', '若葉', '城山', '泉町', '港町', '宮前', '柳町', '寿町', '錦町'
+]
+TOWN_SUFFIXES = ['', '', '', '東', '西', '南', '北', '新']
+BUILDING_NAMES = ['ビル', '第一ビル', 'マンション', 'ハイツ', 'プラザ', '会館', 'センタービル']
+STORE_TYPES = ['酒店', '酒販', 'リカー', '商店', '酒造', '酒舗']
+GARBAGE_ADDRESSES = ['場所不明', 'どこかのビル', '駅前のビル', '改装中', '未定', '-', '住所未登録']
+INVALID_PREFECTURE = '不明'
+
+KANJI_NUMERALS = '一二三四五六七八九'
+# 半角数字 → 全角数字（address_utils.FULLWIDTH_DIGITS の逆向き）
+TO_FULLWIDTH_DIGITS = str.maketrans('0123456789-', '０１２３４５６７８９－')
+# 丁目の最大値（10以上は十二丁目のような位取りの漢数字になる）
+MAX_CHOME = 15
+
+
+def kanji_numeral(number: int) -> str:
+    """1～99の数を位取りの漢数字にする（3 → 三、12 → 十二、23 → 二十三、30 → 三十）"""
+    tens, ones = divmod(number, 10)
+    text = ''
+    if tens:
+        text = (KANJI_NUMERALS[tens - 1] if tens > 1 else '') + '十'
+    if ones:
+        text += KANJI_NUMERALS[ones - 1]
+    return text
+
+
+def format_block_number(rng: random.Random, chome: int, banchi: int, go: int, kanji: bool = False) -> str:
+    """
+    丁目・番地・号を入力データにある書き方のいずれかで表す
+
+    kanji=True の場合は丁目と、番・番地・号の前の数字を漢数字にする
+    （十二丁目・二十三番地のような位取りの漢数字を含む。各数は1～99）
+    """
+    chome_text = kanji_numeral(chome) if kanji else str(chome)
+    banchi_text = kanji_numeral(banchi) if kanji else str(banchi)
+    style = rng.randrange(4)
+    if style == 0:
+        go_text = kanji_numeral(go) if kanji else str(go)
+        return f"{chome_text}丁目{banchi_text}番{go_text}号"
+    if style == 1:
+        return f"{chome_text}丁目{banchi_text}番地{go}"
+    if style == 2 and not kanji:
+        return f"{chome}-{banchi}-{go}"
+    return f"{chome_text}丁目{banchi}-{go}"
+
+
+def load_city_names(mapping_file: str = MAPPING_FILE) -> Tuple[List[str], List[str]]:
+    """
+    市区町村マッピングから旧市区町村名と現在の市区町村名（都道府県名を含む）を読み込む
+
+    Returns:
+    --------
+    Tuple[List[str], List[str]]
+        (旧市区町村名のリスト, 合併先の市区町村名のリスト)
+    """
+    mapping = load_mapping_file(mapping_file)
+    old_cities = sorted(city for city in mapping if extract_prefecture(city)[0])
+    new_cities = sorted({
+        change['new_city'] for changes in mapping.values() for change in changes
+        if extract_prefecture(change['new_city'])[0]
+    })
+    return old_cities, new_cities
+
+
+def generate_rows(
+    rows: int,
+    seed: int = 0,
+    proportions: Optional[Dict[str, float]] = None,
+    duplicate_rate: float = DEFAULT_DUPLICATE_RATE,
+    mapping_file: str = MAPPING_FILE
+) -> Iterator[Dict[str, str]]:
+    """
+    酒屋データの行を1行ずつ作成する
+
+    Parameters:
+    -----------
+    rows : int
+        行数
+    seed : int
+        乱数のシード
+    proportions : Dict[str, float], optional
+        DEFAULT_PROPORTIONS のうち変更する割合
+    duplicate_rate : float
+        既出の住所（都道府県・住所の組）を別の店舗として繰り返す割合
+    mapping_file : str
+        市区町村マッピングのJSONファイルパス
+
+    Yields:
+    -------
+    Dict[str, str]
+        COLUMNS をキーとする行
+    """
+    settings = dict(DEFAULT_PROPORTIONS)
+    if proportions:
+        unknown = set(proportions) - set(settings)
+        if unknown:
+            raise ValueError(f"指定できない割合です: {', '.join(sorted(unknown))}")
+        settings.update(proportions)
+
+    rng = random.Random(seed)
+    old_cities, new_cities = load_city_names(mapping_file)
+    recent = deque(maxlen=DUPLICATE_POOL_SIZE)
+
+    for number in range(1, rows + 1):
+        if recent and rng.random() < duplicate_rate:
+            prefecture, address, town = rng.choice(recent)
+        else:
+            prefecture, address, town = _generate_address(rng, settings, old_cities, new_cities)
+            recent.append((prefecture, address, town))
+        yield {
+            'SAKAYA_DEALER_CODE': f"S{number:08d}",
+            'SAKAYA_DEALER_NAME': f"{town}{rng.choice(STORE_TYPES)}",
+            'PREFECTURE': prefecture,
+            'ADDRESS': address
+        }
+
+
+def _generate_address(
+    rng: random.Random,
+    settings: Dict[str, float],
+    old_cities: List[str],
+    new_cities: List[str]
+) -> Tuple[str, str, str]:
+    """(PREFECTURE, ADDRESS, 店舗名に使う町域名) を1件作成する"""
+    if rng.random() < settings['garbage']:
+        prefecture = rng.choice(['', INVALID_PREFECTURE, rng.choice(sorted(VALID_PREFECTURES))])
+        return prefecture, rng.choice(GARBAGE_ADDRESSES), '駅前'
+
+    full_city = rng.choice(old_cities if rng.random() < settings['old_city'] else new_cities)
+    prefecture, city = extract_prefecture(full_city)
+    town = rng.choice(TOWN_NAMES) + rng.choice(TOWN_SUFFIXES)
+    kanji = rng.random() < settings['kanji']
+    numbers = format_block_number(rng, rng.randint(1, MAX_CHOME), rng.randint(1, 40), rng.randint(1, 30), kanji)
+    if rng.random() < settings['fullwidth']:
+        numbers = numbers.translate(TO_FULLWIDTH_DIGITS)
+
+    separator = ' ' if rng.random() < settings['space'] else ''
+    address = f"{city}{separator}{town}{numbers}"
+    if rng.random() < settings['building']:
+        address += f" {town}{rng.choice(BUILDING_NAMES)}{rng.randint(1, 9)}F"
+
+    roll = rng.random()
+    if roll < settings['invalid_prefecture']:
+        return INVALID_PREFECTURE, address, town
+    if roll < settings['invalid_prefecture'] + settings['missing_prefecture']:
+        return '', f"{prefecture}{separator}{address}", town
+    return prefecture, address, town
+
+
+def write_csv(rows: Iterator[Dict[str, str]], output_file: str) -> int:
+    """
+    行をCSV（UTF-8）に1行ずつ書き出す
+
+    Returns:
+    --------
+    int
+        書き出した行数
+    """
+    count = 0
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_parquet(rows: Iterator[Dict[str, str]], output_file: str, chunk_size: int = PARQUET_CHUNK_SIZE) -> int:
+    """
+    行を chunk_size 行ずつの行グループとしてParquetに書き出す（pyarrow が必要）
+
+    Returns:
+    --------
+    int
+        書き出した行数
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquetに書き出すには pyarrow をインストールしてください") from e
+
+    schema = pa.schema([(column, pa.string()) for column in COLUMNS])
+    count = 0
+    with pq.ParquetWriter(output_file, schema) as writer:
+        chunk = {column: [] for column in COLUMNS}
+        for row in rows:
+            for column in COLUMNS:
+                chunk[column].append(row[column])
+            count += 1
+            if count % chunk_size == 0:
+                writer.write_table(pa.table(chunk, schema=schema))
+                chunk = {column: [] for column in COLUMNS}
+        if chunk[COLUMNS[0]]:
+            writer.write_table(pa.table(chunk, schema=schema))
+    return count
+
+
+def write_corpus(output_file: str, rows: int, **options) -> int:
+    """
+    酒屋データを作成してファイルに書き出す（拡張子が .parquet の場合はParquet、それ以外はCSV）
+
+    options は generate_rows に渡す。
+
+    Returns:
+    --------
+    int
+        書き出した行数
+    """
+    generated = generate_rows(rows, **options)
+    if output_file.lower().endswith('.parquet'):
+        return write_parquet(generated, output_file)
+    return write_csv(generated, output_file)
+
+
+def main():
+    """酒屋データを作成するコマンド"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='負荷試験用の酒屋データ（合成データ）を作成')
+    parser.add_argument('--rows', type=int, default=100000, help='行数')
+    parser.add_argument('-o', '--output', default='sample_restaurants.csv',
+                        help='出力ファイル（.csv または .parquet）')
+    parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+    parser.add_argument('--duplicate-rate', type=float, default=DEFAULT_DUPLICATE_RATE,
+                        help='既出の住所を繰り返す割合')
+    for name, value in DEFAULT_PROPORTIONS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=value,
+                            help=f"{name} の割合（既定 {value}）")
+    args = parser.parse_args()
+
+    count = write_corpus(
+        args.output,
+        args.rows,
+        seed=args.seed,
+        proportions={name: getattr(args, name) for name in DEFAULT_PROPORTIONS},
+        duplicate_rate=args.duplicate_rate
+    )
+    print(f"酒屋データを作成しました: {args.output}（{count}件）")
+
+
+if __name__ == '__main__':
+    main()
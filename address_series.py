@@ -0,0 +1,235 @@
+"""
+pandas.Series 単位の住所処理
+"""
+
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from address_utils import (
+    FULLWIDTH_DIGITS,
+    KANJI_NUMBER_PATTERN,
+    VALID_PREFECTURES,
+    extract_full_city_name,
+    replace_kanji_number
+)
+from city_index import get_city_index
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# datetime64[D] の 0（1970-01-01）に対応する日付の通し番号
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def add_prefecture(prefectures: pd.Series, addresses: pd.Series) -> pd.Series:
+    """
+    有効な都道府県名を住所の先頭に付ける
+
+    次の条件をすべて満たす行だけ「都道府県名 + 住所」とし、それ以外は住所のままとする。
+    - 都道府県・住所が欠損していない
+    - 有効な都道府県名（"不明"等は無効）
+    - 住所が既に都道府県名で始まっていない
+
+    Parameters:
+    -----------
+    prefectures : pd.Series
+        都道府県名の列
+    addresses : pd.Series
+        住所の列
+
+    Returns:
+    --------
+    pd.Series
+        都道府県名を付けた住所の列（住所が欠損している行は欠損のまま）
+    """
+    # 文字列型の列でも連結できるよう、住所と同じ object 型にそろえる
+    prefecture_text = prefectures.astype(str).astype(object)
+    address_text = addresses.astype(object).where(addresses.isna(), addresses.astype(str))
+
+    candidates = (
+        prefectures.notna()
+        & addresses.notna()
+        & prefecture_text.str.strip().isin(VALID_PREFECTURES)
+    )
+    # 住所が都道府県名で始まっているかを、都道府県名の長さ（3文字・4文字）ごとに
+    # 住所の先頭をその長さで切り出して列単位で比較する
+    lengths = prefecture_text.str.len()
+    starts_with = pd.Series(False, index=addresses.index)
+    for length in lengths[candidates].unique():
+        rows = candidates & (lengths == length)
+        starts_with[rows] = address_text[rows].str[:int(length)] == prefecture_text[rows]
+    prefixed = candidates & ~starts_with
+
+    result = address_text.copy()
+    result[prefixed] = prefecture_text[prefixed] + address_text[prefixed]
+    return result
+
+
+def prefecture_series(addresses: pd.Series) -> pd.Series:
+    """
+    住所の列から先頭の都道府県名を取り出す（extract_prefecture の都道府県名の列版）
+
+    都道府県名は3文字または4文字のため、先頭3文字・4文字が有効な都道府県名かを列単位で判定する。
+
+    Parameters:
+    -----------
+    addresses : pd.Series
+        住所の列
+
+    Returns:
+    --------
+    pd.Series
+        都道府県名の列（都道府県名で始まらない住所・欠損値は空文字列）
+    """
+    text = addresses.astype(object).where(addresses.notna(), '').astype(str)
+    head3 = text.str[:3]
+    head4 = text.str[:4]
+    result = pd.Series('', index=addresses.index, dtype=object)
+    result[head4.isin(VALID_PREFECTURES)] = head4
+    result[head3.isin(VALID_PREFECTURES)] = head3
+    return result
+
+
+def normalize_address_numbers_series(addresses: pd.Series) -> pd.Series:
+    """
+    住所の列の数字を正規化する（normalize_address_numbers の列版）
+
+    全角数字を半角に変換し、丁目・番地・号の前の漢数字（十・百・千の位を含む）のみをアラビア数字に変換する。
+    欠損値は欠損のまま返す。
+
+    Parameters:
+    -----------
+    addresses : pd.Series
+        正規化する住所の列
+
+    Returns:
+    --------
+    pd.Series
+        正規化された住所の列
+    """
+    return (
+        addresses.str.translate(FULLWIDTH_DIGITS)
+        .str.replace(KANJI_NUMBER_PATTERN, replace_kanji_number, regex=True)
+    )
+
+
+def strip_whitespace_series(addresses: pd.Series) -> pd.Series:
+    """住所の列から空白（全角スペースを含む）を取り除く（''.join(address.split()) の列版）"""
+    return addresses.str.replace(_WHITESPACE_PATTERN, '', regex=True)
+
+
+def normalize_address_column(
+    df: pd.DataFrame,
+    address_column: str = 'ADDRESS',
+    prefecture_column: str = 'PREFECTURE',
+    strip_whitespace: bool = False
+) -> pd.Series:
+    """
+    データフレームの住所列を列単位でまとめて正規化する
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        入力データフレーム
+    address_column : str
+        住所が格納されている列名
+    prefecture_column : str
+        都道府県が格納されている列名（存在しない場合は都道府県を付けない）
+    strip_whitespace : bool
+        空白を取り除くかどうか
+
+    Returns:
+    --------
+    pd.Series
+        正規化された住所の列
+    """
+    addresses = df[address_column]
+    if prefecture_column in df.columns:
+        addresses = add_prefecture(df[prefecture_column], addresses)
+    addresses = normalize_address_numbers_series(addresses.astype(object))
+    if strip_whitespace:
+        addresses = strip_whitespace_series(addresses)
+    return addresses
+
+
+def dates_to_ordinals(dates: pd.Series) -> np.ndarray:
+    """
+    基準日の列を日付の通し番号（date.toordinal）の配列に変換する
+
+    Parameters:
+    -----------
+    dates : pd.Series
+        基準日（YYYY-MM-DD形式の文字列、date、datetime、pandas.Timestamp）
+
+    Returns:
+    --------
+    np.ndarray
+        日付の通し番号の配列（基準日が欠損・変換できない場合は-1）
+    """
+    timestamps = pd.to_datetime(dates, errors='coerce', format='ISO8601')
+    days = timestamps.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype('int64')
+    ordinals = days + _EPOCH_ORDINAL
+    ordinals[timestamps.isna().to_numpy()] = -1
+    return ordinals
+
+
+def normalize_city_names_as_of(addresses: pd.Series, dates=None) -> pd.Series:
+    """
+    住所の列を行ごとの基準日時点の市区町村名に正規化する
+
+    normalize_city_name_with_history を列全体に適用したものと同じ結果を返す。
+    旧市区町村名ごとに行をまとめ、名称の区間リストを np.searchsorted で一括検索する。
+
+    Parameters:
+    -----------
+    addresses : pd.Series
+        正規化する住所の列
+    dates : pd.Series or array-like, optional
+        行ごとの基準日（登録日など）。欠損している行と、省略した場合は最新の名称に変換
+
+    Returns:
+    --------
+    pd.Series
+        正規化された住所の列（インデックスは addresses と同じ）
+    """
+    values = addresses.to_numpy(dtype=object, copy=True)
+    valid = addresses.notna().to_numpy()
+
+    row_ordinals = None
+    if dates is not None:
+        if isinstance(dates, pd.Series):
+            dates = dates.to_numpy()
+        row_ordinals = dates_to_ordinals(pd.Series(dates))
+
+    # 一意な住所ごとに市区町村名を取り出し、マッピングにあるものだけを残す
+    index = get_city_index()
+    city_keys = {}
+    rows_by_key = {}
+    for position in np.flatnonzero(valid):
+        text = str(values[position])
+        if text not in city_keys:
+            city_keys[text] = extract_full_city_name(text)
+        key = city_keys[text]
+        if key:
+            rows_by_key.setdefault(key, []).append(position)
+
+    for key, rows in rows_by_key.items():
+        intervals = index.city_intervals(key)
+        if intervals is None:
+            continue
+        starts, names = intervals
+        rows = np.asarray(rows)
+        # 先頭に旧名称（最初の合併日より前）を置いた名称の配列
+        candidates = np.array((key,) + names, dtype=object)
+        if row_ordinals is None:
+            positions = np.full(len(rows), len(names))
+        else:
+            ordinals = row_ordinals[rows]
+            positions = np.searchsorted(np.asarray(starts), ordinals, side='right')
+            positions[ordinals < 0] = len(names)
+        for row, new_city in zip(rows, candidates[positions]):
+            values[row] = str(values[row]).replace(key, new_city)
+
+    return pd.Series(values, index=addresses.index, name=addresses.name)
@@ -6,20 +6,63 @@ import re
 import difflib
 import csv
 import json
-from typing import Dict, Tuple, List
-from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from city_index import get_city_index
+from city_mapping import MAPPING_FILE, city_name_as_of, convert_japanese_date, date_to_ordinal
+from city_trie import CityNameTrie
+from memo_cache import memoize
 
 def load_city_mapping() -> Dict:
     """市区町村マッピングを読み込む"""
     try:
-        with open('市区町村マッピング.json', 'r', encoding='utf-8') as f:
+        with open(MAPPING_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception as e:
         print(f"Warning: Failed to load 市区町村マッピング.json: {e}")
         return {}
 
-# 市区町村の変更履歴を読み込む
-CITY_CHANGES = load_city_mapping()
+# 市区町村の変更履歴（最初に参照されたときに読み込む）
+_city_changes = None
+
+def get_city_changes() -> Dict:
+    """市区町村の変更履歴を返す（初回のみファイルを読み込む）"""
+    global _city_changes
+    if _city_changes is None:
+        _city_changes = load_city_mapping()
+    return _city_changes
+
+# 旧市区町村名のトライ（最初に参照されたときに作成する）
+_city_trie = None
+
+def get_city_trie() -> CityNameTrie:
+    """旧市区町村名の最長一致検索用トライを返す"""
+    global _city_trie
+    if _city_trie is None:
+        _city_trie = CityNameTrie(get_city_index())
+    return _city_trie
+
+# 既知の市区町村名（旧市区町村名と現在の名称）のトライ（最初に参照されたときに作成する）
+_municipality_trie = None
+
+def get_municipality_trie() -> CityNameTrie:
+    """マッピングにある旧市区町村名と現在の市区町村名（都道府県名から）の最長一致検索用トライを返す"""
+    global _municipality_trie
+    if _municipality_trie is None:
+        index = get_city_index()
+        trie = CityNameTrie(index)
+        for old_city in index:
+            trie.add(index.final_city(old_city))
+        _municipality_trie = trie
+    return _municipality_trie
+
+def __getattr__(name: str):
+    # CITY_CHANGES・CITY_RESOLVER はインポート時ではなく最初に参照されたときに読み込む
+    if name == 'CITY_CHANGES':
+        return get_city_changes()
+    if name == 'CITY_RESOLVER':
+        return get_city_index()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # 有効な都道府県名のリスト
 VALID_PREFECTURES = {
@@ -60,10 +103,16 @@ def extract_prefecture(address: str) -> Tuple[str, str]:
     Returns:
         Tuple[str, str]: (都道府県名, 残りの住所)
     """
-    for pref in VALID_PREFECTURES:
-        if address.startswith(pref):
-            return pref, address[len(pref):]
-    return "", address
+    prefecture = _match_prefecture(address)
+    return prefecture, address[len(prefecture):]
+
+def _match_prefecture(address: str) -> str:
+    """住所の先頭の都道府県名を返す（都道府県名は3文字または4文字）"""
+    if address[:3] in VALID_PREFECTURES:
+        return address[:3]
+    if address[:4] in VALID_PREFECTURES:
+        return address[:4]
+    return ""
 
 def normalize_city_name(address: str, date: str = None) -> str:
     """
@@ -77,47 +126,98 @@ def normalize_city_name(address: str, date: str = None) -> str:
         str: 正規化された住所
     """
     # 都道府県名を抽出
-    prefecture, remaining_address = extract_prefecture(address)
+    prefecture, _ = extract_prefecture(address)
     if not prefecture:
         return address
     
-    # 基準日の処理
-    target_date = datetime.strptime(date, "%Y-%m-%d") if date else datetime.now()
-    
-    # 旧市町村名を探索
-    normalized = remaining_address
-    for (pref, old_city), info in CITY_CHANGES.items():
-        if prefecture == pref and old_city in remaining_address:
-            # 基準日チェック
-            change_date = datetime.strptime(info["date"], "%Y-%m-%d")
-            if not date or target_date >= change_date:
-                # 新しい市町村名に置換
-                normalized = remaining_address.replace(old_city, info["new"])
-                break
+    # 基準日を通し番号に変換（指定がない場合は最新の状態）
+    ordinal = date_to_ordinal(date)
+    
+    # 旧市町村名を一度の走査で探索し、基準日時点の名称に置換
+    index = get_city_index()
+    for _, old_city in get_city_trie().find_all(address):
+        if old_city.startswith(prefecture):
+            return address.replace(old_city, index.city_as_of(old_city, ordinal), 1)
     
-    # 都道府県名と正規化された住所を結合
-    return prefecture + normalized
+    return address
 
-def normalize_number(number: str) -> str:
-    """漢数字と全角数字を半角算用数字に変換"""
-    kanji_numbers = {
-        '一': '1', '二': '2', '三': '3', '四': '4', '五': '5',
-        '六': '6', '七': '7', '八': '8', '九': '9', '十': '10',
-        '１': '1', '２': '2', '３': '3', '４': '4', '５': '5',
-        '６': '6', '７': '7', '８': '8', '９': '9', '０': '0'
-    }
+# 全角数字 → 半角数字の変換テーブル
+FULLWIDTH_DIGITS = str.maketrans('０１２３４５６７８９', '0123456789')
+
+# 漢数字の数字と位（十・百・千）
+KANJI_DIGITS = {
+    '〇': 0, '一': 1, '二': 2, '三': 3, '四': 4,
+    '五': 5, '六': 6, '七': 7, '八': 8, '九': 9
+}
+KANJI_UNITS = {'十': 10, '百': 100, '千': 1000}
+
+# 漢数字を含む数字の並び（算用数字が混在してもよい。全角数字は先に半角にしておく）
+_NUMERAL = '[0-9]*[〇一二三四五六七八九十百千][〇一二三四五六七八九十百千0-9]*'
+KANJI_NUMERAL_PATTERN = re.compile(_NUMERAL)
+# 丁目・番地・号の前の数字の並び
+# 「番」は丁目の直後なら番地として扱う。それ以外では、後に町・丁が続くもの（一番町）、
+# 数字・ハイフンが続くもの（麻布十番2-3-4）、後に丁目があるもの（麻布十番1丁目）は地名として扱う
+KANJI_NUMBER_PATTERN = re.compile(
+    '(?<=丁目)' + _NUMERAL + '(?=番)'
+    '|' + _NUMERAL + '(?=丁目|番地|号|番(?![町丁0-9０-９\\-−ー－])(?!.*丁目))'
+)
+
+def parse_kanji_number(numeral: str) -> str:
+    """
+    漢数字・全角数字を含む数字の並びを算用数字（半角）にする
     
-    # 漢数字と全角数字を半角算用数字に変換
-    result = number
-    for kanji, digit in kanji_numbers.items():
-        result = result.replace(kanji, digit)
+    十・百・千の位を含む場合は位取りで読み（二十三 → 23、百五 → 105、千二百 → 1200）、
+    含まない場合は1文字ずつ数字に置き換える（二〇三 → 203、１２ → 12）。
+    半角数字だけの場合はそのまま返す。
+    
+    Parameters:
+    -----------
+    numeral : str
+        KANJI_NUMERAL_PATTERN に一致する文字列
     
-    return result
+    Returns:
+    --------
+    str
+        算用数字
+    """
+    if numeral.isascii():
+        return numeral
+    total = 0
+    current = None
+    has_unit = False
+    for char in numeral:
+        unit = KANJI_UNITS.get(char)
+        if unit is not None:
+            # 位の前に数字がない場合は1（十二 → 12）
+            total += (1 if current is None else current) * unit
+            current = None
+            has_unit = True
+            continue
+        digit = KANJI_DIGITS.get(char)
+        if digit is None:
+            digit = int(char.translate(FULLWIDTH_DIGITS))
+        current = digit if current is None else current * 10 + digit
+    if not has_unit:
+        return ''.join(
+            str(KANJI_DIGITS[char]) if char in KANJI_DIGITS else char.translate(FULLWIDTH_DIGITS)
+            for char in numeral
+        )
+    return str(total + (current or 0))
 
+def replace_kanji_number(match: re.Match) -> str:
+    """KANJI_NUMBER_PATTERN・KANJI_NUMERAL_PATTERN に一致した数字の並びを算用数字に置き換える"""
+    return parse_kanji_number(match.group())
+
+def normalize_number(number: str) -> str:
+    """漢数字と全角数字を半角算用数字に変換（十・百・千の位を含む漢数字は位取りで読む）"""
+    return KANJI_NUMERAL_PATTERN.sub(replace_kanji_number, number.translate(FULLWIDTH_DIGITS))
+
+@memoize()
 def normalize_address_numbers(address: str) -> str:
     """
     住所の数字を正規化する
-    - 丁目・番地・号の前の漢数字のみをアラビア数字に変換
+    - 丁目・番地・号の前の漢数字のみをアラビア数字に変換（十・百・千の位と〇を含む。
+      全角数字・漢数字が混在してもよい）
     - その他の漢数字（地名等）はそのまま保持
     - 全角数字は半角数字に変換
     
@@ -132,68 +232,320 @@ def normalize_address_numbers(address: str) -> str:
         正規化された住所
     """
     # 全角数字を半角に変換
-    normalized = address.translate(str.maketrans('０１２３４５６７８９', '0123456789'))
+    normalized = address.translate(FULLWIDTH_DIGITS)
     
-    # 丁目・番地・号の前の漢数字のみをアラビア数字に変換
-    kanji_numbers = {
-        '一': '1', '二': '2', '三': '3', '四': '4', '五': '5',
-        '六': '6', '七': '7', '八': '8', '九': '9'
-    }
+    # 丁目・番地・号の前の漢数字を含む数字の並びを一度の置換で変換
+    return KANJI_NUMBER_PATTERN.sub(replace_kanji_number, normalized)
+
+class AddressTokens(NamedTuple):
+    """住所を構成要素に分割した結果"""
+    prefecture: str
+    # 郡
+    county: str
+    # 市区町村（東京都の特別区を含む）
+    city: str
+    # 政令指定都市の区
+    ward: str
+    # 町域名
+    town: str
+    chome: Optional[str]
+    banchi: Optional[str]
+    go: Optional[str]
+    # 番地以降の建物名など
+    remainder: str
+    # 数字を正規化した住所全体
+    normalized: str
+
+# 市区町村の区切りとなる文字
+_MUNICIPALITY_UNITS = frozenset('郡市区町村')
+_MUNICIPALITY_UNIT_PATTERN = re.compile('[郡市区町村]')
+
+_DIGIT_PATTERN = re.compile(r'\d')
+
+# 丁目・番地・号のラベル付き数字、またはハイフン区切りの数字
+_ADDRESS_NUMBER_PATTERN = re.compile(r'(\d+)(丁目|番地?|号|[-−ー－](?=\d))?')
+
+@memoize()
+def tokenize_address(address: str) -> AddressTokens:
+    """
+    住所を都道府県・郡・市区町村・区・町域・丁目・番地・号・残りに分割する
     
-    # 丁目・番地・号の前の漢数字のみを変換
-    for kanji, arabic in kanji_numbers.items():
-        normalized = re.sub(f'{kanji}(?=(丁目|番地?|号))', arabic, normalized)
+    数字を正規化した住所を先頭から一度だけ走査し、市区町村の区切り文字と
+    丁目・番地・号（またはハイフン区切りの数字）を順に読み取る。
     
-    return normalized
-
-def extract_address_parts(address: str) -> tuple:
-    """住所から丁目、番地、号の数字を抽出"""
-    # 数字を正規化
+    Parameters:
+    -----------
+    address : str
+        分割する住所
+    
+    Returns:
+    --------
+    AddressTokens
+        分割した住所の構成要素（該当しない要素は空文字列、数字はNone）
+    """
     normalized = normalize_address_numbers(address)
+    prefecture = _match_prefecture(normalized)
+    length = len(normalized)
+    
+    # 町域名までの部分（最初の数字の手前まで）から市区町村の区切り文字を順に読み取る
+    start = len(prefecture)
+    town_end = _first_digit(normalized, start)
+    county = city = ward = ''
+    
+    # 既知の市区町村名で始まる場合は、区切り文字から推測せずにその名前で区切る
+    known = get_municipality_trie().longest_match(normalized) if prefecture else None
+    if known and len(known) <= town_end:
+        for unit in re.finditer('郡', normalized[:len(known)]):
+            if unit.start() > start and _is_county(normalized, unit.start(), len(known)):
+                county = normalized[start:unit.end()]
+                start = unit.end()
+                break
+        city = normalized[start:len(known)]
+        start = len(known)
     
-    # パターン1: ハイフン区切り (例: 1-4-5)
-    pattern1 = r'(\d+)[-−ー](\d+)[-−ー](\d+)'
-    match = re.search(pattern1, normalized)
-    if match:
-        return match.group(1), match.group(2), match.group(3)
-    
-    # パターン2: ハイフン区切り (例: 1-4)
-    pattern2 = r'(\d+)[-−ー](\d+)'
-    match = re.search(pattern2, normalized)
-    if match:
-        return match.group(1), match.group(2), None
-    
-    # パターン3: 丁目、番、号
-    chome = None
-    banchi = None
-    go = None
-    
-    if '丁目' in normalized:
-        parts = normalized.split('丁目')
-        nums = re.findall(r'\d+', parts[0])
-        if nums:
-            chome = nums[-1]
-            rest = parts[1]
+    for unit in _MUNICIPALITY_UNIT_PATTERN.finditer(normalized, start, town_end):
+        i = unit.start()
+        char = unit.group()
+        if i == start:
+            continue
+        following = normalized[i + 1] if i + 1 < length else ''
+        if county and not city:
+            # 郡に属するのは町村だけ。「市」（余市町など）や町村名の後ろの「市」（池田町市橋）では区切らない
+            if char in '町村' and following not in '町村':
+                city = normalized[start:i + 1].strip()
+                start = i + 1
+            continue
+        # 区切り文字が続く場合（四日市市・小郡市・大町市など）は後ろの文字で区切る
+        if following in _MUNICIPALITY_UNITS:
+            continue
+        name = normalized[start:i + 1].strip()
+        if city:
+            # 市区町村の後ろの「町」「市」は町域名の一部
+            if char == '区' and not ward:
+                ward = name
+                start = i + 1
+        elif char == '郡':
+            # 後ろが町村でない「郡」（大和郡山市など）は市の名前の一部
+            if not county and _is_county(normalized, i, town_end):
+                county = name
+                start = i + 1
+        elif char in '町村' and '市' in normalized[i + 1:town_end]:
+            # 後ろに「市」がある場合（東村山市など）は市の名前の一部
+            continue
+        elif char != '区' or prefecture in ('東京都', ''):
+            city = name
+            start = i + 1
+        elif not ward:
+            ward = name
+            start = i + 1
+    
+    # 丁目・番地・号を読み取る（ハイフン区切りは直前のラベルの次から割り当てる）
+    numbers = [None, None, None]
+    next_slot = 0
+    in_chain = False
+    remainder_start = town_end
+    for match in _ADDRESS_NUMBER_PATTERN.finditer(normalized, town_end):
+        digits, marker = match.groups()
+        if marker == '丁目':
+            slot = 0
+        elif marker and marker[0] == '番':
+            slot = 1
+        elif marker == '号':
+            slot = 2
+        elif marker or in_chain:
+            slot = next_slot
         else:
-            rest = normalized
-    else:
-        rest = normalized
+            continue
+        in_chain = bool(marker) and marker[0] in '-−ー－'
+        if slot < 3 and numbers[slot] is None:
+            numbers[slot] = digits
+        next_slot = slot + 1
+        remainder_start = match.end()
+    
+    return AddressTokens(
+        prefecture=prefecture,
+        county=county,
+        city=city,
+        ward=ward,
+        town=normalized[start:town_end].strip(),
+        chome=numbers[0],
+        banchi=numbers[1],
+        go=numbers[2],
+        remainder=normalized[remainder_start:].strip(),
+        normalized=normalized
+    )
+
+def _is_county(text: str, i: int, end: int) -> bool:
+    """
+    i 文字目の「郡」が郡の区切りかどうかを判定する
+    
+    郡に続くのは町村のため、後ろで最初に区切りとなるのが「市」の場合（大和郡山市など）は
+    郡ではなく市の名前の一部とみなす。「市」の後ろに区切り文字が続く場合（余市町など）は町村名の一部。
+    """
+    for unit in _MUNICIPALITY_UNIT_PATTERN.finditer(text, i + 1, end):
+        char = unit.group()
+        if char in '町村':
+            return True
+        following = text[unit.end()] if unit.end() < len(text) else ''
+        if char == '市' and following not in _MUNICIPALITY_UNITS:
+            return False
+    return True
+
+def _first_digit(text: str, start: int) -> int:
+    """start 以降で最初の数字の位置を返す（ない場合は文字列の長さ）"""
+    match = _DIGIT_PATTERN.search(text, start)
+    return match.start() if match else len(text)
+
+def _as_tokens(address: Union[str, AddressTokens]) -> AddressTokens:
+    """分割済みの住所はそのまま、文字列は分割して返す"""
+    return address if isinstance(address, AddressTokens) else tokenize_address(address)
+
+def extract_address_parts(address: Union[str, AddressTokens]) -> tuple:
+    """住所から丁目、番地、号の数字を抽出"""
+    tokens = _as_tokens(address)
+    return tokens.chome, tokens.banchi, tokens.go
+
+# 住所の類似度の計算方法
+#   combined: 文字bigramのDice係数と、編集距離（レーベンシュタイン距離）による類似度の平均
+#   dice / levenshtein: それぞれ単独
+#   legacy: 以前の計算方法（完全一致1.0、一方が他方を含む場合0.8、それ以外は同じ位置の文字の一致率）
+SIMILARITY_METRICS = ('combined', 'dice', 'levenshtein', 'legacy')
+DEFAULT_SIMILARITY_METRIC = 'combined'
+
+@memoize()
+def _similarity_key(address: str) -> str:
+    """類似度の計算に使う形（数字を正規化し、空白を除く。地名の漢数字は保持）"""
+    return ''.join(normalize_address_numbers(address).split())
+
+def _bigrams(text: str) -> set:
+    """文字bigramの集合（1文字の場合はその文字）"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return set(map(str.__add__, text, text[1:]))
+
+def _common_length(a: str, b: str, skip: int, suffix: bool = False) -> int:
+    """
+    共通の先頭（suffix=True の場合は末尾）の文字数
     
-    if '番' in rest:
-        parts = rest.split('番')
-        nums = re.findall(r'\d+', parts[0])
-        if nums:
-            banchi = nums[-1]
-            rest = parts[1]
+    部分文字列の比較による二分探索で求める。先頭・末尾の skip 文字は共通部分として数えない。
+    """
+    low, high = 0, min(len(a), len(b)) - skip
+    while low < high:
+        middle = (low + high + 1) // 2
+        if (a[-middle:] == b[-middle:]) if suffix else (a[:middle] == b[:middle]):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+class CandidateScorer:
+    """
+    1つの住所と複数の候補住所の類似度を計算する
     
-    if '号' in rest:
-        nums = re.findall(r'\d+', rest.split('号')[0])
-        if nums:
-            go = nums[-1]
+    住所の正規化・bigram・編集距離のビットマスクは作成時に一度だけ求め、
+    候補住所ごとには正規化と比較だけを行う。
+    """
     
-    return chome, banchi, go
+    def __init__(self, address: str, metric: str = DEFAULT_SIMILARITY_METRIC):
+        """
+        Parameters:
+        -----------
+        address : str
+            比較の基準にする住所
+        metric : str
+            類似度の計算方法（SIMILARITY_METRICS のいずれか）
+        """
+        if metric not in SIMILARITY_METRICS:
+            raise ValueError(
+                f"類似度の計算方法は {', '.join(SIMILARITY_METRICS)} のいずれかを指定してください: {metric}"
+            )
+        self.metric = metric
+        self.key = _similarity_key(address)
+        self._bigrams = _bigrams(self.key)
+        # 文字ごとに、その文字が現れる位置のビットマスク（編集距離の計算に使う）
+        self._positions = {}
+        for i, char in enumerate(self.key):
+            self._positions[char] = self._positions.get(char, 0) | (1 << i)
+    
+    def edit_distance(self, text: str) -> int:
+        """
+        基準の住所（正規化済み）と text の編集距離
+        
+        共通の先頭・末尾を除いた部分について、基準の住所の各位置をビットで表し、
+        text を1文字ずつ走査して距離を更新する（Myers のビット並列アルゴリズム）。
+        """
+        key = self.key
+        start = _common_length(key, text, 0)
+        end = _common_length(key, text, start, suffix=True)
+        length = len(key) - start - end
+        text = text[start:len(text) - end]
+        if not length or not text:
+            return length + len(text)
+        
+        mask = (1 << length) - 1
+        last = 1 << (length - 1)
+        plus, minus = mask, 0
+        distance = length
+        for char in text:
+            equal = (self._positions.get(char, 0) >> start) & mask
+            vertical = equal | minus
+            horizontal = (((equal & plus) + plus) ^ plus) | equal
+            horizontal_plus = minus | ~(horizontal | plus)
+            horizontal_minus = plus & horizontal
+            if horizontal_plus & last:
+                distance += 1
+            elif horizontal_minus & last:
+                distance -= 1
+            horizontal_plus = (horizontal_plus << 1) | 1
+            horizontal_minus <<= 1
+            plus = (horizontal_minus | ~(vertical | horizontal_plus)) & mask
+            minus = horizontal_plus & vertical & mask
+        return distance
+    
+    def _similarity(self, key: str) -> float:
+        """正規化済みの候補住所との類似度"""
+        if key == self.key:
+            return 1.0
+        longest = max(len(self.key), len(key))
+        if self.metric == 'legacy':
+            if key in self.key or self.key in key:
+                return 0.8
+            return sum(1 for a, b in zip(self.key, key) if a == b) / longest
+        if self.metric == 'levenshtein':
+            return 1 - self.edit_distance(key) / longest
+        
+        bigrams = _bigrams(key)
+        total = len(self._bigrams) + len(bigrams)
+        dice = 2 * len(self._bigrams & bigrams) / total if total else 0.0
+        if self.metric == 'dice':
+            return dice
+        return (dice + 1 - self.edit_distance(key) / longest) / 2
+    
+    def score(self, candidates: List[str]) -> List[float]:
+        """
+        候補住所ごとの類似度を計算する
+        
+        同じ形に正規化される候補住所は一度だけ計算する。
+        
+        Parameters:
+        -----------
+        candidates : List[str]
+            候補住所のリスト
+        
+        Returns:
+        --------
+        List[float]
+            候補住所と同じ順の類似度（0.0～1.0）
+        """
+        keys = [_similarity_key(candidate) for candidate in candidates]
+        scores = {key: self._similarity(key) for key in set(keys)}
+        return [scores[key] for key in keys]
 
-def calculate_address_similarity(address1: str, address2: str) -> float:
+def calculate_address_similarity(
+    address1: str,
+    address2: str,
+    metric: str = DEFAULT_SIMILARITY_METRIC
+) -> float:
     """
     2つの住所の類似度を計算する
     
@@ -203,88 +555,66 @@ def calculate_address_similarity(address1: str, address2: str) -> float:
         比較する住所1
     address2 : str
         比較する住所2
+    metric : str
+        類似度の計算方法（SIMILARITY_METRICS のいずれか。'legacy' は以前の計算方法）
         
     Returns:
     --------
     float
         類似度（0.0～1.0）
     """
-    # 数字を正規化（地名の漢数字は保持）
-    norm1 = normalize_address_numbers(address1)
-    norm2 = normalize_address_numbers(address2)
-    
-    # 文字列を正規化（空白除去）
-    norm1 = ''.join(norm1.split())
-    norm2 = ''.join(norm2.split())
-    
-    # 完全一致の場合
-    if norm1 == norm2:
-        return 1.0
-    
-    # 部分文字列の場合
-    if norm1 in norm2 or norm2 in norm1:
-        return 0.8
-    
-    # 文字の一致率を計算
-    matches = sum(1 for a, b in zip(norm1, norm2) if a == b)
-    max_length = max(len(norm1), len(norm2))
-    
-    return matches / max_length if max_length > 0 else 0.0
+    return CandidateScorer(address1, metric).score([address2])[0]
 
-def analyze_address_match_level(input_address: str, matched_address: str) -> Dict[str, bool]:
+def analyze_address_match_level(
+    input_address: Union[str, AddressTokens],
+    matched_address: Union[str, AddressTokens]
+) -> Dict[str, bool]:
     """
     住所のマッチングレベルを分析する
     
     Parameters:
     -----------
-    input_address : str
-        入力された住所
-    matched_address : str
-        マッチした住所
+    input_address : str or AddressTokens
+        入力された住所（tokenize_address で分割済みのものも可）
+    matched_address : str or AddressTokens
+        マッチした住所（tokenize_address で分割済みのものも可）
         
     Returns:
     --------
     Dict[str, bool]
         各レベル（丁目、番地、号）のマッチング結果
     """
-    # 数字を正規化（地名の漢数字は保持）
-    input_norm = normalize_address_numbers(input_address)
-    matched_norm = normalize_address_numbers(matched_address)
-    
-    # 丁目、番地、号を抽出
-    def extract_numbers(address: str) -> Dict[str, str]:
-        numbers = {
-            'chome': '',
-            'banchi': '',
-            'go': ''
-        }
-        
-        # 丁目を抽出
-        chome_match = re.search(r'(\d+)丁目', address)
-        if chome_match:
-            numbers['chome'] = chome_match.group(1)
-            
-        # 番地を抽出
-        banchi_match = re.search(r'(\d+)番地?', address)
-        if banchi_match:
-            numbers['banchi'] = banchi_match.group(1)
-            
-        # 号を抽出
-        go_match = re.search(r'(\d+)号', address)
-        if go_match:
-            numbers['go'] = go_match.group(1)
-            
-        return numbers
-    
-    input_numbers = extract_numbers(input_norm)
-    matched_numbers = extract_numbers(matched_norm)
+    # 丁目、番地、号を抽出（数字は正規化済み、地名の漢数字は保持）
+    input_tokens = _as_tokens(input_address)
+    matched_tokens = _as_tokens(matched_address)
     
     return {
-        'chome_match': input_numbers['chome'] == matched_numbers['chome'] and input_numbers['chome'] != '',
-        'banchi_match': input_numbers['banchi'] == matched_numbers['banchi'] and input_numbers['banchi'] != '',
-        'go_match': input_numbers['go'] == matched_numbers['go'] and input_numbers['go'] != ''
+        'chome_match': input_tokens.chome is not None and input_tokens.chome == matched_tokens.chome,
+        'banchi_match': input_tokens.banchi is not None and input_tokens.banchi == matched_tokens.banchi,
+        'go_match': input_tokens.go is not None and input_tokens.go == matched_tokens.go
     }
 
+def extract_full_city_name(address: str) -> str:
+    """
+    合併履歴の検索に使う完全な市区町村名（都道府県名 + 最初の語）を取り出す
+    
+    Parameters:
+    -----------
+    address : str
+        住所
+    
+    Returns:
+    --------
+    str
+        完全な市区町村名（都道府県名がない場合は空文字列）
+    """
+    prefecture, remaining = extract_prefecture(address)
+    words = remaining.split()
+    if not prefecture or not words:
+        return ''
+    return prefecture + words[0]
+
+@memoize()
 def normalize_city_name_with_history(address: str, date: str = None) -> str:
     """
     市区町村名を正規化する（合併履歴を考慮）
@@ -294,69 +624,27 @@ def normalize_city_name_with_history(address: str, date: str = None) -> str:
     address : str
         正規化する住所
     date : str, optional
-        基準日（この日付時点での市区町村名に変換）
-        形式：YYYY-MM-DD
+        基準日（この日付時点での市区町村名に変換。合併日より前の場合は旧名称のまま）
+        形式：YYYY-MM-DD（date・datetimeも可）
     
     Returns:
     --------
     str
         正規化された住所
     """
-    # 都道府県名と市区町村名を分離
-    prefecture, remaining = extract_prefecture(address)
-    if not prefecture:
-        return address
-        
     # 完全な市区町村名を作成（都道府県名 + 市区町村名）
-    full_city_name = prefecture + remaining.split()[0]
-    
-    # マッピングから新しい市区町村名を取得
-    if full_city_name in CITY_CHANGES.get('mapping', {}):
-        changes = CITY_CHANGES['mapping'][full_city_name]
-        if changes:
-            # 日付指定がある場合は、その日付以前の最新の変更を使用
-            if date:
-                valid_changes = [
-                    change for change in changes 
-                    if convert_japanese_date(change['merge_date']) <= date
-                ]
-                if valid_changes:
-                    new_city = valid_changes[-1]['new_city']
-                    # 元の住所の市区町村名部分を新しい名前で置換
-                    return address.replace(full_city_name, new_city)
-            
-            # 日付指定がない場合は最新の変更を使用
-            new_city = changes[-1]['new_city']
-            return address.replace(full_city_name, new_city)
-    
-    return address
-
-def convert_japanese_date(japanese_date: str) -> str:
-    """
-    和暦の日付を西暦に変換
-    例：平成17年3月1日 → 2005-03-01
-    """
-    # 元号の変換テーブル
-    era_table = {
-        '平成': 1989,
-        '令和': 2019
-    }
-    
-    # 数字を抽出
-    match = re.match(r'(平成|令和)(\d+)年(\d+)月(\d+)日', japanese_date)
-    if not match:
-        return '9999-12-31'  # 変換できない場合は遠い未来の日付を返す
-        
-    era, year, month, day = match.groups()
-    year = int(year)
-    month = int(month)
-    day = int(day)
+    full_city_name = extract_full_city_name(address)
+    if not full_city_name:
+        return address
     
-    # 西暦に変換
-    western_year = era_table[era] + year - 1
+    # 名称の変遷の区間リストを取得
+    intervals = get_city_index().city_intervals(full_city_name)
+    if intervals is None:
+        return address
     
-    # YYYY-MM-DD形式に変換
-    return f'{western_year:04d}-{month:02d}-{day:02d}'
+    # 基準日時点の名称を二分探索で求める（日付指定がない場合は合併を最後まで辿った現在の名称）
+    new_city = city_name_as_of(intervals, full_city_name, date_to_ordinal(date))
+    return address.replace(full_city_name, new_city)
 
 def get_city_reading(prefecture: str, city_name: str) -> str:
     """
@@ -375,12 +663,12 @@ def get_city_reading(prefecture: str, city_name: str) -> str:
         読み仮名（見つからない場合は空文字列）
     """
     # 新市町村名で検索
-    for (pref, _), change in CITY_CHANGES.items():
+    for (pref, _), change in get_city_changes().items():
         if pref == prefecture and change['new'] == city_name:
             return change.get('reading', '')
             
     # 旧市町村名で検索
-    for (pref, old_city), change in CITY_CHANGES.items():
+    for (pref, old_city), change in get_city_changes().items():
         if pref == prefecture and old_city == city_name:
             return change.get('reading', '')
             
@@ -410,7 +698,7 @@ def get_city_history(prefecture: str, city_name: str) -> List[Dict]:
     history = []
     
     # 新市町村名として検索
-    for (pref, old_city), change in CITY_CHANGES.items():
+    for (pref, old_city), change in get_city_changes().items():
         if pref == prefecture and change['new'] == city_name:
             history.append({
                 'old_name': old_city,
@@ -421,7 +709,7 @@ def get_city_history(prefecture: str, city_name: str) -> List[Dict]:
             })
             
     # 旧市町村名として検索
-    for (pref, old_city), change in CITY_CHANGES.items():
+    for (pref, old_city), change in get_city_changes().items():
         if pref == prefecture and old_city == city_name:
             history.append({
                 'old_name': old_city,
@@ -435,7 +723,11 @@ def get_city_history(prefecture: str, city_name: str) -> List[Dict]:
     history.sort(key=lambda x: x['date'])
     return history
 
-def improve_address_matching(input_address: str, candidates: List[str]) -> Tuple[str, float]:
+def improve_address_matching(
+    input_address: str,
+    candidates: List[str],
+    metric: str = DEFAULT_SIMILARITY_METRIC
+) -> Tuple[str, float]:
     """
     住所マッチングの精度を改善する
     
@@ -445,18 +737,20 @@ def improve_address_matching(input_address: str, candidates: List[str]) -> Tuple
         入力住所
     candidates : List[str]
         マッチング候補の住所リスト
+    metric : str
+        類似度の計算方法（SIMILARITY_METRICS のいずれか）
     
     Returns:
     --------
     Tuple[str, float]
         最もマッチする住所と類似度のタプル
     """
-    best_match = None
-    highest_similarity = -1
-    
-    # 入力住所から都道府県を抽出
+    # 入力住所から都道府県を抽出し、残りの住所は一度だけ正規化する
     input_prefecture, input_remaining = extract_prefecture(input_address)
+    scorer = CandidateScorer(input_remaining, metric)
     
+    eligible = []
+    remainders = []
     for candidate in candidates:
         # 候補住所から都道府県を抽出
         candidate_prefecture, candidate_remaining = extract_prefecture(candidate)
@@ -464,16 +758,20 @@ def improve_address_matching(input_address: str, candidates: List[str]) -> Tuple
         # 都道府県が一致しない場合はスキップ
         if input_prefecture and candidate_prefecture and input_prefecture != candidate_prefecture:
             continue
-        
-        # 住所の類似度を計算
-        similarity = calculate_address_similarity(input_remaining, candidate_remaining)
-        
+        eligible.append((candidate, bool(input_prefecture and candidate_prefecture)))
+        remainders.append(candidate_remaining)
+    
+    best_match = None
+    highest_similarity = -1
+    
+    # 住所の類似度を候補全体について計算
+    for (candidate, same_prefecture), similarity in zip(eligible, scorer.score(remainders)):
         # 都道府県が一致する場合は類似度にボーナスを加算
-        if input_prefecture and candidate_prefecture and input_prefecture == candidate_prefecture:
+        if same_prefecture:
             similarity += 0.1
         
         if similarity > highest_similarity:
             highest_similarity = similarity
             best_match = candidate
     
-    return best_match or input_address, highest_similarity 
\ No newline at end of file
+    return best_match or input_address, highest_similarity
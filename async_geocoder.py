@@ -0,0 +1,126 @@
+"""
+asyncioによる並行ジオコーディング
+
+GsiGeocoder のAPI呼び出しをスレッドプールで並行に実行し、
+固定の待機時間の代わりにトークンバケットで1秒あたりのリクエスト数を制限する。
+リクエスト数は既定ではジオコーダーのレートコントローラー（rate_control）に従って変化する。
+キャッシュにある住所はAPIを呼び出さず、レート制限の対象にもならない。
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 既定の同時リクエスト数・1回のHTTPリクエストのタイムアウト（秒）
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 10.0
+
+# ジオコーディングする住所 (住所, 店舗コード, 店舗名)
+GeocodeRequest = Tuple[str, Optional[str], Optional[str]]
+
+
+class TokenBucket:
+    """
+    トークンバケットによるレート制限
+
+    1秒あたり rate 個のトークンが貯まり（最大 capacity 個）、
+    リクエストのたびに1個消費する。トークンがない場合は貯まるまで待つ。
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Args:
+            rate: 1秒あたりのリクエスト数
+            capacity: 連続して送れるリクエスト数の上限
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = None
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        if self._updated is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """トークンを1個取得する（なければ貯まるまで待つ）"""
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def geocode_async(
+    geocoder,
+    addresses: Iterable[GeocodeRequest],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: Optional[float] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    limiter: Optional[TokenBucket] = None
+) -> List[Tuple[Optional[Dict], bool]]:
+    """
+    複数の住所を並行してジオコーディングする
+
+    Parameters:
+    -----------
+    geocoder : GsiGeocoder
+        キャッシュとAPI呼び出しに使うジオコーダー
+    addresses : Iterable[GeocodeRequest]
+        (住所, 店舗コード, 店舗名) のリスト
+    concurrency : int
+        同時に実行するAPIリクエストの最大数
+    rate : float, optional
+        固定の1秒あたりのAPIリクエスト数。Noneの場合はジオコーダーのレートコントローラーに従う
+    timeout : float
+        1回のHTTPリクエストのタイムアウト（秒）。リトライを含めた1件の所要時間は
+        ジオコーダーの max_retries とバックオフで決まる。リトライしてもタイムアウトした場合は
+        ジオコーダーが NEGATIVE_TIMEOUT としてキャッシュする
+    limiter : TokenBucket, optional
+        使用するレート制限（指定した場合は rate を使わない）
+
+    Returns:
+    --------
+    List[Tuple[Optional[Dict], bool]]
+        入力と同じ順序の geocode の戻り値 (結果, キャッシュヒットかどうか) のリスト
+    """
+    loop = asyncio.get_running_loop()
+    controller = geocoder.rate_controller if rate is None else None
+    limiter = limiter or TokenBucket(rate if rate is not None else controller.rate)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def geocode_one(address: str, store_code: str, store_name: str):
+            cached = geocoder.lookup_cache(address, store_code, store_name)
+            if cached is not None:
+                return cached
+            async with semaphore:
+                if controller is not None:
+                    limiter.rate = controller.rate
+                await limiter.acquire()
+                # スレッドの処理（リトライ・キャッシュへの書き込みを含む）が終わるまで
+                # セマフォを保持する。途中で打ち切るとスレッドは動き続け、結果がキャッシュと食い違う
+                fetch = partial(geocoder.fetch, address, store_code, store_name, timeout=timeout)
+                return await loop.run_in_executor(executor, fetch)
+
+        return await asyncio.gather(*(
+            geocode_one(address, store_code, store_name)
+            for address, store_code, store_name in addresses
+        ))
+
+
+def geocode_concurrently(
+    geocoder,
+    addresses: Iterable[GeocodeRequest],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: Optional[float] = None,
+    timeout: float = DEFAULT_TIMEOUT
+) -> List[Tuple[Optional[Dict], bool]]:
+    """geocode_async を同期的に実行する（引数・戻り値は geocode_async と同じ）"""
+    return asyncio.run(geocode_async(geocoder, addresses, concurrency, rate, timeout))
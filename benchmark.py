@@ -0,0 +1,307 @@
+"""
+住所の正規化・類似度計算の性能測定
+
+合成した住所（1千件・10万件・100万件など）に対して主要な関数を実行し、
+1秒あたりの処理件数と1件あたりのメモリ割り当てを測定する。
+結果はJSONのベースラインとして保存でき、比較モードでは閾値を超えて遅く（または
+メモリを多く使うように）なった項目を性能の劣化として表示する。
+
+使い方:
+    python benchmark.py --sizes 1000,100000 --save benchmark_baseline.json
+    python benchmark.py --sizes 1000,100000 --compare benchmark_baseline.json --threshold 0.1
+"""
+
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from address_utils import (
+    VALID_PREFECTURES,
+    analyze_address_match_level,
+    calculate_address_similarity,
+    extract_prefecture,
+    improve_address_matching,
+    normalize_address_numbers,
+    normalize_city_name_with_history
+)
+from address_corpus import MAX_CHOME, TO_FULLWIDTH_DIGITS, TOWN_NAMES, format_block_number, load_city_names
+from city_mapping import MAPPING_FILE
+from memo_cache import clear_memo_caches
+from normalize_address import AddressNormalizer
+
+DEFAULT_SIZES = (1000, 100000)
+
+# メモリ割り当ての測定に使う件数（tracemalloc は処理が遅くなるため一部だけ測る）
+ALLOCATION_SAMPLE = 10000
+
+# 比較モードで劣化とみなす変化の割合
+DEFAULT_THRESHOLD = 0.1
+
+# 候補住所の数（improve_address_matching）
+CANDIDATE_COUNT = 5
+
+
+def generate_corpus(size: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """
+    性能測定用の住所と、その住所に対してAPIが返しそうな住所の組を作成する
+
+    市区町村マッピングの旧市区町村名・現在の市区町村名を使い、
+    一部は市区町村名の後に空白を入れる（normalize_city_name_with_history が合併履歴を引く形）。
+
+    Parameters:
+    -----------
+    size : int
+        件数
+    seed : int
+        乱数のシード
+
+    Returns:
+    --------
+    List[Tuple[str, str]]
+        (入力住所, マッチした住所) のリスト
+    """
+    rng = random.Random(seed)
+    old_cities, new_cities = load_city_names()
+    prefectures = sorted(VALID_PREFECTURES)
+
+    corpus = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < 0.4:
+            city = rng.choice(old_cities)
+        elif roll < 0.9:
+            city = rng.choice(new_cities)
+        else:
+            city = rng.choice(prefectures) + '試験市'
+        chome, banchi, go = rng.randint(1, MAX_CHOME), rng.randint(1, 40), rng.randint(1, 30)
+        town = rng.choice(TOWN_NAMES)
+        separator = ' ' if rng.random() < 0.3 else ''
+        numbers = format_block_number(rng, chome, banchi, go, kanji=rng.random() < 0.25)
+        if rng.random() < 0.25:
+            numbers = numbers.translate(TO_FULLWIDTH_DIGITS)
+        address = f"{city}{separator}{town}{numbers}"
+        # APIは号を返さないことがある
+        matched_go = go if rng.random() < 0.7 else rng.randint(1, 30)
+        matched = f"{city}{town}{chome}丁目{banchi}番{matched_go}号"
+        corpus.append((address, matched))
+    return corpus
+
+
+def benchmark_cases(normalizer: AddressNormalizer) -> Dict[str, Callable[[Tuple[str, str]], object]]:
+    """測定する関数（住所の組を受け取って1回処理する関数）"""
+    def candidates(matched):
+        # 同じ都道府県の候補と、類似度の低い候補を混ぜる
+        return ([matched] + [matched[:-3] + f"{number}号" for number in range(CANDIDATE_COUNT - 2)]
+                + ['北海道札幌市中央区北1条西2丁目'])
+
+    def improve(pair):
+        return improve_address_matching(pair[0], candidates(pair[1]))
+
+    def improve_legacy(pair):
+        return improve_address_matching(pair[0], candidates(pair[1]), metric='legacy')
+
+    return {
+        'normalize_address_numbers': lambda pair: normalize_address_numbers(pair[0]),
+        'extract_prefecture': lambda pair: extract_prefecture(pair[0]),
+        'normalize_city_name_with_history': lambda pair: normalize_city_name_with_history(pair[0]),
+        'AddressNormalizer.normalize': lambda pair: normalizer.normalize(pair[0]),
+        'calculate_address_similarity': lambda pair: calculate_address_similarity(*pair),
+        'analyze_address_match_level': lambda pair: analyze_address_match_level(*pair),
+        'improve_address_matching': improve,
+        'improve_address_matching[legacy]': improve_legacy
+    }
+
+
+def measure(function: Callable, corpus: List[Tuple[str, str]], repeat: int = 1) -> Dict[str, float]:
+    """
+    1つの関数の処理速度とメモリ割り当てを測定する
+
+    処理速度は repeat 回のうち最速の回、メモリ割り当ては先頭 ALLOCATION_SAMPLE 件の
+    結果を保持したまま処理した時のピーク（1件あたり）。
+
+    Returns:
+    --------
+    Dict[str, float]
+        ops, seconds, ops_per_sec, alloc_bytes_per_op
+    """
+    # 初回のみの読み込み（インデックスなど）を測定から除く
+    function(corpus[0])
+
+    # 正規化のメモは測定ごとに消去する（コーパス内で重複した住所だけがヒットする）
+    best = None
+    for _ in range(repeat):
+        clear_memo_caches()
+        start = time.perf_counter()
+        for pair in corpus:
+            function(pair)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    sample = corpus[:ALLOCATION_SAMPLE]
+    clear_memo_caches()
+    tracemalloc.start()
+    try:
+        results = [function(pair) for pair in sample]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del results
+
+    return {
+        'ops': len(corpus),
+        'seconds': best,
+        'ops_per_sec': len(corpus) / best if best else None,
+        'alloc_bytes_per_op': peak / len(sample)
+    }
+
+
+def run_benchmarks(
+    sizes=DEFAULT_SIZES,
+    functions: Optional[List[str]] = None,
+    repeat: int = 1,
+    seed: int = 0,
+    verbose: bool = True
+) -> Dict:
+    """
+    全ての関数を各件数で測定する
+
+    Parameters:
+    -----------
+    sizes : Iterable[int]
+        住所の件数
+    functions : List[str], optional
+        測定する関数の名前（省略時は全て）
+    repeat : int
+        処理速度を測る回数（最速の回を使う）
+    seed : int
+        乱数のシード
+    verbose : bool
+        測定ごとに結果を表示するかどうか
+
+    Returns:
+    --------
+    Dict
+        meta（測定環境）と results（"関数名@件数" → 測定結果）
+    """
+    normalizer = AddressNormalizer(MAPPING_FILE)
+    cases = benchmark_cases(normalizer)
+    if functions:
+        unknown = set(functions) - set(cases)
+        if unknown:
+            raise ValueError(f"測定できない関数です: {', '.join(sorted(unknown))}")
+        cases = {name: cases[name] for name in functions}
+
+    results = {}
+    for size in sizes:
+        corpus = generate_corpus(size, seed)
+        for name, function in cases.items():
+            result = measure(function, corpus, repeat)
+            results[f"{name}@{size}"] = result
+            if verbose:
+                print(f"{name}@{size}: {result['ops_per_sec']:,.0f}件/秒, "
+                      f"{result['alloc_bytes_per_op']:,.0f}バイト/件")
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'sizes': list(sizes),
+            'repeat': repeat,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def save_baseline(report: Dict, baseline_file: str):
+    """測定結果をベースラインとしてJSONファイルに保存する"""
+    with open(baseline_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_baseline(baseline_file: str) -> Dict:
+    """ベースラインのJSONファイルを読み込む"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_reports(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    ベースラインと比較して、閾値を超えて劣化した項目を返す
+
+    処理速度（ops_per_sec）が threshold の割合より下がったもの、
+    1件あたりのメモリ割り当て（alloc_bytes_per_op）が threshold の割合より増えたものを劣化とする。
+    ベースラインにない項目は比較しない。
+
+    Returns:
+    --------
+    List[Dict]
+        name, metric, baseline, current, change（変化の割合）のリスト
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        for metric, worse_when_higher in (('ops_per_sec', False), ('alloc_bytes_per_op', True)):
+            before, after = base.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (change > threshold) if worse_when_higher else (change < -threshold):
+                regressions.append({
+                    'name': name,
+                    'metric': metric,
+                    'baseline': before,
+                    'current': after,
+                    'change': change
+                })
+    return regressions
+
+
+def main():
+    """性能測定のコマンド（比較モードで劣化があった場合は終了コード1）"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='住所の正規化・類似度計算の性能測定')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='住所の件数（カンマ区切り、例: 1000,100000,1000000）')
+    parser.add_argument('--functions', help='測定する関数の名前（カンマ区切り、省略時は全て）')
+    parser.add_argument('--repeat', type=int, default=1, help='処理速度を測る回数（最速の回を使う）')
+    parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+    parser.add_argument('--save', help='結果をベースラインとして保存するJSONファイル')
+    parser.add_argument('--compare', help='比較するベースラインのJSONファイル')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='劣化とみなす変化の割合（既定0.1 = 10%%）')
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        sizes=[int(size) for size in args.sizes.split(',')],
+        functions=args.functions.split(',') if args.functions else None,
+        repeat=args.repeat,
+        seed=args.seed
+    )
+    if args.save:
+        save_baseline(report, args.save)
+        print(f"ベースラインを保存しました: {args.save}")
+
+    if args.compare:
+        regressions = compare_reports(load_baseline(args.compare), report, args.threshold)
+        if not regressions:
+            print(f"劣化はありません（閾値 {args.threshold:.0%}）")
+            return
+        print(f"\n=== 性能の劣化（閾値 {args.threshold:.0%}） ===")
+        for regression in regressions:
+            print(f"{regression['name']} {regression['metric']}: "
+                  f"{regression['baseline']:,.1f} → {regression['current']:,.1f}（{regression['change']:+.1%}）")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,432 @@
+"""
+市区町村マッピングのバイナリインデックス
+
+市区町村マッピング.json（または合併市区町村のCSV）を解決テーブルに変換し、
+文字列テーブルとオフセット配列からなるバイナリファイルとして保存する。
+インデックスはメモリマップで開き、最初に使われたときに読み込む。
+元ファイルのハッシュが変わった場合は自動的に再構築する（サイズと更新日時が
+作成時と同じ場合はハッシュを計算しない）。
+
+ファイル構成（リトルエンディアン、uint32単位）:
+    ヘッダー         : magic, version, 文字列数, エントリ数, 経路数, 変更数, 区間数,
+                       元ファイルのSHA-256, 元ファイルのサイズ, 元ファイルの更新日時（ナノ秒）
+    文字列オフセット : 文字列数 + 1
+    エントリ         : 10 × エントリ数（旧名称のバイト列順）
+                       (旧名称, 現在の名称, 最後の合併日, 循環フラグ,
+                        経路の開始位置, 経路の長さ, 変更の開始位置, 変更の長さ,
+                        区間の開始位置, 区間の長さ)
+    経路             : 2 × 経路数 (市区町村名, 合併日)
+    変更             : 2 × 変更数 (新市区町村名, 合併日) ※元のマッピングの並び順
+    区間             : 2 × 区間数 (開始日の通し番号, 市区町村名)
+    文字列本体       : UTF-8
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+from city_mapping import (
+    MAPPING_FILE,
+    CityIntervals,
+    CityResolution,
+    city_name_as_of,
+    compile_city_intervals,
+    compile_city_mapping,
+    load_mapping_source
+)
+
+INDEX_MAGIC = b'CITYIDX\0'
+# 2: 日付ごとの名称の区間リストを追加
+# 3: 合併先の自分自身へのマッピングを経路に含めない
+# 4: 元ファイルのサイズ・更新日時を追加
+INDEX_VERSION = 4
+
+# magic, version, 予約, 文字列数, エントリ数, 経路数, 変更数, 区間数, SHA-256, サイズ, 更新日時
+_HEADER = struct.Struct('<8sHHIIIII32sQq')
+_ENTRY_FIELDS = 10
+
+
+def default_index_file(source_file: str) -> str:
+    """元ファイルと同じディレクトリに置くインデックスファイルのパスを返す"""
+    return os.path.splitext(source_file)[0] + '.idx'
+
+
+def source_digest(source_file: str) -> bytes:
+    """元ファイルのSHA-256を計算する"""
+    digest = hashlib.sha256()
+    with open(source_file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def _file_mode() -> int:
+    """umask を適用した通常のファイルのパーミッション（mkstemp の0600の代わりに使う）"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def _write_atomically(index_file: str, chunks: List[bytes]):
+    """他のプロセスが読み込み中でも壊れないよう、一時ファイルに書いてから置き換える"""
+    directory = os.path.dirname(os.path.abspath(index_file))
+    fd, tmp_file = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.chmod(tmp_file, _file_mode())
+        os.replace(tmp_file, index_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def build_city_index(source_file: str = MAPPING_FILE, index_file: str = None) -> str:
+    """
+    マッピングを解決テーブルに変換し、バイナリインデックスを書き出す
+
+    Parameters:
+    -----------
+    source_file : str
+        市区町村マッピングのJSONファイル、または合併市区町村のCSVファイル
+    index_file : str, optional
+        出力先のインデックスファイル（省略時は元ファイルの拡張子を.idxにしたもの）
+
+    Returns:
+    --------
+    str
+        書き出したインデックスファイルのパス
+    """
+    index_file = index_file or default_index_file(source_file)
+    # ハッシュの計算中に変更された場合に次回再計算されるよう、先にサイズと更新日時を取得する
+    stat = os.stat(source_file)
+    digest = source_digest(source_file)
+    mapping = load_mapping_source(source_file)
+    table = compile_city_mapping(mapping)
+    intervals = compile_city_intervals(mapping)
+
+    strings: List[bytes] = []
+    string_ids: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value.encode('utf-8'))
+        return string_ids[value]
+
+    entries = []
+    chain_values = []
+    change_values = []
+    interval_values = []
+    # 出力が入力の順序によらないよう旧名称のバイト列順に並べる
+    for old_city in sorted(table, key=lambda name: name.encode('utf-8')):
+        resolution = table[old_city]
+        changes = mapping[old_city]
+        starts, names = intervals[old_city]
+        entries.extend([
+            intern(old_city),
+            intern(resolution.final_city),
+            intern(resolution.merge_date),
+            int(resolution.is_cycle),
+            len(chain_values) // 2,
+            len(resolution.chain),
+            len(change_values) // 2,
+            len(changes),
+            len(interval_values) // 2,
+            len(starts)
+        ])
+        for city, merge_date in resolution.chain:
+            chain_values.extend([intern(city), intern(merge_date)])
+        for change in changes:
+            change_values.extend([intern(change['new_city']), intern(change['merge_date'])])
+        for ordinal, name in zip(starts, names):
+            interval_values.extend([ordinal, intern(name)])
+
+    offsets = [0]
+    for value in strings:
+        offsets.append(offsets[-1] + len(value))
+
+    def pack(values: List[int]) -> bytes:
+        return struct.pack(f'<{len(values)}I', *values)
+
+    header = _HEADER.pack(
+        INDEX_MAGIC,
+        INDEX_VERSION,
+        0,
+        len(strings),
+        len(entries) // _ENTRY_FIELDS,
+        len(chain_values) // 2,
+        len(change_values) // 2,
+        len(interval_values) // 2,
+        digest,
+        stat.st_size,
+        stat.st_mtime_ns
+    )
+
+    _write_atomically(index_file, [
+        header,
+        pack(offsets),
+        pack(entries),
+        pack(chain_values),
+        pack(change_values),
+        pack(interval_values),
+        b''.join(strings)
+    ])
+    return index_file
+
+
+class CityIndex:
+    """メモリマップしたバイナリインデックスから旧市区町村名を解決する
+
+    CityResolver と同じインターフェースを持ち、文字列は参照されたときにだけ復元する。
+    """
+
+    def __init__(self, index_file: str):
+        """
+        Args:
+            index_file: インデックスファイルのパス
+        """
+        self.index_file = index_file
+        with open(index_file, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, _, n_strings, n_entries, n_chain, n_changes, n_intervals,
+         self.digest, self.source_size, self.source_mtime_ns) = _HEADER.unpack_from(self._mm, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self._mm.close()
+            raise ValueError(f"Unsupported city index: {index_file}")
+
+        n_words = ((n_strings + 1) + n_entries * _ENTRY_FIELDS
+                   + n_chain * 2 + n_changes * 2 + n_intervals * 2)
+        words = memoryview(self._mm)[_HEADER.size:_HEADER.size + n_words * 4].cast('I')
+        position = 0
+
+        def section(length: int) -> memoryview:
+            nonlocal position
+            view = words[position:position + length]
+            position += length
+            return view
+
+        self._offsets = section(n_strings + 1)
+        self._entries = section(n_entries * _ENTRY_FIELDS)
+        self._chain = section(n_chain * 2)
+        self._changes = section(n_changes * 2)
+        self._intervals = section(n_intervals * 2)
+        self._strings_start = _HEADER.size + position * 4
+        self._count = n_entries
+        self._resolved: Dict[str, CityResolution] = {}
+        self._resolved_intervals: Dict[str, CityIntervals] = {}
+        self._entry_numbers: Optional[Dict[str, int]] = None
+        self._mapping = None
+        self.cycles = [
+            self._string(self._entries[i * _ENTRY_FIELDS])
+            for i in range(n_entries)
+            if self._entries[i * _ENTRY_FIELDS + 3]
+        ]
+
+    def _string_bytes(self, string_id: int) -> bytes:
+        start = self._strings_start + self._offsets[string_id]
+        end = self._strings_start + self._offsets[string_id + 1]
+        return self._mm[start:end]
+
+    def _string(self, string_id: int) -> str:
+        return self._string_bytes(string_id).decode('utf-8')
+
+    def _find(self, city: str) -> int:
+        """
+        旧名称のエントリ番号を求める（見つからない場合は-1）
+
+        マッピングにない名称も毎回探索せずに済むよう、最初に呼ばれたときに
+        旧名称 → エントリ番号の辞書を作成する（旧名称の数だけの大きさ）。
+        """
+        if self._entry_numbers is None:
+            self._entry_numbers = {name: i for i, name in enumerate(self)}
+        return self._entry_numbers.get(city, -1)
+
+    def _pairs(self, values: memoryview, start: int, length: int) -> List[tuple]:
+        return [
+            (self._string(values[i * 2]), self._string(values[i * 2 + 1]))
+            for i in range(start, start + length)
+        ]
+
+    def resolve(self, city: str) -> Optional[CityResolution]:
+        """旧市区町村名を解決する（マッピングにない場合はNone）"""
+        if city in self._resolved:
+            return self._resolved[city]
+
+        entry = self._find(city)
+        if entry < 0:
+            return None
+        (_, final_id, date_id, is_cycle,
+         chain_start, chain_length, _, _, _, _) = self._entries[entry * _ENTRY_FIELDS:(entry + 1) * _ENTRY_FIELDS]
+        resolution = CityResolution(
+            old_city=city,
+            final_city=self._string(final_id),
+            merge_date=self._string(date_id),
+            chain=tuple(self._pairs(self._chain, chain_start, chain_length)),
+            is_cycle=bool(is_cycle)
+        )
+        # 復元した結果は旧名称の数までしか増えないので保持しておく
+        self._resolved[city] = resolution
+        return resolution
+
+    def changes(self, city: str) -> List[Dict]:
+        """元のマッピングに記録された変更のリストを返す"""
+        entry = self._find(city)
+        if entry < 0:
+            return []
+        start = self._entries[entry * _ENTRY_FIELDS + 6]
+        length = self._entries[entry * _ENTRY_FIELDS + 7]
+        return [
+            {'new_city': new_city, 'merge_date': merge_date}
+            for new_city, merge_date in self._pairs(self._changes, start, length)
+        ]
+
+    def final_city(self, city: str) -> str:
+        """現在の市区町村名を返す（マッピングにない場合はそのまま）"""
+        resolution = self.resolve(city)
+        return resolution.final_city if resolution else city
+
+    def city_intervals(self, city: str) -> Optional[CityIntervals]:
+        """名称の変遷の区間リストを返す（マッピングにない場合はNone）"""
+        if city in self._resolved_intervals:
+            return self._resolved_intervals[city]
+
+        entry = self._find(city)
+        if entry < 0:
+            return None
+        start = self._entries[entry * _ENTRY_FIELDS + 8]
+        length = self._entries[entry * _ENTRY_FIELDS + 9]
+        values = self._intervals
+        intervals = (
+            tuple(values[i * 2] for i in range(start, start + length)),
+            tuple(self._string(values[i * 2 + 1]) for i in range(start, start + length))
+        )
+        self._resolved_intervals[city] = intervals
+        return intervals
+
+    def city_as_of(self, city: str, ordinal: Optional[int]) -> str:
+        """指定日（通し番号）時点の市区町村名を返す"""
+        return city_name_as_of(self.city_intervals(city), city, ordinal)
+
+    @property
+    def mapping(self) -> Dict[str, List[Dict]]:
+        """元のマッピングを辞書として復元する（必要になったときだけ作成）"""
+        if self._mapping is None:
+            self._mapping = {city: self.changes(city) for city in self}
+        return self._mapping
+
+    def __contains__(self, city: str) -> bool:
+        return self.resolve(city) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._string(self._entries[i * _ENTRY_FIELDS])
+
+
+def _refresh_source_stat(index: CityIndex, stat: os.stat_result):
+    """内容（ハッシュ）が同じ元ファイルのサイズ・更新日時をインデックスのヘッダーに書き直す"""
+    data = bytearray(index._mm)
+    fields = _HEADER.unpack_from(data, 0)[:-2]
+    _HEADER.pack_into(data, 0, *fields, stat.st_size, stat.st_mtime_ns)
+    _write_atomically(index.index_file, [bytes(data)])
+
+
+def _open_current_index(index_file: str, source_file: str, stat: os.stat_result) -> Optional[CityIndex]:
+    """元ファイルから作成したインデックスが最新であれば開く（ない場合や古い場合はNone）"""
+    if not os.path.exists(index_file):
+        return None
+    try:
+        index = CityIndex(index_file)
+        if (index.source_size, index.source_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return index
+        # 更新日時だけが変わった場合（チェックアウトし直した場合など）は内容で判定し、
+        # 次回からハッシュを計算しないようヘッダーのサイズ・更新日時を書き直す
+        if index.digest == source_digest(source_file):
+            try:
+                _refresh_source_stat(index, stat)
+            except OSError:
+                pass
+            return index
+    except (ValueError, struct.error, OSError):
+        pass
+    return None
+
+
+def open_city_index(source_file: str = MAPPING_FILE, index_file: str = None) -> CityIndex:
+    """
+    インデックスを開く。存在しない場合や元ファイルが変更されている場合は再構築する
+
+    元ファイルのサイズと更新日時が作成時と同じ場合は、ハッシュを計算せずにそのまま使う。
+    index_file に書き込めず一時ディレクトリに作成したインデックスがあれば、再構築せずにそれを使う。
+
+    Parameters:
+    -----------
+    source_file : str
+        市区町村マッピングのJSONファイル、または合併市区町村のCSVファイル
+    index_file : str, optional
+        インデックスファイルのパス（省略時は元ファイルの拡張子を.idxにしたもの）
+
+    Returns:
+    --------
+    CityIndex
+        メモリマップしたインデックス
+    """
+    index_file = index_file or default_index_file(source_file)
+    fallback_file = os.path.join(tempfile.gettempdir(), os.path.basename(index_file))
+    stat = os.stat(source_file)
+
+    for candidate in dict.fromkeys([index_file, fallback_file]):
+        index = _open_current_index(candidate, source_file, stat)
+        if index is not None:
+            return index
+
+    try:
+        build_city_index(source_file, index_file)
+    except OSError as e:
+        # パッケージのディレクトリに書き込めない場合は一時ディレクトリに作成する
+        print(f"Warning: Failed to write {index_file}: {e}")
+        index_file = fallback_file
+        build_city_index(source_file, index_file)
+    return CityIndex(index_file)
+
+
+# プロセス内で共有するインデックス（最初に使われたときに開く）
+_city_index: Optional[CityIndex] = None
+
+
+def get_city_index() -> CityIndex:
+    """パッケージに同梱された市区町村マッピングのインデックスを返す"""
+    global _city_index
+    if _city_index is None:
+        _city_index = open_city_index(MAPPING_FILE)
+    return _city_index
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='市区町村マッピングのバイナリインデックスを作成する')
+    parser.add_argument('source', nargs='?', default=MAPPING_FILE,
+                        help='市区町村マッピングのJSONファイル、または合併市区町村のCSVファイル')
+    parser.add_argument('-o', '--output', help='出力するインデックスファイル')
+    args = parser.parse_args()
+
+    index_file = build_city_index(args.source, args.output)
+    index = CityIndex(index_file)
+    print(f"インデックスを作成しました: {index_file}")
+    print(f"- 旧市区町村数: {len(index)}")
+    print(f"- ファイルサイズ: {os.path.getsize(index_file):,} bytes")
+    if index.cycles:
+        print(f"- 循環している市区町村: {', '.join(index.cycles)}")
+
+if __name__ == '__main__':
+    main()
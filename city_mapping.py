@@ -0,0 +1,372 @@
+"""
+市区町村マッピングの読み込みと解決テーブルの構築
+"""
+
+import csv
+import json
+import os
+import re
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# マッピングファイルは実行時のカレントディレクトリではなくパッケージからの相対パスで解決する
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAPPING_FILE = os.path.join(PACKAGE_DIR, '市区町村マッピング.json')
+
+# 元号の変換テーブル
+ERA_TABLE = {
+    '平成': 1989,
+    '令和': 2019
+}
+
+_JAPANESE_DATE_PATTERN = re.compile(r'(平成|令和)(\d+)年(\d+)月(\d+)日')
+
+
+def convert_japanese_date(japanese_date: str) -> str:
+    """
+    和暦の日付を西暦に変換
+    例：平成17年3月1日 → 2005-03-01
+    """
+    # 数字を抽出
+    match = _JAPANESE_DATE_PATTERN.match(japanese_date)
+    if not match:
+        return '9999-12-31'  # 変換できない場合は遠い未来の日付を返す
+
+    era, year, month, day = match.groups()
+    year = int(year)
+    month = int(month)
+    day = int(day)
+
+    # 西暦に変換
+    western_year = ERA_TABLE[era] + year - 1
+
+    # YYYY-MM-DD形式に変換
+    return f'{western_year:04d}-{month:02d}-{day:02d}'
+
+
+def japanese_date_to_ordinal(japanese_date: str) -> int:
+    """
+    和暦の日付を日付の通し番号（date.toordinal）に変換
+    変換できない場合は 9999-12-31 の通し番号を返す
+    """
+    return date.fromisoformat(convert_japanese_date(japanese_date)).toordinal()
+
+
+def date_to_ordinal(value: Union[str, date, datetime, None]) -> Optional[int]:
+    """
+    基準日を日付の通し番号に変換する
+
+    Parameters:
+    -----------
+    value : str, date or datetime
+        基準日（YYYY-MM-DD形式の文字列、date、datetime、pandas.Timestamp）
+
+    Returns:
+    --------
+    Optional[int]
+        日付の通し番号（基準日がない場合はNone）
+    """
+    # None・空文字列・欠損値（NaN/NaT）は基準日なしとして扱う
+    if value is None or value == '' or value != value:
+        return None
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+# ある旧市区町村の名称の変遷
+# (開始日の通し番号のタプル, その日以降の市区町村名のタプル)
+CityIntervals = Tuple[Tuple[int, ...], Tuple[str, ...]]
+
+
+class CityResolution(NamedTuple):
+    """旧市区町村名の解決結果"""
+    old_city: str
+    # 合併を最後まで辿った現在の市区町村名
+    final_city: str
+    # 最後の合併日（和暦）
+    merge_date: str
+    # 旧名称から現在の名称までの経路 ((新市区町村名, 合併日), ...)
+    chain: Tuple[Tuple[str, str], ...]
+    # 合併の経路が循環しているかどうか
+    is_cycle: bool
+
+
+def load_mapping_file(mapping_file: str = MAPPING_FILE) -> Dict[str, List[Dict]]:
+    """
+    市区町村マッピングのJSONファイルから旧名称ごとの変更リストを読み込む
+
+    Parameters:
+    -----------
+    mapping_file : str
+        市区町村マッピングのJSONファイルパス
+
+    Returns:
+    --------
+    Dict[str, List[Dict]]
+        旧市区町村名 → [{new_city, merge_date}, ...]
+    """
+    with open(mapping_file, 'r', encoding='utf-8') as f:
+        return json.load(f).get('mapping', {})
+
+
+def load_mapping_csv(csv_file: str) -> Dict[str, List[Dict]]:
+    """
+    合併市区町村のCSV（合併日, 都道府県, 新市区町村, 旧市区町村）から
+    旧名称ごとの変更リストを読み込む
+
+    temp_backup/create_city_mapping.py と同じ規則でマッピングを作成する。
+
+    Parameters:
+    -----------
+    csv_file : str
+        合併市区町村のCSVファイルパス
+
+    Returns:
+    --------
+    Dict[str, List[Dict]]
+        旧市区町村名 → [{new_city, merge_date}, ...]
+    """
+    mapping = defaultdict(list)
+    with open(csv_file, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # ヘッダーをスキップ
+
+        for row in reader:
+            if len(row) < 4:
+                continue
+            merge_date, prefecture, new_city, old_city = (value.strip() for value in row[:4])
+            if not all([merge_date, prefecture, new_city, old_city]):
+                continue
+            mapping[f"{prefecture}{old_city}"].append({
+                "new_city": f"{prefecture}{new_city}",
+                "merge_date": merge_date
+            })
+    return dict(mapping)
+
+
+def load_mapping_source(source_file: str) -> Dict[str, List[Dict]]:
+    """拡張子に応じてJSONまたはCSVのマッピングを読み込む"""
+    if source_file.lower().endswith('.csv'):
+        return load_mapping_csv(source_file)
+    return load_mapping_file(source_file)
+
+
+def _sorted_changes(mapping: Dict[str, List[Dict]]) -> Dict[str, List[Tuple[int, str, str]]]:
+    """
+    旧名称ごとの変更を合併日の通し番号順に並べる（同日の場合は元のリストの順）
+
+    Returns:
+    --------
+    Dict[str, List[Tuple[int, str, str]]]
+        旧市区町村名 → [(合併日の通し番号, 新市区町村名, 合併日), ...]
+    """
+    return {
+        old_city: sorted(
+            ((japanese_date_to_ordinal(change['merge_date']), change['new_city'], change['merge_date'])
+             for change in changes),
+            key=lambda change: change[0]
+        )
+        for old_city, changes in mapping.items()
+        if changes
+    }
+
+
+def compile_city_mapping(mapping: Dict[str, List[Dict]]) -> Dict[str, CityResolution]:
+    """
+    旧市区町村名ごとに合併を最後まで辿り、解決テーブルを作成する
+
+    A→B、B→Cのように複数回合併した場合もAを直接Cに解決する。
+    自分自身へのマッピング（例：長崎県諫早市 → 長崎県諫早市）は終点として扱い、
+    循環しているマッピングは循環の直前で打ち切って is_cycle を立てる。
+
+    Parameters:
+    -----------
+    mapping : Dict[str, List[Dict]]
+        旧市区町村名 → [{new_city, merge_date}, ...]
+
+    Returns:
+    --------
+    Dict[str, CityResolution]
+        旧市区町村名 → 解決結果
+    """
+    # 各名称の直後の合併先（合併日が最も新しい変更）を先に求めておく
+    successors = {
+        old_city: {'new_city': changes[-1][1], 'merge_date': changes[-1][2]}
+        for old_city, changes in _sorted_changes(mapping).items()
+    }
+
+    table = {}
+    for old_city in successors:
+        chain = []
+        visited = {old_city}
+        current = old_city
+        is_cycle = False
+        while current in successors:
+            change = successors[current]
+            new_city = change['new_city']
+            if new_city == current:
+                # 自分自身へのマッピングは旧名称自身の場合だけ経路に含める
+                if not chain:
+                    chain.append((new_city, change['merge_date']))
+                break
+            chain.append((new_city, change['merge_date']))
+            if new_city in visited:
+                is_cycle = True
+                chain.pop()
+                break
+            visited.add(new_city)
+            current = new_city
+
+        if not chain:
+            continue
+        table[old_city] = CityResolution(
+            old_city=old_city,
+            final_city=chain[-1][0],
+            merge_date=chain[-1][1],
+            chain=tuple(chain),
+            is_cycle=is_cycle
+        )
+    return table
+
+
+def compile_city_intervals(mapping: Dict[str, List[Dict]]) -> Dict[str, CityIntervals]:
+    """
+    旧市区町村名ごとに「ある日付時点での名称」を二分探索で引ける区間リストを作成する
+
+    各合併日の時点で合併を辿った名称を求め、名称が変わる日付だけを残す。
+    最初の区間より前の日付では旧名称のままとなる。
+
+    Parameters:
+    -----------
+    mapping : Dict[str, List[Dict]]
+        旧市区町村名 → [{new_city, merge_date}, ...]
+
+    Returns:
+    --------
+    Dict[str, CityIntervals]
+        旧市区町村名 → (開始日の通し番号のタプル, 市区町村名のタプル)
+    """
+    changes_by_city = _sorted_changes(mapping)
+
+    def name_as_of(city: str, ordinal: int) -> str:
+        visited = {city}
+        while True:
+            valid = [change for change in changes_by_city.get(city, []) if change[0] <= ordinal]
+            if not valid:
+                return city
+            new_city = valid[-1][1]
+            # 自分自身へのマッピングは終点、循環している場合は循環の直前で打ち切る
+            if new_city == city or new_city in visited:
+                return city
+            visited.add(new_city)
+            city = new_city
+
+    intervals = {}
+    for old_city in changes_by_city:
+        # 合併を辿って到達する全ての合併日が名称の変わりうる日付
+        breakpoints = set()
+        stack = [old_city]
+        seen = {old_city}
+        while stack:
+            for ordinal, new_city, _ in changes_by_city.get(stack.pop(), []):
+                breakpoints.add(ordinal)
+                if new_city not in seen:
+                    seen.add(new_city)
+                    stack.append(new_city)
+
+        starts = []
+        names = []
+        for ordinal in sorted(breakpoints):
+            name = name_as_of(old_city, ordinal)
+            if not names or names[-1] != name:
+                starts.append(ordinal)
+                names.append(name)
+        intervals[old_city] = (tuple(starts), tuple(names))
+    return intervals
+
+
+def city_name_as_of(intervals: Optional[CityIntervals], city: str, ordinal: Optional[int]) -> str:
+    """
+    区間リストから指定日時点の市区町村名を二分探索で求める
+
+    Parameters:
+    -----------
+    intervals : CityIntervals or None
+        compile_city_intervals で作成した区間リスト
+    city : str
+        旧市区町村名
+    ordinal : int or None
+        基準日の通し番号（Noneの場合は最新の名称）
+
+    Returns:
+    --------
+    str
+        指定日時点の市区町村名
+    """
+    if not intervals:
+        return city
+    starts, names = intervals
+    if ordinal is None:
+        return names[-1]
+    position = bisect_right(starts, ordinal) - 1
+    return names[position] if position >= 0 else city
+
+
+class CityResolver:
+    """旧市区町村名から現在の市区町村名をO(1)で引く解決テーブル"""
+
+    def __init__(self, mapping: Dict[str, List[Dict]]):
+        """
+        Args:
+            mapping: 旧市区町村名 → [{new_city, merge_date}, ...]
+        """
+        self.mapping = mapping
+        self.table = compile_city_mapping(mapping)
+        self.intervals = compile_city_intervals(mapping)
+        self.cycles = [
+            resolution.old_city
+            for resolution in self.table.values()
+            if resolution.is_cycle
+        ]
+        if self.cycles:
+            print(f"Warning: 合併履歴が循環している市区町村があります: {', '.join(self.cycles)}")
+
+    @classmethod
+    def from_file(cls, mapping_file: str = MAPPING_FILE) -> 'CityResolver':
+        """マッピングファイル（JSONまたはCSV）から解決テーブルを作成する"""
+        return cls(load_mapping_source(mapping_file))
+
+    def resolve(self, city: str) -> Optional[CityResolution]:
+        """旧市区町村名を解決する（マッピングにない場合はNone）"""
+        return self.table.get(city)
+
+    def changes(self, city: str) -> List[Dict]:
+        """元のマッピングに記録された変更のリストを返す"""
+        return self.mapping.get(city, [])
+
+    def final_city(self, city: str) -> str:
+        """現在の市区町村名を返す（マッピングにない場合はそのまま）"""
+        resolution = self.table.get(city)
+        return resolution.final_city if resolution else city
+
+    def city_intervals(self, city: str) -> Optional[CityIntervals]:
+        """名称の変遷の区間リストを返す（マッピングにない場合はNone）"""
+        return self.intervals.get(city)
+
+    def city_as_of(self, city: str, ordinal: Optional[int]) -> str:
+        """指定日（通し番号）時点の市区町村名を返す"""
+        return city_name_as_of(self.intervals.get(city), city, ordinal)
+
+    def __contains__(self, city: str) -> bool:
+        return city in self.table
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.table)
@@ -0,0 +1,118 @@
+"""
+市区町村名の最長一致検索用トライ
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 終端ノードに格納する登録済み文字列のキー
+_TERMINAL = ''
+
+
+class CityNameTrie:
+    """旧市区町村名の集合から構築する文字単位のトライ
+
+    住所を左から一度だけ走査し、各位置で最長一致する名称を見つけ、
+    同じ走査の中で置換後の文字列を組み立てる。
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        """
+        Args:
+            names: 登録する名称のリスト
+        """
+        self.root: Dict[str, dict] = {}
+        self.size = 0
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str) -> None:
+        """名称を1件登録する"""
+        if not name:
+            return
+        node = self.root
+        for char in name:
+            node = node.setdefault(char, {})
+        if _TERMINAL not in node:
+            self.size += 1
+        node[_TERMINAL] = name
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, name: str) -> bool:
+        node = self.root
+        for char in name:
+            node = node.get(char)
+            if node is None:
+                return False
+        return _TERMINAL in node
+
+    def longest_match(self, text: str, start: int = 0) -> Optional[str]:
+        """
+        text の start 位置から始まる最長一致の名称を返す
+
+        Args:
+            text: 検索対象の文字列
+            start: 検索開始位置
+        Returns:
+            Optional[str]: 一致した名称（一致しない場合はNone）
+        """
+        node = self.root
+        found = None
+        for i in range(start, len(text)):
+            node = node.get(text[i])
+            if node is None:
+                break
+            if _TERMINAL in node:
+                found = node[_TERMINAL]
+        return found
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """
+        重ならない最長一致を左から順に列挙する
+
+        Args:
+            text: 検索対象の文字列
+        Returns:
+            List[Tuple[int, str]]: (開始位置, 一致した名称) のリスト
+        """
+        matches = []
+        root = self.root
+        i = 0
+        length = len(text)
+        while i < length:
+            if text[i] in root:
+                found = self.longest_match(text, i)
+                if found:
+                    matches.append((i, found))
+                    i += len(found)
+                    continue
+            i += 1
+        return matches
+
+    def replace(self, text: str, replacer: Callable[[str], Optional[str]]) -> Tuple[str, List[str]]:
+        """
+        一度の走査で一致した名称を置換する
+
+        Args:
+            text: 置換対象の文字列
+            replacer: 一致した名称を受け取り、置換後の文字列を返す関数。
+                Noneを返した場合は置換しない
+        Returns:
+            Tuple[str, List[str]]: (置換後の文字列, 置換した名称のリスト)
+        """
+        parts = []
+        replaced = []
+        last = 0
+        for pos, name in self.find_all(text):
+            new = replacer(name)
+            if new is None:
+                continue
+            parts.append(text[last:pos])
+            parts.append(new)
+            replaced.append(name)
+            last = pos + len(name)
+        if not replaced:
+            return text, replaced
+        parts.append(text[last:])
+        return ''.join(parts), replaced
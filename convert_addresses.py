@@ -3,24 +3,158 @@
 """
 
 import pandas as pd
-from gsi_geocoder import process_dataframe
+from gsi_geocoder import DEFAULT_CACHE_FILE, GsiGeocoder, import_legacy_cache, process_dataframe
+from geocode_cache import open_geocode_cache
 import sys
 import time
 import os
+import json
+import signal
+import tempfile
+import multiprocessing
+import multiprocessing.util
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from queue import Empty
 from math import ceil
 from datetime import datetime
-from address_utils import is_valid_prefecture
+from address_series import add_prefecture
+from rate_control import partitioned_rate_controller
+from result_dataset import write_result_batch
+
+# 入力ファイルとバッチサイズ
+INPUT_FILE = 'sample_restaurants.csv'
+BATCH_SIZE = 10000
+
+# 実行の進捗を記録するファイル（--resume で続きから再開する）
+MANIFEST_FILE = 'geocoding_run.json'
+
+# 出力形式（csv: バッチごとのCSV、parquet: 都道府県・match_status で分割した1つのParquetデータセット）
+OUTPUT_FORMATS = ('csv', 'parquet')
+
+# ワーカープロセスが進捗をまとめて送る行数
+PROGRESS_INTERVAL = 100
+
+def write_csv_atomically(df, output_file):
+    """データフレームを一時ファイルに書き込んでからCSVファイルに置き換える"""
+    directory = os.path.dirname(os.path.abspath(output_file))
+    fd, temp_file = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            df.to_csv(f, index=False)
+        os.replace(temp_file, output_file)
+    except BaseException:
+        os.unlink(temp_file)
+        raise
+
+class RunManifest:
+    """
+    実行の進捗（完了したバッチ・処理済みの行数・出力ファイル）を記録するファイル
+    
+    バッチが完了するたびに一時ファイルから置き換えて保存するため、
+    中断した場合も最後に完了したバッチまでの記録が残る。
+    """
+    
+    def __init__(self, manifest_file, data):
+        self.manifest_file = manifest_file
+        self.data = data
+    
+    @classmethod
+    def start(cls, manifest_file, input_file, chunk_size, stream, timestamp, output_format='csv'):
+        """新しい実行の記録を作成する"""
+        manifest = cls(manifest_file, {
+            'timestamp': timestamp,
+            'input_file': os.path.abspath(input_file),
+            'input_signature': cls.input_signature(input_file),
+            'chunk_size': chunk_size,
+            'stream': stream,
+            'output_format': output_format,
+            'status': 'running',
+            'completed_batches': [],
+            'rows_done': 0,
+            'low_similarity_count': 0,
+            'output_files': [],
+            'output_bytes': 0
+        })
+        manifest.save()
+        return manifest
+    
+    @classmethod
+    def load(cls, manifest_file):
+        """記録を読み込む（ファイルがない場合は None）"""
+        if not os.path.exists(manifest_file):
+            return None
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return cls(manifest_file, json.load(f))
+    
+    @staticmethod
+    def input_signature(input_file):
+        """入力ファイルが変わっていないことの確認に使う（大きさ, 更新時刻）"""
+        stat = os.stat(input_file)
+        return [stat.st_size, stat.st_mtime_ns]
+    
+    def mismatch(self, input_file, chunk_size, stream, output_format='csv'):
+        """再開できない理由（同じ入力・設定の場合は None）"""
+        if self.data['input_file'] != os.path.abspath(input_file):
+            return f"入力ファイルが違います（前回: {self.data['input_file']}）"
+        if self.data['input_signature'] != self.input_signature(input_file):
+            return "前回の実行の後に入力ファイルが変更されています"
+        if self.data['chunk_size'] != chunk_size:
+            return f"バッチサイズが違います（前回: {self.data['chunk_size']}）"
+        if self.data['stream'] != stream:
+            return "--stream の指定が前回と違います"
+        if self.data.get('output_format', 'csv') != output_format:
+            return f"出力形式が違います（前回: {self.data.get('output_format', 'csv')}）"
+        return None
+    
+    def is_completed(self, batch_num):
+        return batch_num in self.data['completed_batches']
+    
+    def complete_batch(self, batch_num, rows, low_similarity_count, output_file=None, output_bytes=None):
+        """バッチの完了を記録する（出力ファイルを書き終えた後に呼び出す）"""
+        self.data['completed_batches'].append(batch_num)
+        self.data['rows_done'] += rows
+        self.data['low_similarity_count'] += low_similarity_count
+        if output_file and output_file not in self.data['output_files']:
+            self.data['output_files'].append(output_file)
+        if output_bytes is not None:
+            self.data['output_bytes'] = output_bytes
+        self.save()
+    
+    def set_status(self, status):
+        self.data['status'] = status
+        self.save()
+    
+    def save(self):
+        """記録を一時ファイルに書き込んでから置き換える"""
+        directory = os.path.dirname(os.path.abspath(self.manifest_file))
+        fd, temp_file = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.manifest_file)
+        except BaseException:
+            os.unlink(temp_file)
+            raise
 
 class ProgressTracker:
     def __init__(self, total):
+        # total が None の場合は件数のみ表示する
         self.total = total
         self.current = 0
         self.start_time = time.time()
     
-    def update(self, message):
-        self.current += 1
+    def update(self, message, count=1):
+        self.current += count
+        if message:
+            print(message)
         # 進捗情報は最終行のみ更新
-        progress = self.current / self.total * 100
+        if self.total is None:
+            sys.stdout.write(f'\r処理進捗: {self.current}件')
+            sys.stdout.flush()
+            return
+        progress = self.current / self.total * 100 if self.total else 100.0
         sys.stdout.write(f'\r処理進捗: {self.current}/{self.total} ({progress:.1f}%)')
         sys.stdout.flush()
         
@@ -28,39 +162,46 @@ class ProgressTracker:
             sys.stdout.write('\n')
             sys.stdout.flush()
 
-def process_batch(df_batch, batch_num, timestamp, progress):
-    """バッチ単位でデータを処理する"""
+def output_path(timestamp, output_format, batch_num=None):
+    """出力ファイル（csv）またはデータセットのディレクトリ（parquet）のパス"""
+    if output_format == 'parquet':
+        return f'geocoding_results_{timestamp}'
+    return f'geocoding_results_{timestamp}_batch_{str(batch_num).zfill(2)}.csv'
+
+def process_batch(df_batch, batch_num, timestamp, progress, geocoder=None, output_format='csv'):
+    """
+    バッチ単位でデータを処理する（geocoder を指定した場合は全バッチで共有する）
+    
+    output_format が 'csv' の場合はバッチごとのCSV、'parquet' の場合はParquetデータセットに書き出す。
+    None の場合は書き出さない（output_file は None）
+    """
     def progress_callback(store_name: str, address: str, result: dict) -> None:
         """住所処理の進捗を表示するコールバック関数"""
         # 類似度が0.2未満の場合のみ詳細を表示
         similarity = result.get('similarity', 0.0)
         store_code = result.get('store_code', '不明')
         
+        message = ""
         if similarity < 0.2:
-            print(f"\n低類似度アラート（{similarity:.2f}）:")
-            print(f"店舗コード: {store_code}")
-            print(f"店舗名: {store_name}")
-            print(f"入力住所: {address}")
-            print(f"マッチした住所: {result.get('matched_address', '不明')}")
-            print(f"緯度経度: {result.get('latitude', '不明')}, {result.get('longitude', '不明')}")
+            message = "\n".join([
+                f"\n低類似度アラート（{similarity:.2f}）:",
+                f"店舗コード: {store_code}",
+                f"店舗名: {store_name}",
+                f"入力住所: {address}",
+                f"マッチした住所: {result.get('matched_address', '不明')}",
+                f"緯度経度: {result.get('latitude', '不明')}, {result.get('longitude', '不明')}"
+            ])
         
-        # 進捗バーの更新（表示なし）
-        progress.update("")
+        # 進捗バーの更新（アラートがある場合は先に表示）
+        progress.update(message)
 
-    output_file = f'geocoding_results_{timestamp}_batch_{str(batch_num).zfill(2)}.csv'
+    output_file = output_path(timestamp, output_format, batch_num) if output_format else None
     
-    # 都道府県情報を住所に追加
+    # 都道府県情報を住所に追加（有効な都道府県名で、住所が都道府県名で始まっていない場合のみ）
     df_batch = df_batch.copy()
-    df_batch['normalized_address'] = df_batch.apply(
-        lambda row: (
-            f"{str(row['PREFECTURE'])}{row['ADDRESS']}" 
-            if pd.notna(row['PREFECTURE']) and pd.notna(row['ADDRESS']) 
-               and is_valid_prefecture(str(row['PREFECTURE']))  # 有効な都道府県名かどうかをチェック
-               and not str(row['ADDRESS']).startswith(str(row['PREFECTURE']))
-            else str(row['ADDRESS'])
-        ),
-        axis=1
-    )
+    df_batch['normalized_address'] = add_prefecture(df_batch['PREFECTURE'], df_batch['ADDRESS'])
+    # 都道府県名は種類が少ないためカテゴリ型にする（結果のデータフレームの使用メモリを減らす）
+    df_batch['PREFECTURE'] = df_batch['PREFECTURE'].astype('category')
     
     # 緯度経度の取得
     result_df = process_dataframe(
@@ -68,64 +209,364 @@ def process_batch(df_batch, batch_num, timestamp, progress):
         address_column='normalized_address',  # 都道府県を含む正規化された住所を使用
         store_code_column='SAKAYA_DEALER_CODE',
         store_name_column='SAKAYA_DEALER_NAME',
-        output_file=output_file,
-        progress_callback=progress_callback
+        progress_callback=progress_callback,
+        geocoder=geocoder
     )
     
+    if output_format == 'parquet':
+        # ファイル名はバッチ番号で決まり、処理し直した場合は上書きする
+        write_result_batch(result_df, output_file, batch_num)
+    elif output_file:
+        # 書き出し途中で中断しても不完全なファイルが残らないよう、一時ファイルから置き換える
+        write_csv_atomically(result_df, output_file)
+    
     return result_df, output_file
 
-def main():
-    BATCH_SIZE = 10000  # バッチサイズを10000に変更
+class QueueProgress:
+    """ワーカープロセスの進捗を親プロセスに送る（ProgressTracker と同じ update を持つ）"""
     
-    # 実行時のタイムスタンプを取得（YYYYMMDDHHmm形式）
-    timestamp = datetime.now().strftime('%Y%m%d%H%M')
+    def __init__(self, queue, interval=PROGRESS_INTERVAL):
+        self.queue = queue
+        self.interval = interval
+        self.pending = 0
     
-    # サンプルデータの読み込み
-    print("酒屋データを読み込み中...")
-    df = pd.read_csv('sample_restaurants.csv', encoding='utf-8')
+    def update(self, message, count=1):
+        # 行ごとに送ると遅いため、interval 行ごと（アラートはすぐ）にまとめて送る
+        self.pending += count
+        if message or self.pending >= self.interval:
+            self.queue.put((self.pending, message))
+            self.pending = 0
     
-    total_count = len(df)
-    print(f"読み込み完了: {total_count}件")
+    def flush(self):
+        if self.pending:
+            self.queue.put((self.pending, ""))
+            self.pending = 0
+
+# ワーカープロセスごとのジオコーダーと進捗の送り先（_init_worker で設定）
+_worker_geocoder = None
+_worker_progress_queue = None
+
+def _init_worker(progress_queue, workers):
+    """
+    ワーカープロセスの初期化
     
-    # バッチ数の計算
-    num_batches = ceil(total_count / BATCH_SIZE)
-    all_low_similarity = []
-    output_files = []
+    プロセスごとにHTTPセッションとキャッシュ（SQLite、WALモードで複数プロセスから読み書き可能）を開き、
+    プロセスの終了時に閉じる（未保存のキャッシュを書き込む）。以前のJSONキャッシュの取り込みは親プロセスで行う。
+    APIのリクエスト数は全プロセスの合計が1プロセスの場合と同じ範囲になるよう分け合う。
+    Ctrl+C は親プロセスだけが受け取り、処理中のバッチは最後まで処理する。
+    """
+    global _worker_geocoder, _worker_progress_queue
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _worker_geocoder = GsiGeocoder(rate_controller=partitioned_rate_controller(workers), import_legacy=False)
+    multiprocessing.util.Finalize(_worker_geocoder, _worker_geocoder.close, exitpriority=10)
+    _worker_progress_queue = progress_queue
+
+def _process_batch_in_worker(df_batch, batch_num, timestamp, output_format):
+    """
+    ワーカープロセスでバッチを処理する（キャッシュはバッチの最後に書き込まれる）
     
-    print(f"\n{num_batches}バッチに分けて処理を実行します（1バッチ={BATCH_SIZE}件）")
+    Returns:
+    --------
+    Tuple[pd.DataFrame or None, str or None, int]
+        (結果。ファイルに書き出した場合は None, 出力ファイル, 低類似度件数)
+    """
+    progress = QueueProgress(_worker_progress_queue)
+    result_df, output_file = process_batch(
+        df_batch, batch_num, timestamp, progress, _worker_geocoder, output_format
+    )
+    progress.flush()
+    low_similarity_count = int((result_df['similarity'] < 0.2).sum())
+    return (None if output_format else result_df), output_file, low_similarity_count
+
+def run_batches(batches, geocoder, timestamp, output_format, on_complete):
+    """
+    バッチを順に処理する
     
-    for batch_num in range(num_batches):
-        start_idx = batch_num * BATCH_SIZE
-        end_idx = min((batch_num + 1) * BATCH_SIZE, total_count)
-        df_batch = df.iloc[start_idx:end_idx].copy()
-        
-        print(f"\nバッチ {batch_num + 1}/{num_batches} の処理を開始（{start_idx + 1}～{end_idx}件目）")
-        
+    batches は (バッチ番号, データフレーム) を返すイテレータ。
+    バッチごとに on_complete(バッチ番号, 行数, 結果, 出力ファイル, 低類似度件数) を呼び出す。
+    """
+    for batch_num, df_batch in batches:
         # バッチごとの進捗トラッカーの初期化
         progress = ProgressTracker(len(df_batch))
+        result_df, output_file = process_batch(df_batch, batch_num, timestamp, progress, geocoder, output_format)
+        low_similarity_count = int((result_df['similarity'] < 0.2).sum())
+        on_complete(batch_num, len(df_batch), result_df, output_file, low_similarity_count)
+
+def run_batches_in_parallel(batches, workers, timestamp, output_format, on_complete, total_rows=None):
+    """
+    バッチをプロセスプールで並行して処理する
+    
+    on_complete は run_batches と同じく、バッチ番号の順に親プロセスで呼び出す
+    （完了したバッチも、前のバッチが終わるまで待つ）。
+    読み込んだまま待っているバッチは workers の2倍までのため、使用メモリは入力の行数によらない。
+    各ワーカーの進捗は1つの進捗表示にまとめる（total_rows が None の場合は件数のみ）。
+    """
+    # 以前のJSONキャッシュは、ワーカーが同時に取り込まないよう親プロセスで1回だけ取り込む
+    cache = open_geocode_cache(DEFAULT_CACHE_FILE)
+    try:
+        import_legacy_cache(cache)
+    finally:
+        cache.close()
+    
+    progress_queue = multiprocessing.Queue()
+    progress = ProgressTracker(total_rows)
+    
+    def show_progress(timeout):
+        try:
+            count, message = progress_queue.get(timeout=timeout)
+        except Empty:
+            return
+        progress.update(message, count)
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(progress_queue, workers)) as executor:
+        pending = deque()
+        batches = iter(batches)
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < workers * 2:
+                    try:
+                        batch_num, df_batch = next(batches)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = executor.submit(_process_batch_in_worker, df_batch, batch_num, timestamp, output_format)
+                    pending.append((batch_num, len(df_batch), future))
+                if not pending:
+                    break
+                
+                # 進捗を表示しながら、最も前のバッチの完了を待つ
+                batch_num, rows, future = pending[0]
+                while not future.done():
+                    show_progress(0.1)
+                pending.popleft()
+                result_df, output_file, low_similarity_count = future.result()
+                on_complete(batch_num, rows, result_df, output_file, low_similarity_count)
+        except BaseException:
+            # まだ始まっていないバッチは取り消し、処理中のバッチの終了を待つ
+            print("\n処理中のバッチの終了を待っています...")
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+    
+    # 残りの進捗を表示（件数のみの表示は最後に改行する）
+    while not progress_queue.empty():
+        show_progress(0)
+    if total_rows is None:
+        sys.stdout.write('\n')
+        sys.stdout.flush()
+
+def read_chunks(input_file, chunk_size, rows_done=0, first_chunk=1):
+    """
+    入力CSVを chunk_size 行ずつ読み込む（処理済みの rows_done 行は読み飛ばす）
+    
+    Yields:
+    -------
+    Tuple[int, pd.DataFrame]
+        (チャンク番号, データフレーム)
+    """
+    # 処理済みの行はヘッダーの次から読み飛ばす（行番号のリストを作らないよう関数で判定する）
+    reader = pd.read_csv(input_file, encoding='utf-8', chunksize=chunk_size,
+                         skiprows=(lambda line: 0 < line <= rows_done) if rows_done else None)
+    start_idx = rows_done
+    for chunk_num, df_chunk in enumerate(reader, first_chunk):
+        print(f"\nチャンク {chunk_num} の処理を開始（{start_idx + 1}～{start_idx + len(df_chunk)}件目）")
+        start_idx += len(df_chunk)
+        yield chunk_num, df_chunk
+
+def stream_addresses(input_file, output_file, geocoder, chunk_size, manifest=None, workers=1):
+    """
+    入力CSVを chunk_size 行ずつ読み込んで処理し、結果を1つのCSVに追記する
+    
+    読み込み・処理中のデータは一定数のチャンク分だけのため、使用メモリは入力の行数によらない。
+    manifest にチャンクの完了を記録し、途中まで処理済みの場合は出力を最後に完了した
+    チャンクの位置まで切り詰めてから、残りの行を処理する。
+    workers が2以上の場合はチャンクをプロセスプールで並行して処理し、入力の順に追記する
+    （geocoder は使わない）。
+    
+    Returns:
+    --------
+    Tuple[int, int]
+        (総処理件数, 低類似度件数)
+    """
+    rows_done = manifest.data['rows_done'] if manifest else 0
+    first_chunk = len(manifest.data['completed_batches']) + 1 if manifest else 1
+    totals = {
+        'rows': rows_done,
+        'low_similarity': manifest.data['low_similarity_count'] if manifest else 0
+    }
+    
+    if rows_done:
+        # 完了していないチャンクの途中までの追記を取り除く
+        with open(output_file, 'r+b') as f:
+            f.truncate(manifest.data['output_bytes'])
+        print(f"{rows_done}件目まで処理済みのため、続きから再開します")
+    chunks = read_chunks(input_file, chunk_size, rows_done, first_chunk)
+    
+    # 最初のチャンクはヘッダー付きで書き出し、以降は追記する
+    with open(output_file, 'a' if rows_done else 'w', encoding='utf-8', newline='') as f:
+        def append_chunk(chunk_num, rows, result_df, _, low_similarity_count):
+            result_df.to_csv(f, header=f.tell() == 0, index=False)
+            totals['rows'] += rows
+            totals['low_similarity'] += low_similarity_count
+            
+            # 追記した内容をディスクに書き込んでから完了を記録する
+            f.flush()
+            os.fsync(f.fileno())
+            if manifest:
+                manifest.complete_batch(chunk_num, rows, low_similarity_count, output_file, f.tell())
+            print(f"\nチャンク {chunk_num} の処理完了: {rows}件（低類似度 {low_similarity_count}件）")
         
-        # バッチ処理の実行
-        result_df, output_file = process_batch(df_batch, batch_num + 1, timestamp, progress)
-        output_files.append(output_file)
-        
-        # 低類似度データの収集
-        low_similarity_batch = result_df[result_df['similarity'] < 0.2]
-        all_low_similarity.append(low_similarity_batch)
-        
-        print(f"\nバッチ {batch_num + 1} の処理完了:")
-        print(f"処理件数: {len(df_batch)}件")
-        print(f"低類似度件数: {len(low_similarity_batch)}件")
+        if workers > 1:
+            run_batches_in_parallel(chunks, workers, None, None, append_chunk)
+        else:
+            run_batches(chunks, geocoder, None, None, append_chunk)
+    
+    return totals['rows'], totals['low_similarity']
+
+def split_batches(df, chunk_size, manifest):
+    """
+    読み込んだデータをバッチに分ける（完了済みのバッチは飛ばす）
+    
+    Yields:
+    -------
+    Tuple[int, pd.DataFrame]
+        (バッチ番号, データフレーム)
+    """
+    total_count = len(df)
+    num_batches = ceil(total_count / chunk_size)
+    print(f"\n{num_batches}バッチに分けて処理を実行します（1バッチ={chunk_size}件）")
+    
+    for batch_num in range(1, num_batches + 1):
+        start_idx = (batch_num - 1) * chunk_size
+        end_idx = min(batch_num * chunk_size, total_count)
+        if manifest.is_completed(batch_num):
+            print(f"\nバッチ {batch_num}/{num_batches} は処理済みです（{start_idx + 1}～{end_idx}件目）")
+            continue
+        print(f"\nバッチ {batch_num}/{num_batches} の処理を開始（{start_idx + 1}～{end_idx}件目）")
+        yield batch_num, df.iloc[start_idx:end_idx].copy()
+
+def process_batches(batches, geocoder, manifest, workers=1, output_format='csv', total_rows=None):
+    """
+    バッチを処理してバッチごとのCSV、またはParquetデータセットに保存する
+    
+    workers が2以上の場合はバッチをプロセスプールで並行して処理する（geocoder は使わない）。
+    出力ファイル名はバッチ番号で決まり、完了の記録はバッチ番号の順に行う。
+    
+    Returns:
+    --------
+    Tuple[int, int]
+        (総処理件数, 低類似度件数。それぞれ以前に完了したバッチを含む)
+    """
+    def record_batch(batch_num, rows, _, output_file, low_similarity_count):
+        manifest.complete_batch(batch_num, rows, low_similarity_count, output_file)
+        print(f"\nバッチ {batch_num} の処理完了:")
+        print(f"処理件数: {rows}件")
+        print(f"低類似度件数: {low_similarity_count}件")
         print(f"結果を {output_file} に保存しました")
     
-    # 全バッチの結果を統合
-    total_low_similarity = pd.concat(all_low_similarity) if all_low_similarity else pd.DataFrame()
+    timestamp = manifest.data['timestamp']
+    if workers > 1:
+        run_batches_in_parallel(batches, workers, timestamp, output_format, record_batch, total_rows)
+    else:
+        run_batches(batches, geocoder, timestamp, output_format, record_batch)
+    
+    return manifest.data['rows_done'], manifest.data['low_similarity_count']
+
+def _raise_keyboard_interrupt(signum, frame):
+    """SIGTERM を Ctrl+C と同じく扱う"""
+    raise KeyboardInterrupt
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='酒屋データの住所を緯度経度に変換する')
+    parser.add_argument('--input', default=INPUT_FILE, help='入力CSVファイル')
+    parser.add_argument('--stream', action='store_true',
+                        help='入力を少しずつ読み込み、結果を1つのCSVに追記する（使用メモリが入力の行数によらない）')
+    parser.add_argument('--chunk-size', type=int, default=BATCH_SIZE, help='バッチ（チャンク）の行数')
+    parser.add_argument('--resume', action='store_true', help='前回中断した実行の続きから再開する')
+    parser.add_argument('--manifest', default=MANIFEST_FILE, help='実行の進捗を記録するファイル')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', dest='output_format',
+                        help='出力形式（parquet: 都道府県・match_status で分割した1つのParquetデータセット）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='バッチを並行して処理するプロセス数（キャッシュはSQLiteをプロセス間で共有）')
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers は1以上を指定してください")
+    
+    manifest = RunManifest.load(args.manifest) if args.resume else None
+    if manifest:
+        reason = manifest.mismatch(args.input, args.chunk_size, args.stream, args.output_format)
+        if reason:
+            parser.error(f"前回の実行を再開できません: {reason}")
+        if manifest.data['status'] == 'completed':
+            print(f"前回の実行は完了しています（{args.manifest}）")
+            return
+        print(f"前回の実行（{manifest.data['timestamp']}）を再開します: "
+              f"{len(manifest.data['completed_batches'])}バッチ・{manifest.data['rows_done']}件が処理済み")
+    else:
+        if args.resume:
+            print(f"{args.manifest} がないため、最初から処理します")
+        # 実行時のタイムスタンプを取得（YYYYMMDDHHmm形式）。再開時は前回のものを使い、同じ出力ファイルに続ける
+        timestamp = datetime.now().strftime('%Y%m%d%H%M')
+        # 同じ分に実行した別の結果のデータセットに混ぜない
+        dataset_dir = output_path(timestamp, args.output_format)
+        if args.output_format == 'parquet' and os.path.exists(dataset_dir):
+            parser.error(f"出力先のデータセット {dataset_dir} が既にあります。"
+                         "--resume で再開するか、削除してから実行してください")
+        manifest = RunManifest.start(args.manifest, args.input, args.chunk_size, args.stream,
+                                     timestamp, args.output_format)
+    timestamp = manifest.data['timestamp']
+    
+    previous_handler = signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    try:
+        # HTTPセッションとキャッシュは全バッチで共有し、最後（中断時も）にキャッシュを書き込んで閉じる
+        # （並行処理の場合は各ワーカープロセスが持つ）
+        with (GsiGeocoder() if args.workers == 1 else nullcontext()) as geocoder:
+            if args.workers > 1:
+                print(f"{args.workers}プロセスで並行して処理します")
+            if args.stream:
+                print(f"酒屋データを{args.chunk_size}件ずつ読み込んで処理します: {args.input}")
+            if args.stream and args.output_format == 'csv':
+                output_file = f'geocoding_results_{timestamp}.csv'
+                total_count, low_similarity_count = stream_addresses(
+                    args.input, output_file, geocoder, args.chunk_size, manifest, args.workers
+                )
+            elif args.stream:
+                # Parquetはチャンクごとにデータセットに書き出すため、追記位置の管理は不要
+                batches = read_chunks(args.input, args.chunk_size, manifest.data['rows_done'],
+                                      len(manifest.data['completed_batches']) + 1)
+                total_count, low_similarity_count = process_batches(
+                    batches, geocoder, manifest, args.workers, args.output_format
+                )
+            else:
+                # サンプルデータの読み込み
+                print("酒屋データを読み込み中...")
+                df = pd.read_csv(args.input, encoding='utf-8')
+                print(f"読み込み完了: {len(df)}件")
+                total_count, low_similarity_count = process_batches(
+                    split_batches(df, args.chunk_size, manifest), geocoder, manifest, args.workers,
+                    args.output_format, len(df) - manifest.data['rows_done']
+                )
+    except KeyboardInterrupt:
+        # 途中のバッチの結果は書き出さない（取得済みの緯度経度はキャッシュに保存済み）
+        manifest.set_status('interrupted')
+        print(f"\n\n処理を中断しました（{len(manifest.data['completed_batches'])}バッチ・"
+              f"{manifest.data['rows_done']}件が完了）。")
+        print("--resume を付けて実行すると続きから再開します")
+        sys.exit(130)
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+    manifest.set_status('completed')
     
     print("\n=== 全体の処理完了 ===")
     print(f"総処理件数: {total_count}件")
-    print(f"総低類似度件数: {len(total_low_similarity)}件")
+    print(f"総低類似度件数: {low_similarity_count}件")
     print("\n出力ファイル:")
-    for file in output_files:
+    for file in manifest.data['output_files']:
         print(f"- {file}")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,666 @@
+"""
+ジオコーディング結果のキャッシュ
+
+住所の正規形をキーとしたジオコーディング結果と、店舗ごとの住所を保存する。
+保存先は次の2種類から選べる。
+- SqliteGeocodeCache: SQLite（WALモード）。大量のデータや複数プロセスからの利用向け
+- JsonGeocodeCache: JSONファイル。小規模な処理向け
+
+TieredGeocodeCache は保存先の前に件数・サイズに上限のあるLRUをメモリに置き、
+有効期限（TTL）を過ぎた結果を返さないようにする。
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+
+from address_utils import normalize_address_numbers
+from memo_cache import memoize
+
+# キャッシュの形式のバージョン
+# 1（バージョン番号なし）: 「住所||店舗コード||店舗名」をキーとした結果の辞書
+# 2: 住所の正規形をキーとした結果と、店舗ごとの情報を分けて保存
+CACHE_VERSION = 2
+
+# 結果に含まれる店舗情報（住所の結果とは別に保存する）
+STORE_FIELDS = ('store_code', 'store_name')
+
+# 結果をキャッシュした時刻（UNIX時間）を格納する項目
+CACHED_AT_FIELD = 'cached_at'
+
+# ジオコーディングできなかった住所の理由（ネガティブキャッシュ）
+NEGATIVE_NO_RESULTS = 'no_results'          # APIの結果が空
+NEGATIVE_NO_COORDINATES = 'no_coordinates'  # 候補に緯度経度がない
+NEGATIVE_HTTP_ERROR = 'http_error'          # HTTPエラー・接続エラー
+NEGATIVE_TIMEOUT = 'timeout'                # タイムアウト
+NEGATIVE_ERROR = 'error'                    # その他の例外
+
+# 一時的な失敗（短い有効期間でキャッシュし、期限が切れたら再取得する）
+TRANSIENT_REASONS = frozenset({NEGATIVE_HTTP_ERROR, NEGATIVE_TIMEOUT, NEGATIVE_ERROR})
+
+
+@memoize()
+def canonical_address(address: str) -> str:
+    """
+    キャッシュのキーに使う住所の正規形を返す
+
+    数字を正規化し、空白（全角スペースを含む）を取り除く。
+
+    Parameters:
+    -----------
+    address : str
+        住所
+
+    Returns:
+    --------
+    str
+        住所の正規形
+    """
+    return ''.join(normalize_address_numbers(address).split())
+
+
+def store_key(store_code: str = None, store_name: str = None) -> Optional[str]:
+    """店舗情報のキーを生成（店舗コード・店舗名がどちらもない場合はNone）"""
+    if not store_code and not store_name:
+        return None
+    return f"{store_code or ''}||{store_name or ''}"
+
+
+def strip_store_fields(result: Dict) -> Dict:
+    """ジオコーディング結果から店舗情報を取り除く"""
+    return {name: value for name, value in result.items() if name not in STORE_FIELDS}
+
+
+def strip_cache_fields(result: Dict) -> Dict:
+    """ジオコーディング結果から店舗情報とキャッシュの管理用の項目を取り除く"""
+    return {
+        name: value for name, value in result.items()
+        if name not in STORE_FIELDS and name != CACHED_AT_FIELD
+    }
+
+
+def negative_entry(reason: str) -> Dict:
+    """ジオコーディングできなかった住所のキャッシュの値を作成"""
+    return {'negative': True, 'reason': reason}
+
+
+def is_negative(result: Dict) -> bool:
+    """キャッシュの値がジオコーディングできなかった住所のものかどうか"""
+    return bool(result.get('negative'))
+
+
+def is_transient(result: Dict) -> bool:
+    """キャッシュの値が一時的な失敗によるものかどうか"""
+    return is_negative(result) and result.get('reason') in TRANSIENT_REASONS
+
+
+def migrate_cache(legacy_cache: Dict) -> Dict:
+    """
+    旧形式のキャッシュ（「住所||店舗コード||店舗名」がキー）を新形式に変換する
+
+    同じ住所の結果は1件にまとめ、店舗コード・店舗名は店舗ごとの情報として残す。
+
+    Parameters:
+    -----------
+    legacy_cache : Dict
+        旧形式のキャッシュ
+
+    Returns:
+    --------
+    Dict
+        新形式のキャッシュ {'version', 'addresses', 'stores'}
+    """
+    addresses = {}
+    stores = {}
+    for key, result in legacy_cache.items():
+        if not isinstance(result, dict):
+            continue
+        address_key = canonical_address(key.split('||', 1)[0])
+        addresses.setdefault(address_key, strip_store_fields(result))
+        key_of_store = store_key(result.get('store_code'), result.get('store_name'))
+        if key_of_store:
+            stores[key_of_store] = {
+                'store_code': result.get('store_code'),
+                'store_name': result.get('store_name'),
+                'address': address_key
+            }
+    return {'version': CACHE_VERSION, 'addresses': addresses, 'stores': stores}
+
+
+def read_cache_json(json_file: str) -> Dict:
+    """
+    キャッシュのJSONファイルを読み込み、新形式の辞書で返す（旧形式は変換する）
+
+    Parameters:
+    -----------
+    json_file : str
+        キャッシュのJSONファイルパス
+
+    Returns:
+    --------
+    Dict
+        新形式のキャッシュ {'version', 'addresses', 'stores'}
+    """
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"キャッシュの形式が正しくありません: {json_file}")
+    if data.get('version') == CACHE_VERSION:
+        return data
+    return migrate_cache(data)
+
+
+class GeocodeCache:
+    """
+    ジオコーディング結果のキャッシュの基底クラス
+
+    キーは canonical_address で求めた住所の正規形。
+    書き込みはまとめて行うため、処理の最後に flush（または close）を呼ぶ。
+    """
+
+    def get(self, key: str) -> Optional[Dict]:
+        """住所の結果を返す（キャッシュにない場合はNone）"""
+        raise NotImplementedError
+
+    def set(self, key: str, result: Dict):
+        """住所の結果を保存する"""
+        raise NotImplementedError
+
+    def get_store(self, key: str) -> Optional[Dict]:
+        """店舗の情報 {store_code, store_name, address} を返す（ない場合はNone）"""
+        raise NotImplementedError
+
+    def set_store(self, key: str, store: Dict):
+        """店舗の情報を保存する"""
+        raise NotImplementedError
+
+    def set_stores(self, stores: Dict[str, Dict]):
+        """店舗の情報 {店舗のキー: 店舗の情報} をまとめて保存する"""
+        for key, store in stores.items():
+            self.set_store(key, store)
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        """(住所の正規形, 結果) を順に返す"""
+        raise NotImplementedError
+
+    def stores(self) -> Iterator[Tuple[str, Dict]]:
+        """(店舗のキー, 店舗の情報) を順に返す"""
+        raise NotImplementedError
+
+    def flush(self):
+        """未保存の変更を書き込む"""
+
+    def close(self):
+        """未保存の変更を書き込んでキャッシュを閉じる"""
+        self.flush()
+
+    def update(self, data: Dict) -> int:
+        """
+        新形式のキャッシュの辞書をまとめて取り込む
+
+        Returns:
+        --------
+        int
+            取り込んだ住所の件数
+        """
+        for key, result in data.get('addresses', {}).items():
+            self.set(key, result)
+        for key, store in data.get('stores', {}).items():
+            self.set_store(key, store)
+        self.flush()
+        return len(data.get('addresses', {}))
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key, _ in self.items())
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.items())
+
+    def __enter__(self) -> 'GeocodeCache':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JsonGeocodeCache(GeocodeCache):
+    """
+    JSONファイルに保存するキャッシュ
+
+    全体をメモリに持ち、save_interval 件の変更ごとと flush 時にファイル全体を書き直す。
+    書き込みは一時ファイルに書いてから置き換えるため、途中で止まってもファイルは壊れない。
+    """
+
+    def __init__(self, cache_file: str, save_interval: int = 100):
+        """
+        Args:
+            cache_file: キャッシュのJSONファイルパス
+            save_interval: 何件の変更ごとにファイルに書き込むか
+        """
+        self.cache_file = cache_file
+        self.save_interval = save_interval
+        data = self._load()
+        self._addresses = data['addresses']
+        self._stores = data['stores']
+        self._pending = 0
+        # 非同期処理のスレッドから同時に書き込まれる場合に備える
+        self._lock = threading.RLock()
+
+    def _load(self) -> Dict:
+        """キャッシュファイルを読み込む（旧形式の場合は新形式に移行する）"""
+        empty = {'version': CACHE_VERSION, 'addresses': {}, 'stores': {}}
+        if not os.path.exists(self.cache_file):
+            return empty
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("キャッシュの形式が正しくありません")
+        except ValueError as e:
+            # 読めないファイルは上書きせずに残しておく
+            broken_file = self.cache_file + '.broken'
+            os.replace(self.cache_file, broken_file)
+            print(f"Warning: キャッシュファイルを読み込めません（{broken_file} に退避しました）: {e}")
+            return empty
+        if data.get('version') == CACHE_VERSION:
+            return data
+
+        # 旧形式のキャッシュは元のファイルを残して一度だけ移行する
+        migrated = migrate_cache(data)
+        os.replace(self.cache_file, self.cache_file + '.bak')
+        self._write(migrated)
+        print(f"キャッシュを新しい形式に移行しました: {len(data)}件 → "
+              f"{len(migrated['addresses'])}件の住所（元のファイル: {self.cache_file}.bak）")
+        return migrated
+
+    def _write(self, data: Dict):
+        """キャッシュの内容を一時ファイルに書き込んでから置き換える"""
+        directory = os.path.dirname(os.path.abspath(self.cache_file))
+        fd, temp_file = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.cache_file)
+        except BaseException:
+            os.unlink(temp_file)
+            raise
+
+    def _changed(self):
+        self._pending += 1
+        if self._pending >= self.save_interval:
+            self.flush()
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self._addresses.get(key)
+
+    def set(self, key: str, result: Dict):
+        with self._lock:
+            self._addresses[key] = result
+            self._changed()
+
+    def get_store(self, key: str) -> Optional[Dict]:
+        return self._stores.get(key)
+
+    def set_store(self, key: str, store: Dict):
+        with self._lock:
+            self._stores[key] = store
+            self._changed()
+
+    def set_stores(self, stores: Dict[str, Dict]):
+        if not stores:
+            return
+        with self._lock:
+            self._stores.update(stores)
+            self._pending += len(stores) - 1
+            self._changed()
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        return iter(list(self._addresses.items()))
+
+    def stores(self) -> Iterator[Tuple[str, Dict]]:
+        return iter(list(self._stores.items()))
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._write({'version': CACHE_VERSION, 'addresses': self._addresses, 'stores': self._stores})
+                self._pending = 0
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+
+class SqliteGeocodeCache(GeocodeCache):
+    """
+    SQLite（WALモード）に保存するキャッシュ
+
+    住所・店舗のキーを主キーとした表で1件ずつ引く。
+    書き込みは batch_size 件ごとに1つのトランザクションでまとめて行い、
+    WALモードのため書き込み中も他のプロセスから読み込める。
+    """
+
+    def __init__(self, db_file: str, batch_size: int = 100, timeout: float = 30.0):
+        """
+        Args:
+            db_file: SQLiteのデータベースファイルパス
+            batch_size: 何件の変更ごとにコミットするか
+            timeout: 他のプロセスの書き込みを待つ秒数
+        """
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending_addresses = {}
+        self._pending_stores = {}
+        # 非同期処理のスレッドからも使えるようにし、排他はロックで行う
+        self._connection = sqlite3.connect(db_file, timeout=timeout, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS addresses (key TEXT PRIMARY KEY, result TEXT NOT NULL)'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS stores ('
+                'key TEXT PRIMARY KEY, store_code TEXT, store_name TEXT, address TEXT NOT NULL)'
+            )
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key in self._pending_addresses:
+                return self._pending_addresses[key]
+            row = self._connection.execute(
+                'SELECT result FROM addresses WHERE key = ?', (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, result: Dict):
+        with self._lock:
+            self._pending_addresses[key] = result
+        self._changed()
+
+    def get_store(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key in self._pending_stores:
+                return self._pending_stores[key]
+            row = self._connection.execute(
+                'SELECT store_code, store_name, address FROM stores WHERE key = ?', (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {'store_code': row[0], 'store_name': row[1], 'address': row[2]}
+
+    def set_store(self, key: str, store: Dict):
+        with self._lock:
+            self._pending_stores[key] = store
+        self._changed()
+
+    def set_stores(self, stores: Dict[str, Dict]):
+        with self._lock:
+            self._pending_stores.update(stores)
+        self._changed()
+
+    def _changed(self):
+        if len(self._pending_addresses) + len(self._pending_stores) >= self.batch_size:
+            self.flush()
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute('SELECT key, result FROM addresses').fetchall()
+        return ((key, json.loads(result)) for key, result in rows)
+
+    def stores(self) -> Iterator[Tuple[str, Dict]]:
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT key, store_code, store_name, address FROM stores'
+            ).fetchall()
+        return (
+            (key, {'store_code': code, 'store_name': name, 'address': address})
+            for key, code, name, address in rows
+        )
+
+    def flush(self):
+        with self._lock:
+            if not self._pending_addresses and not self._pending_stores:
+                return
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO addresses (key, result) VALUES (?, ?)',
+                    [
+                        (key, json.dumps(result, ensure_ascii=False))
+                        for key, result in self._pending_addresses.items()
+                    ]
+                )
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO stores (key, store_code, store_name, address) '
+                    'VALUES (?, ?, ?, ?)',
+                    [
+                        (key, store.get('store_code'), store.get('store_name'), store['address'])
+                        for key, store in self._pending_stores.items()
+                    ]
+                )
+            self._pending_addresses.clear()
+            self._pending_stores.clear()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM addresses').fetchone()[0]
+
+
+class TieredGeocodeCache(GeocodeCache):
+    """
+    メモリ上のLRUを保存先のキャッシュの前に置いた2段のキャッシュ
+
+    メモリには最近使った結果だけを max_entries 件（max_bytes を指定した場合は
+    そのバイト数）まで持ち、溢れたものは古い順に追い出す。保存先は1件ずつ引くため、
+    キャッシュ全体を読み込む必要はない。
+
+    結果には保存した時刻（cached_at）を付け、ttl 秒を過ぎたものはキャッシュにないものとして扱う。
+    一時的な失敗のネガティブキャッシュ（is_transient）には、より短い transient_ttl を使う。
+    cached_at のない結果（以前のバージョンで保存したもの）は期限切れにしない。
+    """
+
+    def __init__(
+        self,
+        backend: GeocodeCache,
+        max_entries: Optional[int] = 10000,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        transient_ttl: Optional[float] = 60 * 60
+    ):
+        """
+        Args:
+            backend: 保存先のキャッシュ
+            max_entries: メモリに持つ最大件数（Noneの場合は件数で制限しない）
+            max_bytes: メモリに持つ結果の最大バイト数（JSONに変換した大きさで数える）
+            ttl: 結果の有効期間（秒）。Noneの場合は期限なし
+            transient_ttl: 一時的な失敗の有効期間（秒）
+        """
+        self.backend = backend
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.transient_ttl = transient_ttl
+        self._entries = OrderedDict()  # キー → (結果, バイト数)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0          # メモリにあった件数
+        self.negative_hits = 0  # ヒットのうちネガティブキャッシュの件数
+        self.backend_hits = 0  # 保存先から読み込んだ件数
+        self.misses = 0        # どちらにもなかった件数（期限切れを含む）
+        self.expirations = 0   # 期限切れで捨てた件数
+        self.evictions = 0     # メモリから追い出した件数
+
+    def _expired(self, result: Dict) -> bool:
+        ttl = self.transient_ttl if is_transient(result) else self.ttl
+        if ttl is None:
+            return False
+        cached_at = result.get(CACHED_AT_FIELD)
+        return cached_at is not None and time.time() - cached_at > ttl
+
+    def _remember(self, key: str, result: Dict):
+        """メモリに結果を入れ、上限を超えた分を古い順に追い出す"""
+        size = len(key.encode('utf-8')) + len(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while self._entries and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get(self, key: str) -> Optional[Dict]:
+        # 件数は複数のスレッド（asyncio の並行処理）から更新されるため、ロックの中で数える
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.negative_hits += is_negative(entry[0])
+                    return entry[0]
+                del self._entries[key]
+                self._bytes -= entry[1]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+        result = self.backend.get(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            if self._expired(result):
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.backend_hits += 1
+            self.negative_hits += is_negative(result)
+        self._remember(key, result)
+        return result
+
+    def set(self, key: str, result: Dict):
+        result = dict(result)
+        result.setdefault(CACHED_AT_FIELD, time.time())
+        self._remember(key, result)
+        self.backend.set(key, result)
+
+    def get_store(self, key: str) -> Optional[Dict]:
+        return self.backend.get_store(key)
+
+    def set_store(self, key: str, store: Dict):
+        self.backend.set_store(key, store)
+
+    def set_stores(self, stores: Dict[str, Dict]):
+        self.backend.set_stores(stores)
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        return self.backend.items()
+
+    def stores(self) -> Iterator[Tuple[str, Dict]]:
+        return self.backend.stores()
+
+    def flush(self):
+        self.backend.flush()
+
+    def close(self):
+        self.backend.close()
+
+    def clear_memory(self):
+        """メモリ上の結果を捨てる（保存先はそのまま）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """
+        キャッシュの利用状況を返す
+
+        Returns:
+        --------
+        Dict
+            hits, backend_hits, negative_hits, misses, expirations, evictions,
+            hit_ratio, memory_entries, memory_bytes
+        """
+        with self._lock:
+            lookups = self.hits + self.backend_hits + self.misses
+            return {
+                'hits': self.hits,
+                'backend_hits': self.backend_hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.backend_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._entries),
+                'memory_bytes': self._bytes
+            }
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+
+def open_geocode_cache(cache_file: str) -> GeocodeCache:
+    """拡張子に応じてJSONまたはSQLiteのキャッシュを開く（.json 以外はSQLite）"""
+    if cache_file.lower().endswith('.json'):
+        return JsonGeocodeCache(cache_file)
+    return SqliteGeocodeCache(cache_file)
+
+
+def import_json_cache(json_file: str, cache: GeocodeCache) -> int:
+    """
+    JSONのキャッシュファイル（旧形式・新形式）の内容をキャッシュに取り込む
+
+    Parameters:
+    -----------
+    json_file : str
+        取り込むキャッシュのJSONファイルパス
+    cache : GeocodeCache
+        取り込み先のキャッシュ
+
+    Returns:
+    --------
+    int
+        取り込んだ住所の件数
+    """
+    return cache.update(read_cache_json(json_file))
+
+
+def main():
+    """JSONのキャッシュをSQLiteに取り込むコマンド"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='JSONのジオコーディングキャッシュをSQLiteに取り込む')
+    parser.add_argument('json_file', nargs='?', default='geocoding_cache.json',
+                        help='取り込むJSONファイル（旧形式も可）')
+    parser.add_argument('db_file', nargs='?', default='geocoding_cache.sqlite',
+                        help='取り込み先のSQLiteファイル')
+    args = parser.parse_args()
+
+    with SqliteGeocodeCache(args.db_file) as cache:
+        count = import_json_cache(args.json_file, cache)
+        print(f"{args.json_file} から {count}件の住所を {args.db_file} に取り込みました（合計 {len(cache)}件）")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,57 +2,380 @@ import csv
 import json
 import time
 import requests
+from requests.adapters import HTTPAdapter
 import os
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Optional, Tuple, Union
+from address_series import normalize_address_numbers_series, strip_whitespace_series
+from memo_cache import memo_stats
+from async_geocoder import DEFAULT_CONCURRENCY, geocode_concurrently
+from rate_control import (
+    FAILURE_CONNECTION,
+    FAILURE_SERVER_ERROR,
+    FAILURE_THROTTLED,
+    FAILURE_TIMEOUT,
+    AdaptiveRateController,
+    CircuitOpenError,
+    retry_delay
+)
+from geocode_cache import (
+    GeocodeCache,
+    NEGATIVE_ERROR,
+    NEGATIVE_HTTP_ERROR,
+    NEGATIVE_NO_COORDINATES,
+    NEGATIVE_NO_RESULTS,
+    NEGATIVE_TIMEOUT,
+    TieredGeocodeCache,
+    canonical_address,
+    import_json_cache,
+    is_negative,
+    negative_entry,
+    open_geocode_cache,
+    store_key,
+    strip_cache_fields,
+    strip_store_fields
+)
 from address_utils import (
+    DEFAULT_SIMILARITY_METRIC,
     normalize_address_numbers,
     calculate_address_similarity,
     analyze_address_match_level,
     normalize_city_name_with_history,
-    improve_address_matching
+    improve_address_matching,
+    tokenize_address
 )
 
+# 国土地理院の住所検索API（環境変数 GSI_ADDRESS_SEARCH_URL でテスト用のサーバーに差し替え可能）
+GSI_API_URL = "https://msearch.gsi.go.jp/address-search/AddressSearch"
+GSI_API_URL_ENV = "GSI_ADDRESS_SEARCH_URL"
+
+# APIリクエストのタイムアウト（接続, 読み込み）（秒）と、接続プールの大きさ
+DEFAULT_TIMEOUT = (3.05, 10.0)
+DEFAULT_POOL_SIZE = 10
+# 429・5xx・タイムアウトの場合の再試行回数
+DEFAULT_MAX_RETRIES = 3
+
+# キャッシュの保存先（既定はSQLite。JSONの旧キャッシュがあれば初回に取り込む）
+DEFAULT_CACHE_FILE = "geocoding_cache.sqlite"
+LEGACY_CACHE_FILE = "geocoding_cache.json"
+
+# メモリに持つキャッシュの件数と、結果の有効期間（秒）
+DEFAULT_MEMORY_ENTRIES = 10000
+DEFAULT_CACHE_TTL = 365 * 24 * 60 * 60
+# 一時的な失敗（HTTPエラー・タイムアウト等）のネガティブキャッシュの有効期間（秒）
+DEFAULT_TRANSIENT_TTL = 60 * 60
+
+# ジオコーディング結果から process_dataframe が各行に追加する列と、match_status の値
+RESULT_COLUMNS = [
+    'normalized_address', 'matched_address', 'latitude', 'longitude', 'similarity',
+    'chome_match', 'banchi_match', 'go_match'
+]
+MATCH_STATUSES = ['matched', 'unmatched', 'missing_address']
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Retry-After ヘッダーの秒数（ないか日付形式の場合はNone）"""
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    住所検索API用のHTTPセッションを作成する
+    
+    接続を使い回す（keep-alive）ため、同じホストへの接続を pool_size 本までプールし、
+    gzip圧縮されたレスポンスを受け取る。
+    
+    Parameters:
+    -----------
+    pool_size : int
+        接続プールの大きさ
+    
+    Returns:
+    --------
+    requests.Session
+        HTTPセッション
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive'
+    })
+    return session
+
+
+def import_legacy_cache(cache: GeocodeCache) -> int:
+    """
+    キャッシュが空の場合に以前のJSONキャッシュ（LEGACY_CACHE_FILE）を取り込む
+
+    Returns:
+    --------
+    int
+        取り込んだ住所の件数（取り込まなかった場合は0）
+    """
+    if len(cache) or not os.path.exists(LEGACY_CACHE_FILE):
+        return 0
+    count = import_json_cache(LEGACY_CACHE_FILE, cache)
+    print(f"{LEGACY_CACHE_FILE} から {count}件の住所をキャッシュに取り込みました")
+    return count
+
+
 class GsiGeocoder:
     """国土地理院APIを使用して住所から緯度経度を取得するクラス"""
     
-    def __init__(self):
-        self.base_url = "https://msearch.gsi.go.jp/address-search/AddressSearch"
-        self.cache_file = "geocoding_cache.json"
-        self.cache = self._load_cache()
+    def __init__(
+        self,
+        cache_file: str = DEFAULT_CACHE_FILE,
+        cache: Optional[GeocodeCache] = None,
+        memory_entries: Optional[int] = DEFAULT_MEMORY_ENTRIES,
+        memory_bytes: Optional[int] = None,
+        cache_ttl: Optional[float] = DEFAULT_CACHE_TTL,
+        transient_ttl: Optional[float] = DEFAULT_TRANSIENT_TTL,
+        retry_negatives: bool = False,
+        base_url: Optional[str] = None,
+        timeout: Union[float, Tuple[float, float], None] = DEFAULT_TIMEOUT,
+        session: Optional[requests.Session] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        rate_controller: Optional[AdaptiveRateController] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        similarity_metric: str = DEFAULT_SIMILARITY_METRIC,
+        import_legacy: bool = True
+    ):
+        """
+        Parameters:
+        -----------
+        cache_file : str
+            キャッシュのファイルパス（.json の場合はJSON、それ以外はSQLite）
+        cache : GeocodeCache, optional
+            使用するキャッシュ（指定した場合は cache_file を使わない）。TieredGeocodeCache でない場合は
+            有効期間（cache_ttl・transient_ttl）が効くよう TieredGeocodeCache で包む
+        memory_entries : int, optional
+            メモリに持つキャッシュの最大件数
+        memory_bytes : int, optional
+            メモリに持つキャッシュの最大バイト数
+        cache_ttl : float, optional
+            キャッシュした結果の有効期間（秒）。Noneの場合は期限なし
+        transient_ttl : float, optional
+            一時的な失敗のネガティブキャッシュの有効期間（秒）
+        retry_negatives : bool
+            ジオコーディングできなかった住所のキャッシュを使わずにAPIを再度呼び出すかどうか
+        base_url : str, optional
+            住所検索APIのURL（省略時は環境変数 GSI_ADDRESS_SEARCH_URL、なければ国土地理院のAPI）
+        timeout : float or Tuple[float, float], optional
+            APIリクエストのタイムアウト（秒）。(接続, 読み込み) のタプルも指定可能
+        session : requests.Session, optional
+            使用するHTTPセッション（指定した場合は close で閉じない）
+        pool_size : int
+            session を指定しない場合の接続プールの大きさ（並行処理の同時リクエスト数以上にする）
+        rate_controller : AdaptiveRateController, optional
+            応答に応じてリクエスト数を調整するコントローラー（省略時は1秒あたり2件から開始）
+        max_retries : int
+            429・5xx・タイムアウトの場合に再試行する回数
+        similarity_metric : str
+            候補住所の類似度の計算方法（address_utils.SIMILARITY_METRICS。'legacy' は以前の計算方法）
+        import_legacy : bool
+            既定のキャッシュが空の場合に以前のJSONキャッシュを取り込むかどうか
+            （並行処理のワーカーは親プロセスで取り込み済みのため False）
+        """
+        self.base_url = base_url or os.environ.get(GSI_API_URL_ENV, GSI_API_URL)
+        self.timeout = timeout
+        self._owns_session = session is None
+        self.session = session if session is not None else create_session(pool_size)
+        self.rate_controller = rate_controller or AdaptiveRateController()
+        self.max_retries = max_retries
+        self.similarity_metric = similarity_metric
+        self.cache_file = cache_file
+        self.retry_negatives = retry_negatives
+        if cache is None:
+            cache = open_geocode_cache(cache_file)
+            if cache_file == DEFAULT_CACHE_FILE and import_legacy:
+                import_legacy_cache(cache)
+        if not isinstance(cache, TieredGeocodeCache):
+            # 一時的な失敗のネガティブキャッシュの期限切れは TieredGeocodeCache が判定する
+            cache = TieredGeocodeCache(cache, memory_entries, memory_bytes, cache_ttl, transient_ttl)
+        # 住所の正規形 → ジオコーディング結果（店舗情報を含まない）と、店舗ごとの住所
+        self.cache = cache
     
-    def _load_cache(self) -> Dict:
-        """キャッシュファイルを読み込む"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
+    def flush(self):
+        """未保存のキャッシュを書き込む"""
+        self.cache.flush()
+    
+    def close(self):
+        """キャッシュを書き込んで閉じ、HTTPセッションの接続を閉じる"""
+        self.cache.close()
+        if self._owns_session:
+            self.session.close()
+    
+    def __enter__(self) -> 'GsiGeocoder':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def cache_stats(self) -> Dict:
+        """キャッシュの利用状況（ヒット・ミス・追い出し等の件数）を返す"""
+        if isinstance(self.cache, TieredGeocodeCache):
+            return self.cache.stats()
         return {}
     
-    def _save_cache(self):
-        """キャッシュをファイルに保存"""
-        with open(self.cache_file, 'w', encoding='utf-8') as f:
-            json.dump(self.cache, f, ensure_ascii=False, indent=2)
+    def _make_cache_key(self, address: str) -> str:
+        """キャッシュのキーを生成（店舗コード・店舗名は含めない）"""
+        return canonical_address(address)
     
-    def _make_cache_key(self, address: str, store_code: str = None, store_name: str = None) -> str:
-        """キャッシュのキーを生成"""
-        key_parts = [normalize_address_numbers(address)]
-        if store_code:
-            key_parts.append(str(store_code))
-        if store_name:
-            key_parts.append(str(store_name))
-        return "||".join(key_parts)
+    def remember_store(self, cache_key: str, store_code: str = None, store_name: str = None):
+        """店舗ごとの住所を記録する（cache_key は canonical_address で求めた住所の正規形）"""
+        key = store_key(store_code, store_name)
+        if not key:
+            return
+        store = self.cache.get_store(key)
+        if store is None or store['address'] != cache_key:
+            self.cache.set_store(key, {
+                'store_code': None if store_code is None else str(store_code),
+                'store_name': None if store_name is None else str(store_name),
+                'address': cache_key
+            })
+    
+    def remember_stores(self, stores: List[Tuple[str, Optional[str], Optional[str]]]):
+        """
+        複数の店舗の住所をまとめて記録する
+
+        Parameters:
+        -----------
+        stores : List[Tuple[str, Optional[str], Optional[str]]]
+            (住所の正規形, 店舗コード, 店舗名) のリスト。同じ店舗は後のものが優先される
+        """
+        batch = {}
+        for cache_key, store_code, store_name in stores:
+            key = store_key(store_code, store_name)
+            if key:
+                batch[key] = {
+                    'store_code': None if store_code is None else str(store_code),
+                    'store_name': None if store_name is None else str(store_name),
+                    'address': cache_key
+                }
+        if batch:
+            self.cache.set_stores(batch)
+    
+    def _cache_negative(self, cache_key: str, reason: str):
+        """ジオコーディングできなかった住所を理由とともにキャッシュする"""
+        self.cache.set(cache_key, negative_entry(reason))
+    
+    def record_failure(self, address: str, reason: str):
+        """APIを呼び出した側で検出した失敗（タイムアウト等）をキャッシュする"""
+        self._cache_negative(self._make_cache_key(address), reason)
+    
+    def lookup_cache(
+        self, address: str, store_code: str = None, store_name: str = None
+    ) -> Optional[Tuple[Optional[Dict], bool]]:
+        """
+        キャッシュだけを引く
+        
+        Returns:
+        --------
+        Optional[Tuple[Optional[Dict], bool]]
+            キャッシュにある場合は geocode と同じ (結果, True)、
+            APIを呼び出す必要がある場合はNone
+        """
+        cache_key = self._make_cache_key(address)
+        
+        # 店舗情報は呼び出しごとのものを付ける
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+        if is_negative(cached):
+            return None if self.retry_negatives else (None, True)
+        self.remember_store(cache_key, store_code, store_name)
+        return dict(strip_cache_fields(cached), store_code=store_code, store_name=store_name), True
     
     def geocode(self, address: str, store_code: str = None, store_name: str = None) -> Tuple[Optional[Dict], bool]:
-        """住所から緯度経度を取得"""
-        # キャッシュのキーを生成
-        cache_key = self._make_cache_key(address, store_code, store_name)
+        """
+        住所から緯度経度を取得
         
+        ジオコーディングできなかった住所も理由（NEGATIVE_*）とともにキャッシュし、
+        次回からはAPIを呼び出さずに (None, True) を返す。
+        """
         # キャッシュをチェック
-        if cache_key in self.cache:
-            return self.cache[cache_key], True
+        cached = self.lookup_cache(address, store_code, store_name)
+        if cached is not None:
+            return cached
+        return self.fetch(address, store_code, store_name)
+    
+    def request_interval(self) -> float:
+        """1件ずつ処理する場合のリクエストの間隔（秒）"""
+        return self.rate_controller.interval()
+    
+    def _request(self, params: Dict, timeout) -> requests.Response:
+        """
+        APIにリクエストし、429・5xx・タイムアウト・接続エラーの場合はジッター付きの指数バックオフで再試行する
+        
+        応答時間と失敗はレートコントローラーに記録する。
+        サーキットブレーカーが開いている場合は CircuitOpenError を送出する。
+        """
+        controller = self.rate_controller
+        for attempt in range(self.max_retries + 1):
+            if not controller.allow_request():
+                raise CircuitOpenError("APIの失敗が続いているためリクエストを停止しています")
+            if attempt:
+                controller.record_retry()
+            
+            start = time.monotonic()
+            retry_after = None
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=timeout)
+            except requests.Timeout:
+                controller.record_failure(FAILURE_TIMEOUT, time.monotonic() - start)
+                if attempt == self.max_retries:
+                    raise
+            except requests.ConnectionError:
+                controller.record_failure(FAILURE_CONNECTION, time.monotonic() - start)
+                if attempt == self.max_retries:
+                    raise
+            else:
+                latency = time.monotonic() - start
+                if response.status_code == 429:
+                    controller.record_failure(FAILURE_THROTTLED, latency)
+                    retry_after = _retry_after_seconds(response)
+                elif response.status_code >= 500:
+                    controller.record_failure(FAILURE_SERVER_ERROR, latency)
+                else:
+                    controller.record_success(latency)
+                    response.raise_for_status()
+                    return response
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+            
+            time.sleep(retry_delay(attempt, retry_after=retry_after))
+    
+    def fetch(
+        self, address: str, store_code: str = None, store_name: str = None, timeout: Optional[float] = None
+    ) -> Tuple[Optional[Dict], bool]:
+        """
+        キャッシュを見ずにAPIで緯度経度を取得し、結果をキャッシュする
+        
+        Parameters:
+        -----------
+        address : str
+            住所
+        store_code : str, optional
+            店舗コード
+        store_name : str, optional
+            店舗名
+        timeout : float, optional
+            APIリクエストのタイムアウト（秒）。省略時は self.timeout
+        
+        Returns:
+        --------
+        Tuple[Optional[Dict], bool]
+            (結果, False)。ジオコーディングできなかった場合の結果はNone
+        """
+        # キャッシュのキーを生成
+        cache_key = self._make_cache_key(address)
         
         try:
             # 住所を正規化（市町村合併履歴を考慮）
@@ -63,14 +386,14 @@ class GsiGeocoder:
             # APIリクエストパラメータ
             params = {'q': normalized_address}
             
-            # APIリクエスト
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
+            # APIリクエスト（429・5xx・タイムアウトは再試行）
+            response = self._request(params, self.timeout if timeout is None else timeout)
             
             # レスポンスを解析
             results = response.json()
             
             if not results:
+                self._cache_negative(cache_key, NEGATIVE_NO_RESULTS)
                 return None, False
             
             # 候補住所のリストを作成
@@ -82,7 +405,8 @@ class GsiGeocoder:
             # 改善された住所マッチングを使用
             best_match_address, highest_similarity = improve_address_matching(
                 normalized_address,
-                candidate_addresses
+                candidate_addresses,
+                self.similarity_metric
             )
             
             # 最適な結果を選択
@@ -98,8 +422,11 @@ class GsiGeocoder:
                 matched_address = best_match.get('properties', {}).get('title', '')
                 
                 if len(coordinates) >= 2:
-                    # 住所のマッチングレベルを分析
-                    match_level = analyze_address_match_level(normalized_address, matched_address)
+                    # 住所のマッチングレベルを分析（入力住所は一度だけ分割する）
+                    match_level = analyze_address_match_level(
+                        tokenize_address(normalized_address),
+                        matched_address
+                    )
                     
                     result = {
                         'latitude': coordinates[1],
@@ -114,25 +441,54 @@ class GsiGeocoder:
                         'store_name': store_name
                     }
                     
-                    # 結果をキャッシュに保存
-                    self.cache[cache_key] = result
-                    self._save_cache()
+                    # 結果をキャッシュに保存（店舗情報は住所の結果とは別に保存）
+                    self.cache.set(cache_key, strip_store_fields(result))
+                    self.remember_store(cache_key, store_code, store_name)
                     
                     return result, False
             
+            self._cache_negative(cache_key, NEGATIVE_NO_COORDINATES)
             return None, False
             
+        except CircuitOpenError as e:
+            # リクエストしていないのでキャッシュしない
+            print(f"Error geocoding address {address}: {e}")
+            return None, False
+        except requests.Timeout as e:
+            print(f"Error geocoding address {address}: {e}")
+            self._cache_negative(cache_key, NEGATIVE_TIMEOUT)
+            return None, False
+        except requests.RequestException as e:
+            print(f"Error geocoding address {address}: {e}")
+            self._cache_negative(cache_key, NEGATIVE_HTTP_ERROR)
+            return None, False
         except Exception as e:
             print(f"Error geocoding address {address}: {e}")
+            self._cache_negative(cache_key, NEGATIVE_ERROR)
             return None, False
 
+def _geocode_sequentially(geocoder: GsiGeocoder, geocode_requests: List[Tuple]):
+    """住所を1件ずつジオコーディングする（API制限を考慮し、キャッシュヒット以外はレートに応じて待機）"""
+    for address, store_code, store_name in geocode_requests:
+        result, is_cached = geocoder.geocode(address, store_code, store_name)
+        yield result, is_cached
+        
+        # API制限を考慮して待機（キャッシュヒットの場合は待機しない）
+        if not is_cached:
+            time.sleep(geocoder.request_interval())
+
 def process_dataframe(
     df: pd.DataFrame,
     address_column: str = 'address',
     store_code_column: str = 'store_code',
     store_name_column: str = 'store_name',
     output_file: str = None,
-    progress_callback = None
+    progress_callback = None,
+    retry_negatives: bool = False,
+    use_async: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate_limit: Optional[float] = None,
+    geocoder: Optional[GsiGeocoder] = None
 ) -> pd.DataFrame:
     """
     データフレームから住所を読み込み、緯度経度を取得して結果を返す
@@ -152,86 +508,164 @@ def process_dataframe(
     progress_callback : callable, optional
         進捗を報告するコールバック関数。
         store_name, address, resultを引数として受け取る
+    retry_negatives : bool
+        ジオコーディングできなかった住所のキャッシュを使わずにAPIを再度呼び出すかどうか
+    use_async : bool
+        asyncioで並行してジオコーディングするかどうか（進捗コールバックは全件の取得後に呼ばれる）
+    concurrency : int
+        use_async の場合の同時リクエスト数
+    rate_limit : float, optional
+        use_async の場合の固定の1秒あたりのリクエスト数（省略時は応答に応じて自動調整）
+    geocoder : GsiGeocoder, optional
+        使用するジオコーダー。複数のバッチで同じセッション・キャッシュを使う場合に指定する
+        （指定した場合は retry_negatives を使わず、処理後に閉じない）
     
     Returns:
     --------
     pd.DataFrame
         緯度経度情報が追加されたデータフレーム。
-        マッチしなかったデータも含む（緯度経度情報はNaN）
+        マッチしなかったデータも含む（緯度経度情報はNaN）。
+        緯度経度・類似度は float64、丁目・番地・号の一致は bool、match_status はカテゴリ型（MATCH_STATUSES）。
+        同じ住所（数字と空白を正規化したもの）は1回だけジオコーディングし、
+        重複除外の状況を attrs['dedup']、正規化のメモ化の状況（memo_cache.memo_stats）を attrs['memo'] に格納する
     """
-    geocoder = GsiGeocoder()
-    results = []
-    
-    # 各行の住所を処理
-    for idx, row in df.iterrows():
-        address = row.get(address_column)
-        store_code = row.get(store_code_column) if store_code_column in df.columns else None
-        store_name = row.get(store_name_column) if store_name_column in df.columns else None
-        
-        if pd.isna(address):
-            print(f"Warning: Missing address at index {idx}")
-            result_row = row.to_dict()
-            result_row.update({
-                'normalized_address': None,
-                'matched_address': None,
-                'latitude': None,
-                'longitude': None,
-                'similarity': 0.0,
-                'chome_match': False,
-                'banchi_match': False,
-                'go_match': False,
-                'match_status': 'missing_address'
-            })
-            results.append(result_row)
-            continue
-            
-        result, is_cached = geocoder.geocode(str(address), store_code, store_name)
-        
-        # 元のデータを保持しつつ、緯度経度情報を追加
-        result_row = row.to_dict()
-        
+    owns_geocoder = geocoder is None
+    if owns_geocoder:
+        geocoder = GsiGeocoder(retry_negatives=retry_negatives)
+    
+    # 元のデータを保持しつつ、行番号で扱う
+    result_df = df.reset_index(drop=True)
+    
+    # 住所・店舗コード・店舗名の列（列がない場合は欠損として扱う）
+    def column(name: str) -> pd.Series:
+        if name in result_df.columns:
+            return result_df[name]
+        return pd.Series(None, index=result_df.index, dtype=object)
+    
+    addresses = column(address_column)
+    store_codes = column(store_code_column)
+    store_names = column(store_name_column)
+    
+    missing = addresses.isna()
+    for idx in df.index[missing.to_numpy()]:
+        print(f"Warning: Missing address at index {idx}")
+    
+    # 数字を正規化した住所（マッチしなかった行の normalized_address にも使う）
+    address_text = addresses[~missing].astype(str)
+    normalized_numbers = normalize_address_numbers_series(address_text)
+    
+    # 空白を除いた正規化住所が同じ行は1回だけジオコーディングする
+    keys = strip_whitespace_series(normalized_numbers)
+    first_rows = keys.drop_duplicates()
+    rows_by_key = keys.groupby(keys, sort=False).indices
+    
+    # 一意な住所ごとに最初の行の店舗情報でジオコーディングする
+    geocode_requests = [
+        (
+            address_text[first_idx],
+            None if pd.isna(store_codes[first_idx]) else store_codes[first_idx],
+            None if pd.isna(store_names[first_idx]) else store_names[first_idx]
+        )
+        for first_idx in first_rows.index
+    ]
+    if use_async:
+        geocoded = geocode_concurrently(geocoder, geocode_requests, concurrency, rate_limit)
+    else:
+        geocoded = _geocode_sequentially(geocoder, geocode_requests)
+    
+    # マッチした一意な住所の結果を列ごとに集める
+    matched_keys = []
+    unique_columns = {name: [] for name in RESULT_COLUMNS}
+    matched_stores = []
+    for first_idx, key, (result, is_cached) in zip(first_rows.index, first_rows.values, geocoded):
         if result:
-            # マッチした場合
-            result_row.update({
-                'normalized_address': result['normalized_address'],
-                'matched_address': result['matched_address'],
-                'latitude': result['latitude'],
-                'longitude': result['longitude'],
-                'similarity': result['similarity'],
-                'chome_match': result['chome_match'],
-                'banchi_match': result['banchi_match'],
-                'go_match': result['go_match'],
-                'match_status': 'matched'
-            })
-        else:
-            # マッチしなかった場合
-            result_row.update({
-                'normalized_address': normalize_address_numbers(str(address)),
-                'matched_address': None,
-                'latitude': None,
-                'longitude': None,
-                'similarity': 0.0,
-                'chome_match': False,
-                'banchi_match': False,
-                'go_match': False,
-                'match_status': 'unmatched'
-            })
-        
-        results.append(result_row)
+            matched_keys.append(key)
+            for name in RESULT_COLUMNS:
+                unique_columns[name].append(result[name])
         
-        # 進捗コールバックを呼び出し
-        if progress_callback:
-            progress_callback(store_name or 'Unknown store', address, result or {})
-        
-        # API制限を考慮して待機（キャッシュヒットの場合は待機しない）
-        if not is_cached:
-            time.sleep(0.5)
+        # 同じ住所の2行目以降の店舗情報を集め（最初の行はジオコーディング時に記録済み）、進捗コールバックを呼び出し
+        for position in rows_by_key[key]:
+            idx = keys.index[position]
+            row_store_code = store_codes[idx]
+            row_store_name = store_names[idx]
+            if result and idx != first_idx:
+                matched_stores.append((
+                    key,
+                    None if pd.isna(row_store_code) else row_store_code,
+                    None if pd.isna(row_store_name) else row_store_name
+                ))
+            if progress_callback:
+                progress_callback(
+                    row_store_name if pd.notna(row_store_name) else 'Unknown store',
+                    addresses[idx],
+                    dict(result, store_code=row_store_code, store_name=row_store_name) if result else {}
+                )
+    
+    # 店舗情報をまとめて記録し、キャッシュを保存
+    geocoder.remember_stores(matched_stores)
+    cache_stats = geocoder.cache_stats()
+    rate_metrics = geocoder.rate_controller.metrics()
+    if owns_geocoder:
+        geocoder.close()
+    else:
+        geocoder.flush()
+    
+    # 一意な住所の結果を各行に結合（行ごとの一意な住所の位置で列ごとに取り出す。マッチしなかった行は -1）
+    positions = pd.Index(matched_keys, dtype=object).get_indexer(keys.reindex(result_df.index))
+    matched = positions >= 0
+    unmatched = ~matched & ~missing.to_numpy()
+    
+    def take(name: str, dtype, fill) -> np.ndarray:
+        values = np.full(len(result_df), fill, dtype=dtype)
+        values[matched] = np.asarray(unique_columns[name], dtype=dtype)[positions[matched]]
+        return values
+    
+    # 緯度経度情報を追加（マッチしなかった行の正規化住所は数字のみ正規化したもの）
+    normalized_address = normalized_numbers.reindex(result_df.index).to_numpy(dtype=object)
+    normalized_address[matched] = take('normalized_address', object, None)[matched]
+    result_df['normalized_address'] = normalized_address
+    result_df['matched_address'] = take('matched_address', object, np.nan)
+    result_df['latitude'] = take('latitude', np.float64, np.nan)
+    result_df['longitude'] = take('longitude', np.float64, np.nan)
+    result_df['similarity'] = take('similarity', np.float64, 0.0)
+    for level in ('chome_match', 'banchi_match', 'go_match'):
+        result_df[level] = take(level, bool, False)
+    result_df['match_status'] = pd.Categorical.from_codes(
+        np.where(matched, 0, np.where(unmatched, 1, 2)), categories=MATCH_STATUSES
+    )
     
-    # 結果をデータフレームに変換
-    result_df = pd.DataFrame(results)
+    # 重複除外の状況を報告
+    total_rows = int((~missing).sum())
+    unique_count = len(first_rows)
+    dedup_ratio = 1 - unique_count / total_rows if total_rows else 0.0
+    result_df.attrs['dedup'] = {
+        'rows': total_rows,
+        'unique_addresses': unique_count,
+        'dedup_ratio': dedup_ratio
+    }
+    print(f"\n重複除外: {total_rows}件中 {unique_count}件の一意な住所をジオコーディング"
+          f"（重複率 {dedup_ratio:.1%}）")
+    if cache_stats:
+        result_df.attrs['cache'] = cache_stats
+        print(f"キャッシュ: ヒット率 {cache_stats['hit_ratio']:.1%}"
+              f"（メモリ {cache_stats['hits']}件、保存先 {cache_stats['backend_hits']}件、"
+              f"ミス {cache_stats['misses']}件、追い出し {cache_stats['evictions']}件）")
+    memo = memo_stats()
+    result_df.attrs['memo'] = memo
+    memo_lookups = sum(stats['hits'] + stats['misses'] for stats in memo.values())
+    if memo_lookups:
+        memo_hits = sum(stats['hits'] for stats in memo.values())
+        print(f"正規化のメモ化（累計）: ヒット率 {memo_hits / memo_lookups:.1%}"
+              f"（{memo_lookups}回中 {memo_hits}回、{len(memo)}関数）")
+    result_df.attrs['rate_control'] = rate_metrics
+    if rate_metrics['requests']:
+        print(f"API: {rate_metrics['requests']}リクエスト（再試行 {rate_metrics['retries']}件、"
+              f"429 {rate_metrics['throttled']}件、5xx {rate_metrics['server_error']}件、"
+              f"タイムアウト {rate_metrics['timeout']}件、接続エラー {rate_metrics['connection']}件）、"
+              f"現在のレート {rate_metrics['rate']:.2f}件/秒、ブレーカー {rate_metrics['circuit_state']}")
     
     # 結果をファイルに保存
     if output_file:
         result_df.to_csv(output_file, index=False, encoding='utf-8')
     
-    return result_df 
\ No newline at end of file
+    return result_df
@@ -0,0 +1,282 @@
+"""
+住所検索APIの代替サーバー（mock_gsi_server）に対する負荷試験
+
+合成した住所データで process_dataframe または convert_addresses.main（--stream も可）を実行し、
+処理件数/秒、APIの応答時間（p50/p95/p99）、1行あたりのAPI呼び出し数を表示する。
+mode='dataframe' では結果のデータフレームの使用メモリも、全ての列を object 型にした場合と比べて表示する。
+
+使い方:
+    python load_test.py --rows 2000 --async --concurrency 16 --latency lognormal:0.05,0.5
+    python load_test.py --mode convert --rows 500 --throttle-rate 0.05
+    python load_test.py --mode stream --rows 500
+"""
+
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from address_series import add_prefecture
+from address_utils import VALID_PREFECTURES
+from mock_gsi_server import MockGsiServer
+
+# 都道府県名で始まらない、ジオコーディングできない住所
+UNMATCHABLE_ADDRESSES = ['場所不明', '未定', '改装中']
+
+
+def generate_addresses(rows: int, unique_ratio: float = 0.5, unmatched_ratio: float = 0.05,
+                       seed: int = 0) -> pd.DataFrame:
+    """
+    負荷試験用の住所データを作成する
+
+    Parameters:
+    -----------
+    rows : int
+        行数
+    unique_ratio : float
+        一意な住所の割合（残りは既出の住所の重複）
+    unmatched_ratio : float
+        ジオコーディングできない住所の割合
+    seed : int
+        乱数のシード
+
+    Returns:
+    --------
+    pd.DataFrame
+        ADDRESS, PREFECTURE, SAKAYA_DEALER_CODE, SAKAYA_DEALER_NAME の列を持つデータフレーム
+    """
+    rng = random.Random(seed)
+    prefectures = sorted(VALID_PREFECTURES)
+    unique_count = max(1, int(rows * unique_ratio))
+    unique_addresses = []
+    for number in range(unique_count):
+        if rng.random() < unmatched_ratio:
+            unique_addresses.append((rng.choice(UNMATCHABLE_ADDRESSES), '不明'))
+            continue
+        prefecture = rng.choice(prefectures)
+        unique_addresses.append((
+            f"{prefecture}試験市{number % 97 + 1}町{rng.randint(1, 9)}丁目{rng.randint(1, 30)}番{rng.randint(1, 20)}号",
+            prefecture
+        ))
+
+    chosen = unique_addresses + [rng.choice(unique_addresses) for _ in range(rows - unique_count)]
+    rng.shuffle(chosen)
+    return pd.DataFrame({
+        'SAKAYA_DEALER_CODE': [f"D{number:06d}" for number in range(rows)],
+        'SAKAYA_DEALER_NAME': [f"試験店{number}" for number in range(rows)],
+        'PREFECTURE': [prefecture for _, prefecture in chosen],
+        'ADDRESS': [address for address, _ in chosen]
+    })
+
+
+def percentiles(latencies: List[float]) -> Dict[str, Optional[float]]:
+    """応答時間（秒）の p50/p95/p99"""
+    if not latencies:
+        return {'p50': None, 'p95': None, 'p99': None}
+    values = np.percentile(np.asarray(latencies), [50, 95, 99])
+    return {'p50': float(values[0]), 'p95': float(values[1]), 'p99': float(values[2])}
+
+
+def frame_memory(df: pd.DataFrame) -> Dict[str, int]:
+    """
+    データフレームの使用メモリ（文字列の中身を含む）を、全ての列を object 型にした場合と比べる
+
+    Returns:
+    --------
+    Dict[str, int]
+        bytes（現在の型）, object_bytes（全ての列が object 型の場合）
+    """
+    return {
+        'bytes': int(df.memory_usage(deep=True).sum()),
+        'object_bytes': int(df.astype(object).memory_usage(deep=True).sum())
+    }
+
+
+def run_load_test(
+    rows: int = 1000,
+    mode: str = 'dataframe',
+    use_async: bool = False,
+    concurrency: int = 8,
+    rate_limit: Optional[float] = None,
+    unique_ratio: float = 0.5,
+    latency: str = 'constant:0.02',
+    error_rate: float = 0.0,
+    throttle_rate: float = 0.0,
+    server_rate_limit: Optional[float] = None,
+    seed: int = 0
+) -> Dict:
+    """
+    代替サーバーを起動して負荷試験を行う
+
+    キャッシュは一時ディレクトリに作成するため、毎回キャッシュが空の状態から始まる。
+
+    Parameters:
+    -----------
+    rows : int
+        行数
+    mode : str
+        'dataframe'（process_dataframe）、'convert'（convert_addresses.main）、
+        'stream'（convert_addresses.main --stream）のいずれか
+    use_async : bool
+        mode='dataframe' の場合に並行処理を使うかどうか（CLI の --async と同じく既定は逐次処理）
+    concurrency : int
+        並行処理の同時リクエスト数
+    rate_limit : float, optional
+        並行処理の固定の1秒あたりのリクエスト数（省略時は自動調整）
+    unique_ratio : float
+        一意な住所の割合
+    latency : str
+        代替サーバーの応答時間の分布
+    error_rate : float
+        代替サーバーが500を返す割合
+    throttle_rate : float
+        代替サーバーが429を返す割合
+    server_rate_limit : float, optional
+        代替サーバーの1秒あたりのリクエスト数の上限
+    seed : int
+        乱数のシード
+
+    Returns:
+    --------
+    Dict
+        rows, seconds, rows_per_second, api_calls, api_calls_per_row, status,
+        latency（p50/p95/p99）, latency_source, memory（mode='dataframe' の場合のみ。frame_memory の結果）
+    """
+    from gsi_geocoder import GSI_API_URL_ENV, GsiGeocoder, process_dataframe
+
+    df = generate_addresses(rows, unique_ratio, seed=seed)
+    client_latencies = []
+    memory = None
+
+    with MockGsiServer(latency=latency, error_rate=error_rate, throttle_rate=throttle_rate,
+                       rate_limit=server_rate_limit, seed=seed) as server, \
+            tempfile.TemporaryDirectory() as temp_dir:
+        start = time.perf_counter()
+        if mode == 'dataframe':
+            geocoder = GsiGeocoder(os.path.join(temp_dir, 'geocoding_cache.sqlite'),
+                                   base_url=server.url, pool_size=max(10, concurrency))
+            # クライアント側の応答時間（リクエスト送信からヘッダー受信まで）を記録する
+            geocoder.session.hooks['response'].append(
+                lambda response, *args, **kwargs: client_latencies.append(response.elapsed.total_seconds())
+            )
+            with geocoder:
+                # convert_addresses と同じく都道府県名を付けた住所を使う
+                df['normalized_address'] = add_prefecture(df['PREFECTURE'], df['ADDRESS'])
+                df['PREFECTURE'] = df['PREFECTURE'].astype('category')
+                result_df = process_dataframe(
+                    df,
+                    address_column='normalized_address',
+                    store_code_column='SAKAYA_DEALER_CODE',
+                    store_name_column='SAKAYA_DEALER_NAME',
+                    use_async=use_async,
+                    concurrency=concurrency,
+                    rate_limit=rate_limit,
+                    geocoder=geocoder
+                )
+            memory = frame_memory(result_df)
+        elif mode in ('convert', 'stream'):
+            import convert_addresses
+
+            # convert_addresses.main はカレントディレクトリの sample_restaurants.csv を読む
+            cwd = os.getcwd()
+            previous_url = os.environ.get(GSI_API_URL_ENV)
+            os.environ[GSI_API_URL_ENV] = server.url
+            os.chdir(temp_dir)
+            try:
+                df.to_csv('sample_restaurants.csv', index=False, encoding='utf-8')
+                start = time.perf_counter()
+                convert_addresses.main(['--stream'] if mode == 'stream' else [])
+            finally:
+                os.chdir(cwd)
+                if previous_url is None:
+                    del os.environ[GSI_API_URL_ENV]
+                else:
+                    os.environ[GSI_API_URL_ENV] = previous_url
+        else:
+            raise ValueError(f"mode は 'dataframe'・'convert'・'stream' のいずれかを指定してください: {mode}")
+        seconds = time.perf_counter() - start
+        stats = server.snapshot()
+        server_latencies = server.latency_sample()
+
+    report = {
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else None,
+        'api_calls': stats['requests'],
+        'api_calls_per_row': stats['requests'] / rows if rows else None,
+        'status': stats['status'],
+        'latency': percentiles(client_latencies or server_latencies),
+        'latency_source': 'client' if client_latencies else 'server'
+    }
+    if memory:
+        report['memory'] = memory
+    return report
+
+
+def format_report(report: Dict) -> str:
+    """負荷試験の結果を表示用の文字列にする"""
+    def ms(value):
+        return '-' if value is None else f"{value * 1000:.1f}ms"
+
+    latency = report['latency']
+    lines = [
+        "=== 負荷試験の結果 ===",
+        f"行数: {report['rows']}件 / {report['seconds']:.2f}秒（{report['rows_per_second']:.1f}件/秒）",
+        f"API呼び出し: {report['api_calls']}回（1行あたり {report['api_calls_per_row']:.3f}回）",
+        f"ステータス別: {report['status']}",
+        f"応答時間（{report['latency_source']}）: p50 {ms(latency['p50'])}, "
+        f"p95 {ms(latency['p95'])}, p99 {ms(latency['p99'])}"
+    ]
+    memory = report.get('memory')
+    if memory:
+        lines.append(
+            f"結果の使用メモリ: {memory['bytes'] / 1024 / 1024:.1f}MB"
+            f"（全ての列が object 型の場合 {memory['object_bytes'] / 1024 / 1024:.1f}MB、"
+            f"{memory['bytes'] / memory['object_bytes']:.0%}）"
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    """負荷試験のコマンド"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='住所検索APIの代替サーバーに対する負荷試験')
+    parser.add_argument('--rows', type=int, default=1000, help='行数')
+    parser.add_argument('--mode', choices=['dataframe', 'convert', 'stream'], default='dataframe',
+                        help='process_dataframe、convert_addresses.main、またはそのストリーミング処理を実行')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='並行処理を使う')
+    parser.add_argument('--concurrency', type=int, default=8, help='同時リクエスト数')
+    parser.add_argument('--rate-limit', type=float, help='固定の1秒あたりのリクエスト数（省略時は自動調整）')
+    parser.add_argument('--unique-ratio', type=float, default=0.5, help='一意な住所の割合')
+    parser.add_argument('--latency', default='constant:0.02',
+                        help='応答時間の分布（constant:秒 / uniform:最小,最大 / lognormal:中央値,sigma）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='500を返す割合')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='429を返す割合')
+    parser.add_argument('--server-rate-limit', type=float, help='代替サーバーの1秒あたりのリクエスト数の上限')
+    parser.add_argument('--seed', type=int, default=0, help='乱数のシード')
+    args = parser.parse_args()
+
+    report = run_load_test(
+        rows=args.rows,
+        mode=args.mode,
+        use_async=args.use_async,
+        concurrency=args.concurrency,
+        rate_limit=args.rate_limit,
+        unique_ratio=args.unique_ratio,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        server_rate_limit=args.server_rate_limit,
+        seed=args.seed
+    )
+    print()
+    print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()
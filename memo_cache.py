@@ -0,0 +1,156 @@
+"""
+住所の正規化・分割関数の結果のメモ化
+
+同じ住所は1行の処理の中でも（キャッシュのキー・APIの検索語・類似度・マッチングレベル）、
+重複の多い入力ファイルでは行をまたいでも、何度も正規化・分割される。
+引数だけで結果が決まる関数の結果を件数に上限のあるLRUキャッシュに保持し、2回目以降は再計算しない。
+
+- memoize で関数をメモ化する（結果は変更できない値であること）
+- memo_stats でヒット率などの利用状況、clear_memo_caches で全てのメモを消去する
+  （市区町村マッピングを更新した場合など）
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Hashable, Optional
+
+# 関数ごとに保持する結果の最大件数
+DEFAULT_MEMO_ENTRIES = 50000
+
+# 結果を保持していないことを表す値
+MISSING = object()
+
+# 作成した全てのメモ（memo_stats・clear_memo_caches で使う）
+_caches = weakref.WeakSet()
+
+
+class MemoCache:
+    """
+    件数に上限のある関数の結果のキャッシュ（最近使っていないものから追い出す）
+
+    複数のスレッド（asyncio の並行処理）から使えるよう、読み書きはロックの中で行う。
+    """
+
+    def __init__(self, name: str, max_entries: int = DEFAULT_MEMO_ENTRIES):
+        """
+        Args:
+            name: memo_stats に表示する名前（同じ名前のメモは合算する）
+            max_entries: 保持する結果の最大件数
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches.add(self)
+
+    def get(self, key: Hashable):
+        """結果を返す（保持していない場合は MISSING）"""
+        with self._lock:
+            value = self._entries.get(key, MISSING)
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value):
+        """結果を保持し、上限を超えた分を古いものから追い出す"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """保持している結果と件数の記録を消去する"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict:
+        """
+        利用状況を返す
+
+        Returns:
+        --------
+        Dict
+            hits, misses, evictions, hit_ratio, entries
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries)
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def memoize(max_entries: int = DEFAULT_MEMO_ENTRIES, name: Optional[str] = None) -> Callable:
+    """
+    関数の結果をメモ化するデコレーター
+
+    引数（位置引数・キーワード引数）が同じ呼び出しは保持した結果を返す。
+    メモ化した関数の memo 属性が MemoCache、__wrapped__ が元の関数。
+
+    Parameters:
+    -----------
+    max_entries : int
+        保持する結果の最大件数
+    name : str, optional
+        memo_stats に表示する名前（省略時は関数名）
+    """
+    def decorator(function: Callable) -> Callable:
+        cache = MemoCache(name or function.__qualname__, max_entries)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+            value = cache.get(key)
+            if value is MISSING:
+                value = function(*args, **kwargs)
+                cache.set(key, value)
+            return value
+
+        wrapper.memo = cache
+        return wrapper
+
+    return decorator
+
+
+def memo_stats() -> Dict[str, Dict]:
+    """
+    全てのメモの利用状況を名前ごとに返す（同じ名前のメモは合算する）
+
+    Returns:
+    --------
+    Dict[str, Dict]
+        名前 → hits, misses, evictions, hit_ratio, entries
+    """
+    totals = {}
+    for cache in list(_caches):
+        stats = cache.stats()
+        total = totals.setdefault(cache.name, {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0})
+        for field in total:
+            total[field] += stats[field]
+    for total in totals.values():
+        lookups = total['hits'] + total['misses']
+        total['hit_ratio'] = total['hits'] / lookups if lookups else 0.0
+    return dict(sorted(totals.items()))
+
+
+def clear_memo_caches():
+    """全てのメモを消去する"""
+    for cache in list(_caches):
+        cache.clear()
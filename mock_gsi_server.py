@@ -0,0 +1,308 @@
+"""
+国土地理院 住所検索API（AddressSearch）のローカル代替サーバー
+
+実際のAPIを使わずに GsiGeocoder の動作確認・性能測定を行うためのサーバー。
+AddressSearch と同じ形式のGeoJSON（[{geometry: {coordinates: [経度, 緯度]}, properties: {title}}]）を返す。
+
+- 応答する住所はフィクスチャ（住所, 緯度, 経度 のCSVまたはJSON）から引く。
+  フィクスチャにない住所は、都道府県名で始まる場合は住所から決まる座標を返し、それ以外は空の結果を返す
+- 応答時間の分布（constant / uniform / lognormal）を指定できる
+- 5xx・429を指定した割合で返し、1秒あたりのリクエスト数の上限を超えた場合も429を返す
+- /__stats でリクエスト数・ステータス別の件数を返す（stats にはサーバーでの処理時間の標本も記録する）
+
+使い方:
+    python mock_gsi_server.py --port 8080 --latency lognormal:0.05,0.5 --error-rate 0.01
+    GSI_ADDRESS_SEARCH_URL=http://127.0.0.1:8080/AddressSearch python convert_addresses.py
+"""
+
+import csv
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from address_utils import extract_prefecture
+
+# 処理時間を保持する最大件数（超えた分はリザーバーサンプリングで一様に間引く）
+LATENCY_SAMPLES = 10000
+
+
+def parse_latency(spec: str):
+    """
+    応答時間の分布の指定を、秒数を返す関数に変換する
+
+    Parameters:
+    -----------
+    spec : str
+        "constant:秒"、"uniform:最小,最大"、"lognormal:中央値,sigma" のいずれか
+
+    Returns:
+    --------
+    Callable[[random.Random], float]
+        乱数生成器を受け取り応答時間（秒）を返す関数
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(',') if value]
+    if kind == 'constant':
+        delay = values[0] if values else 0.0
+        return lambda rng: delay
+    if kind == 'uniform':
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == 'lognormal':
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"応答時間の分布の指定が正しくありません: {spec}")
+
+
+def load_fixtures(fixture_file: str) -> Dict[str, Tuple[float, float]]:
+    """
+    フィクスチャ（住所 → (緯度, 経度)）を読み込む
+
+    CSVの場合は address, latitude, longitude 列、JSONの場合は {住所: [緯度, 経度]}。
+    """
+    if fixture_file.lower().endswith('.json'):
+        with open(fixture_file, 'r', encoding='utf-8') as f:
+            return {address: tuple(coordinates) for address, coordinates in json.load(f).items()}
+    with open(fixture_file, 'r', encoding='utf-8') as f:
+        return {
+            row['address']: (float(row['latitude']), float(row['longitude']))
+            for row in csv.DictReader(f)
+        }
+
+
+def synthetic_coordinates(address: str) -> Tuple[float, float]:
+    """住所から決まる日本国内の座標（緯度, 経度）"""
+    digest = hashlib.sha256(address.encode('utf-8')).digest()
+    latitude = 31.0 + int.from_bytes(digest[:4], 'big') / 2 ** 32 * 12.0
+    longitude = 130.0 + int.from_bytes(digest[4:8], 'big') / 2 ** 32 * 12.0
+    return round(latitude, 6), round(longitude, 6)
+
+
+class MockGsiServer:
+    """
+    AddressSearch の代替サーバー
+
+    with 文で使うとバックグラウンドのスレッドで起動し、終了時に停止する。
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        fixtures: Optional[Dict[str, Tuple[float, float]]] = None,
+        latency: str = 'constant:0',
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        rate_limit: Optional[float] = None,
+        seed: Optional[int] = None,
+        latency_samples: int = LATENCY_SAMPLES
+    ):
+        """
+        Args:
+            host: 待ち受けるホスト
+            port: 待ち受けるポート（0の場合は空いているポート）
+            fixtures: 住所 → (緯度, 経度)
+            latency: 応答時間の分布（parse_latency の形式）
+            error_rate: 500を返す割合
+            throttle_rate: 429を返す割合
+            rate_limit: 1秒あたりのリクエスト数の上限（超えた分は429）
+            seed: 乱数のシード
+            latency_samples: 処理時間を保持する最大件数
+        """
+        self.fixtures = fixtures or {}
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        # 処理時間の間引きには応答の乱数と別の乱数を使う（応答の並びがスレッドの実行順に左右されない）
+        self._sample_random = random.Random(seed)
+        self.latency_samples = latency_samples
+        self.stats = {'requests': 0, 'status': {}, 'latencies': [], 'latency_count': 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """AddressSearch のURL"""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/AddressSearch'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path == '/__stats':
+                    self._send(200, server.snapshot())
+                    return
+                start = time.monotonic()
+                query = parse_qs(parsed.query).get('q', [''])[0]
+                status, body, delay = server.respond(query)
+                time.sleep(delay)
+                self._send(status, body)
+                server.record_latency(time.monotonic() - start)
+
+            def _send(self, status: int, body):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if status == 429:
+                    self.send_header('Retry-After', '1')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _over_rate_limit(self) -> bool:
+        """1秒ごとの区間でリクエスト数の上限を超えたかどうか"""
+        if self.rate_limit is None:
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+        return self._window_count > self.rate_limit
+
+    def respond(self, query: str) -> Tuple[int, object, float]:
+        """
+        検索語に対する応答を決める
+
+        Returns:
+        --------
+        Tuple[int, object, float]
+            (ステータスコード, レスポンスのJSON, 応答までの秒数)
+        """
+        with self._lock:
+            delay = self.latency(self._random)
+            roll = self._random.random()
+            if self._over_rate_limit() or roll < self.throttle_rate:
+                status, body = 429, {'message': 'Too Many Requests'}
+            elif roll < self.throttle_rate + self.error_rate:
+                status, body = 500, {'message': 'Internal Server Error'}
+            else:
+                status, body = 200, self.features(query)
+            self.stats['requests'] += 1
+            self.stats['status'][status] = self.stats['status'].get(status, 0) + 1
+        return status, body, delay
+
+    def record_latency(self, seconds: float):
+        """
+        サーバーで処理にかかった時間を記録する
+
+        長時間動かしてもメモリが増え続けないよう、latency_samples 件を超えた分は
+        リザーバーサンプリングで置き換える（stats['latencies'] は全件からの一様な標本）。
+        """
+        with self._lock:
+            latencies = self.stats['latencies']
+            self.stats['latency_count'] += 1
+            if len(latencies) < self.latency_samples:
+                latencies.append(seconds)
+                return
+            slot = self._sample_random.randrange(self.stats['latency_count'])
+            if slot < self.latency_samples:
+                latencies[slot] = seconds
+
+    def latency_sample(self) -> List[float]:
+        """記録した処理時間の標本のコピー"""
+        with self._lock:
+            return list(self.stats['latencies'])
+
+    def features(self, query: str) -> List[Dict]:
+        """AddressSearch 形式の検索結果"""
+        query = ''.join(query.split())
+        if query in self.fixtures:
+            latitude, longitude = self.fixtures[query]
+        elif query and extract_prefecture(query)[0]:
+            latitude, longitude = synthetic_coordinates(query)
+        else:
+            return []
+        return [{
+            'geometry': {'coordinates': [longitude, latitude], 'type': 'Point'},
+            'type': 'Feature',
+            'properties': {'addressCode': '', 'title': query}
+        }]
+
+    def snapshot(self) -> Dict:
+        """リクエスト数とステータス別の件数"""
+        with self._lock:
+            return {'requests': self.stats['requests'], 'status': dict(self.stats['status'])}
+
+    def serve_forever(self):
+        """現在のスレッドでリクエストを待ち受ける（Ctrl+Cで終了）"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def start(self) -> 'MockGsiServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        # shutdown() は serve_forever が動いていないと戻らない
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> 'MockGsiServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    """代替サーバーを起動するコマンド"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='国土地理院 住所検索APIのローカル代替サーバー')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--fixtures', help='住所, 緯度, 経度 のCSVまたはJSON')
+    parser.add_argument('--latency', default='constant:0',
+                        help='応答時間の分布（constant:秒 / uniform:最小,最大 / lognormal:中央値,sigma）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='500を返す割合')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='429を返す割合')
+    parser.add_argument('--rate-limit', type=float, help='1秒あたりのリクエスト数の上限')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server = MockGsiServer(
+        args.host, args.port,
+        fixtures=load_fixtures(args.fixtures) if args.fixtures else None,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed
+    )
+    print(f"代替サーバーを起動しました: {server.url}")
+    print(f"GSI_ADDRESS_SEARCH_URL={server.url} を設定して実行してください（Ctrl+Cで終了）")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,36 @@
-import json
 import re
 
+from address_utils import tokenize_address
+from city_index import open_city_index
+from city_trie import CityNameTrie
+from memo_cache import MISSING, DEFAULT_MEMO_ENTRIES, MemoCache
+
 class AddressNormalizer:
-    def __init__(self, mapping_file: str):
+    def __init__(self, mapping_file: str, memo_entries: int = DEFAULT_MEMO_ENTRIES):
         """
         住所正規化クラスの初期化
         Args:
             mapping_file: 市区町村マッピングのJSONファイルパス
+            memo_entries: 正規化の結果を保持する最大件数（同じ住所は再計算しない）
         """
-        # マッピングデータの読み込み
-        with open(mapping_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.city_mapping = data['mapping']
+        # 合併を最後まで辿った解決テーブルをバイナリインデックスから読み込む
+        # （マッピングファイルが更新されている場合はインデックスを再構築する）
+        self.resolver = open_city_index(mapping_file)
         
         # 都道府県名のパターン
         self.prefecture_pattern = r'(...??[都道府県])'
         
-        # マッピングされている旧市区町村名のパターンを作成
-        # 最長一致を優先するため、長い名前から順にマッチングする
-        old_cities = sorted(self.city_mapping.keys(), key=len, reverse=True)
-        self.old_cities_pattern = '|'.join(map(re.escape, old_cities))
+        # マッピングされている旧市区町村名のトライを作成
+        # 住所を一度走査するだけで各位置の最長一致を見つける
+        self.old_city_trie = CityNameTrie(self.resolver)
+        
+        # 住所 → (正規化後の住所, 適用された変更のタプル)
+        self.memo = MemoCache('AddressNormalizer.normalize', memo_entries)
+    
+    @property
+    def city_mapping(self) -> dict:
+        """元の市区町村マッピング（旧市区町村名 → 変更のリスト）"""
+        return self.resolver.mapping
     
     def normalize(self, address: str) -> tuple[str, list[dict]]:
         """
@@ -31,7 +42,17 @@ class AddressNormalizer:
         """
         if not address:
             return address, []
-            
+        
+        # 同じ住所は保持した結果を返す（変更のリストは呼び出し元で変更されてもよいよう複製する）
+        memoized = self.memo.get(address)
+        if memoized is MISSING:
+            memoized = self._normalize(address)
+            self.memo.set(address, memoized)
+        normalized, changes = memoized
+        return normalized, [dict(change) for change in changes]
+    
+    def _normalize(self, address: str) -> tuple[str, tuple[dict, ...]]:
+        """住所を正規化する（normalize の本体。変更はタプルで返す）"""
         # スペースを削除
         normalized = ''.join(address.split())
         changes = []
@@ -39,36 +60,33 @@ class AddressNormalizer:
         # 都道府県名を抽出
         prefecture_match = re.search(self.prefecture_pattern, normalized)
         if not prefecture_match:
-            return normalized, changes
+            return normalized, ()
         
         prefecture = prefecture_match.group(1)
         
-        # 政令指定都市のチェック（市区を含む場合）
-        if re.search(r'市[^市]*区', normalized):
-            return normalized, changes
+        # 政令指定都市のチェック（市の後ろに区を含む場合）
+        if tokenize_address(normalized).ward:
+            return normalized, ()
+        
+        # 旧市区町村名を検索し、同じ走査の中で新市区町村名に置換
+        def replace_city(old_city_name: str) -> str:
+            # 合併を最後まで辿った現在の市区町村名を使用
+            resolution = self.resolver.resolve(old_city_name)
+            
+            # 都道府県名を除いた新市区町村名を使用
+            new_city_name = resolution.final_city.replace(prefecture, '')
+            
+            # 変更を記録
+            changes.append({
+                'old': old_city_name,
+                'new': new_city_name,
+                'merge_date': resolution.merge_date
+            })
+            return new_city_name
         
-        # 旧市区町村名を検索し、新市区町村名に置換
-        for old_city_full in re.finditer(self.old_cities_pattern, normalized):
-            old_city_name = old_city_full.group(0)
-            if old_city_name in self.city_mapping:
-                # 最新の合併情報を使用（リストの最後の要素）
-                latest_merge = self.city_mapping[old_city_name][-1]
-                new_city_name = latest_merge['new_city']
-                
-                # 都道府県名を除いた新市区町村名を使用
-                new_city_name = new_city_name.replace(prefecture, '')
-                
-                # 変更を記録
-                changes.append({
-                    'old': old_city_name,
-                    'new': new_city_name,
-                    'merge_date': latest_merge['merge_date']
-                })
-                
-                # 住所を更新
-                normalized = normalized.replace(old_city_name, new_city_name)
+        normalized, _ = self.old_city_trie.replace(normalized, replace_city)
         
-        return normalized, changes
+        return normalized, tuple(changes)
 
 def main():
     # 使用例
@@ -0,0 +1,259 @@
+"""
+APIの応答に応じたリクエスト数の自動調整
+
+AdaptiveRateController はAIMD（加算増加・乗算減少）で1秒あたりのリクエスト数を調整する。
+- 応答時間とエラー率が目標以下の間は少しずつリクエスト数を上げる
+- 429・5xx・タイムアウト、または応答時間が目標を超えた場合はリクエスト数を下げる
+- 失敗が続いた場合はサーキットブレーカーを開き、一定時間リクエストを止める
+
+失敗したリクエストの再試行の待ち時間は、ジッター付きの指数バックオフで求める。
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+# 失敗の種類
+FAILURE_THROTTLED = 'throttled'        # 429 Too Many Requests
+FAILURE_SERVER_ERROR = 'server_error'  # 5xx
+FAILURE_TIMEOUT = 'timeout'            # タイムアウト
+FAILURE_CONNECTION = 'connection'      # 接続エラー
+
+# サーキットブレーカーの状態
+CIRCUIT_CLOSED = 'closed'        # 通常どおりリクエストする
+CIRCUIT_OPEN = 'open'            # リクエストを止めている
+CIRCUIT_HALF_OPEN = 'half_open'  # 試しに1件だけリクエストする
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているためリクエストしなかった"""
+
+
+class CircuitBreaker:
+    """
+    連続した失敗でリクエストを止めるサーキットブレーカー
+
+    failure_threshold 回続けて失敗すると開き、reset_timeout 秒後に1件だけ試す。
+    その1件が成功すれば閉じ、失敗すれば再び開く。
+    """
+
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: ブレーカーを開く連続失敗回数
+            reset_timeout: 開いてから試しにリクエストするまでの秒数
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """リクエストしてよいかどうか"""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = CIRCUIT_HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.state = CIRCUIT_CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or (
+                self.state == CIRCUIT_CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state == CIRCUIT_CLOSED:
+                    print(f"Warning: APIの失敗が{self.consecutive_failures}回続いたため、"
+                          f"{self.reset_timeout:.0f}秒間リクエストを停止します")
+                self.state = CIRCUIT_OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+
+
+class AdaptiveRateController:
+    """
+    応答時間と429・5xx・タイムアウトに応じて1秒あたりのリクエスト数を調整する
+
+    成功のたびに increase / rate ずつ（約1秒あたり increase）リクエスト数を上げ、
+    失敗や応答時間の超過では decrease 倍に下げる。連続して下げすぎないよう、
+    下げた後 cooldown 秒は次の減少を行わない。
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 2.0,
+        min_rate: float = 0.2,
+        max_rate: float = 20.0,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+        target_latency: float = 1.0,
+        max_error_rate: float = 0.05,
+        window: int = 50,
+        cooldown: float = 1.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        Args:
+            initial_rate: 最初の1秒あたりのリクエスト数
+            min_rate: 1秒あたりのリクエスト数の下限
+            max_rate: 1秒あたりのリクエスト数の上限
+            increase: 約1秒あたりに上げるリクエスト数
+            decrease: 失敗時にリクエスト数に掛ける係数
+            target_latency: 目標の応答時間（秒）
+            max_error_rate: リクエスト数を上げてよい直近のエラー率の上限
+            window: エラー率・応答時間を集計する直近のリクエスト数
+            cooldown: リクエスト数を下げた後、次に下げるまでの秒数
+            breaker: サーキットブレーカー（省略時は既定の設定で作成）
+        """
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.breaker = breaker or CircuitBreaker()
+        self._recent = deque(maxlen=window)  # (応答時間, 成功したかどうか)
+        self._decreased_at = None
+        self._lock = threading.Lock()
+        self.counts = {
+            'requests': 0,
+            'successes': 0,
+            FAILURE_THROTTLED: 0,
+            FAILURE_SERVER_ERROR: 0,
+            FAILURE_TIMEOUT: 0,
+            FAILURE_CONNECTION: 0,
+            'retries': 0,
+            'slow_responses': 0
+        }
+
+    def interval(self) -> float:
+        """現在のリクエスト数での1件あたりの間隔（秒）"""
+        return 1.0 / self.rate
+
+    def allow_request(self) -> bool:
+        """サーキットブレーカーが閉じていてリクエストしてよいかどうか"""
+        return self.breaker.allow()
+
+    def _error_rate(self) -> float:
+        if not self._recent:
+            return 0.0
+        return sum(1 for _, ok in self._recent if not ok) / len(self._recent)
+
+    def _decrease(self):
+        now = time.monotonic()
+        if self._decreased_at is not None and now - self._decreased_at < self.cooldown:
+            return
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self._decreased_at = now
+
+    def record_success(self, latency: float):
+        """成功したリクエストの応答時間（秒）を記録する"""
+        with self._lock:
+            self.counts['requests'] += 1
+            self.counts['successes'] += 1
+            self._recent.append((latency, True))
+            if latency > self.target_latency:
+                self.counts['slow_responses'] += 1
+                self._decrease()
+            elif self._error_rate() <= self.max_error_rate:
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+        self.breaker.record_success()
+
+    def record_failure(self, kind: str, latency: Optional[float] = None):
+        """
+        失敗したリクエストを記録する
+
+        Args:
+            kind: 失敗の種類（FAILURE_THROTTLED, FAILURE_SERVER_ERROR, FAILURE_TIMEOUT, FAILURE_CONNECTION）
+            latency: 応答時間（秒）
+        """
+        with self._lock:
+            self.counts['requests'] += 1
+            self.counts[kind] += 1
+            self._recent.append((latency, False))
+            self._decrease()
+        self.breaker.record_failure()
+
+    def record_retry(self):
+        with self._lock:
+            self.counts['retries'] += 1
+
+    def metrics(self) -> Dict:
+        """
+        コントローラーの状態を返す
+
+        Returns:
+        --------
+        Dict
+            rate, error_rate, mean_latency, circuit_state, circuit_trips と各件数
+        """
+        with self._lock:
+            latencies = [latency for latency, _ in self._recent if latency is not None]
+            return dict(
+                self.counts,
+                rate=self.rate,
+                error_rate=self._error_rate(),
+                mean_latency=sum(latencies) / len(latencies) if latencies else None,
+                circuit_state=self.breaker.state,
+                circuit_trips=self.breaker.trips
+            )
+
+
+def partitioned_rate_controller(parts: int, **options) -> AdaptiveRateController:
+    """
+    複数のプロセスで同じAPIを呼び出す場合の1プロセス分のコントローラー
+
+    最初のリクエスト数・下限・上限・増加量をプロセス数で割り、
+    全プロセスの合計が1プロセスの場合と同じ範囲に収まるようにする。
+
+    Args:
+        parts: プロセス数
+        options: AdaptiveRateController に渡す引数（割る前の値）
+    """
+    controller = AdaptiveRateController(**options)
+    controller.rate /= parts
+    controller.min_rate /= parts
+    controller.max_rate /= parts
+    controller.increase /= parts
+    return controller
+
+
+def retry_delay(attempt: int, base: float = 0.5, cap: float = 30.0,
+                retry_after: Optional[float] = None) -> float:
+    """
+    再試行までの待ち時間をジッター付きの指数バックオフで求める
+
+    Parameters:
+    -----------
+    attempt : int
+        何回目の再試行か（0から）
+    base : float
+        最初の待ち時間の上限（秒）
+    cap : float
+        待ち時間の上限（秒）
+    retry_after : float, optional
+        サーバーが Retry-After で指定した秒数（これより短くはしない）
+
+    Returns:
+    --------
+    float
+        待ち時間（秒）
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(cap, retry_after))
+    return delay
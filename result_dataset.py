@@ -0,0 +1,166 @@
+"""
+ジオコーディング結果のParquetデータセット
+
+バッチごとの結果を、都道府県・match_status で分割した1つのParquetデータセット
+（prefecture=東京都/match_status=matched/batch-00001-0.parquet の形）に追記し、読み込む。
+緯度経度・類似度は float64、丁目・番地・号の一致は bool、それ以外の列は文字列として保存する。
+読み込んだ prefecture・match_status はカテゴリ型になる。
+
+pyarrow が必要（使う時だけ読み込む）。
+"""
+
+import os
+from typing import List, Optional, Union
+
+import pandas as pd
+
+from address_series import prefecture_series
+
+# 分割に使う列（prefecture は normalized_address の先頭の都道府県名。ない場合は UNKNOWN_PREFECTURE）
+PARTITION_COLUMNS = ['prefecture', 'match_status']
+UNKNOWN_PREFECTURE = '不明'
+
+FLOAT_COLUMNS = ['latitude', 'longitude', 'similarity']
+BOOL_COLUMNS = ['chome_match', 'banchi_match', 'go_match']
+
+# 圧縮方式（CSVに比べてファイルを小さくする）
+COMPRESSION = 'zstd'
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquetで保存・読み込みするには pyarrow をインストールしてください") from e
+    return pa, ds, pq
+
+
+def result_table(result_df: pd.DataFrame):
+    """
+    process_dataframe の結果を型付きの Arrow テーブルに変換する
+
+    バッチごとに推定される型が変わってもデータセットのスキーマが揃うよう、
+    結果の列以外（入力の列）は文字列にする。
+
+    Returns:
+    --------
+    pyarrow.Table
+        結果の列と、分割に使う prefecture 列を持つテーブル
+    """
+    pa, _, _ = _pyarrow()
+    fields = []
+    columns = {}
+    for name in result_df.columns:
+        values = result_df[name]
+        if name in FLOAT_COLUMNS:
+            fields.append(pa.field(name, pa.float64()))
+            columns[name] = values.astype(float)
+        elif name in BOOL_COLUMNS:
+            fields.append(pa.field(name, pa.bool_()))
+            columns[name] = values.fillna(False).astype(bool)
+        else:
+            fields.append(pa.field(name, pa.string()))
+            columns[name] = values.astype(object).where(values.notna(), None).map(
+                lambda value: value if value is None else str(value)
+            )
+    prefectures = prefecture_series(result_df['normalized_address'])
+    columns['prefecture'] = prefectures.where(prefectures != '', UNKNOWN_PREFECTURE)
+    fields.append(pa.field('prefecture', pa.string()))
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=pa.schema(fields), preserve_index=False)
+
+
+def batch_basename(batch_num: int) -> str:
+    """バッチのファイル名の先頭（batch-00001-）"""
+    return f"batch-{batch_num:05d}-"
+
+
+def remove_batch_files(dataset_dir: str, batch_num: int) -> int:
+    """
+    データセットの全ての分割からバッチのファイルを削除する
+
+    Returns:
+    --------
+    int
+        削除したファイル数
+    """
+    prefix = batch_basename(batch_num)
+    removed = 0
+    for directory, _, files in os.walk(dataset_dir):
+        for name in files:
+            if name.startswith(prefix) and name.endswith('.parquet'):
+                os.remove(os.path.join(directory, name))
+                removed += 1
+    return removed
+
+
+def write_result_batch(result_df: pd.DataFrame, dataset_dir: str, batch_num: int):
+    """
+    バッチの結果をデータセットに追記する
+
+    ファイル名はバッチ番号で決まる。同じバッチを処理し直した場合（中断からの再開など）は
+    先に前回のファイルを全ての分割から削除するため、行の都道府県・match_status が前回と
+    変わっても古い行は残らない。
+
+    Parameters:
+    -----------
+    result_df : pd.DataFrame
+        process_dataframe の結果
+    dataset_dir : str
+        データセットのディレクトリ
+    batch_num : int
+        バッチ番号
+    """
+    _, _, pq = _pyarrow()
+    table = result_table(result_df)
+    remove_batch_files(dataset_dir, batch_num)
+    pq.write_to_dataset(
+        table,
+        root_path=dataset_dir,
+        partition_cols=PARTITION_COLUMNS,
+        basename_template=batch_basename(batch_num) + "{i}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        compression=COMPRESSION
+    )
+
+
+def read_results(
+    dataset_dir: str,
+    columns: Optional[List[str]] = None,
+    prefecture: Union[str, List[str], None] = None,
+    match_status: Union[str, List[str], None] = None
+) -> pd.DataFrame:
+    """
+    データセットを読み込む（指定した都道府県・match_status の分割だけを読む）
+
+    Parameters:
+    -----------
+    dataset_dir : str
+        データセットのディレクトリ
+    columns : List[str], optional
+        読み込む列（省略時は全て）
+    prefecture : str or List[str], optional
+        読み込む都道府県
+    match_status : str or List[str], optional
+        読み込む match_status（'matched', 'unmatched', 'missing_address'）
+
+    Returns:
+    --------
+    pd.DataFrame
+        結果（行の順序は分割・バッチの順。prefecture・match_status はカテゴリ型）
+    """
+    _, ds, _ = _pyarrow()
+    dataset = ds.dataset(
+        dataset_dir,
+        format='parquet',
+        partitioning=ds.HivePartitioning.discover(infer_dictionary=True)
+    )
+    condition = None
+    for name, values in (('prefecture', prefecture), ('match_status', match_status)):
+        if values is None:
+            continue
+        values = [values] if isinstance(values, str) else list(values)
+        expression = ds.field(name).isin(values)
+        condition = expression if condition is None else condition & expression
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
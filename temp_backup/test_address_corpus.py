@@ -0,0 +1,56 @@
+import itertools
+import os
+import random
+import tempfile
+import unittest
+import pandas as pd
+from address_corpus import COLUMNS, INVALID_PREFECTURE, format_block_number, generate_rows, kanji_numeral, write_corpus
+from address_utils import VALID_PREFECTURES, normalize_address_numbers
+
+class TestAddressCorpus(unittest.TestCase):
+    def test_deterministic(self):
+        """同じシードで同じ行を作成し、シードが違えば別の行を作成するテスト"""
+        rows = list(generate_rows(200, seed=5))
+        self.assertEqual(rows, list(generate_rows(200, seed=5)))
+        self.assertNotEqual(rows, list(generate_rows(200, seed=6)))
+        self.assertEqual(list(rows[0]), COLUMNS)
+
+    def test_proportions(self):
+        """指定した割合で無効な都道府県名・重複を混ぜるテスト"""
+        rows = list(generate_rows(2000, proportions={'invalid_prefecture': 0.0, 'garbage': 0.0},
+                                  duplicate_rate=0.0))
+        self.assertNotIn(INVALID_PREFECTURE, {row['PREFECTURE'] for row in rows})
+        self.assertTrue({row['PREFECTURE'] for row in rows} <= VALID_PREFECTURES | {''})
+
+        rows = list(generate_rows(2000, proportions={'invalid_prefecture': 1.0}, duplicate_rate=0.5))
+        self.assertGreater(sum(row['PREFECTURE'] == INVALID_PREFECTURE for row in rows), 1800)
+        unique_ratio = len({row['ADDRESS'] for row in rows}) / len(rows)
+        self.assertAlmostEqual(unique_ratio, 0.5, delta=0.05)
+
+        with self.assertRaises(ValueError):
+            next(generate_rows(1, proportions={'typo': 0.1}))
+
+    def test_kanji_block_number(self):
+        """位取りの漢数字の丁目・番地が正規化で算用数字に戻るテスト"""
+        self.assertEqual([kanji_numeral(number) for number in (3, 10, 12, 23, 30)],
+                         ['三', '十', '十二', '二十三', '三十'])
+        rng = random.Random(0)
+        for _ in range(50):
+            numbers = format_block_number(rng, 12, 23, 5, kanji=True)
+            with self.subTest(numbers=numbers):
+                self.assertTrue(numbers.startswith('十二丁目'))
+                normalized = normalize_address_numbers(numbers)
+                self.assertTrue(normalized.startswith('12丁目23'))
+                self.assertTrue(normalized.rstrip('号').endswith('5'))
+
+    def test_write_csv(self):
+        """CSVに書き出した行を読み込めるテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_file = os.path.join(temp_dir, 'corpus.csv')
+            self.assertEqual(write_corpus(output_file, 300, seed=2), 300)
+            df = pd.read_csv(output_file, encoding='utf-8', keep_default_na=False, dtype=str)
+        self.assertEqual(list(df.columns), COLUMNS)
+        self.assertEqual(df.to_dict('records'), list(itertools.islice(generate_rows(300, seed=2), 300)))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,4 +1,5 @@
 import unittest
+from city_trie import CityNameTrie
 from normalize_address import AddressNormalizer
 
 class TestAddressNormalizer(unittest.TestCase):
@@ -125,5 +126,15 @@ class TestAddressNormalizer(unittest.TestCase):
                 normalized, _ = self.normalizer.normalize(case['input'])
                 self.assertEqual(normalized, case['expected'])
 
+    def test_trie_longest_match(self):
+        """トライによる最長一致・一括置換のテスト"""
+        trie = CityNameTrie(['山梨県中巨摩郡', '山梨県中巨摩郡竜王町', '竜王町'])
+        self.assertEqual(trie.longest_match('山梨県中巨摩郡竜王町1234'), '山梨県中巨摩郡竜王町')
+        self.assertEqual(trie.find_all('竜王町と山梨県中巨摩郡1'), [(0, '竜王町'), (4, '山梨県中巨摩郡')])
+        
+        replaced, names = trie.replace('山梨県中巨摩郡竜王町1竜王町2', lambda name: '甲斐市')
+        self.assertEqual(replaced, '甲斐市1甲斐市2')
+        self.assertEqual(names, ['山梨県中巨摩郡竜王町', '竜王町'])
+
 if __name__ == '__main__':
     unittest.main(verbosity=2) 
\ No newline at end of file
@@ -0,0 +1,216 @@
+import unittest
+import pandas as pd
+from address_series import (
+    add_prefecture,
+    normalize_address_numbers_series,
+    prefecture_series,
+    strip_whitespace_series
+)
+from address_utils import (
+    CandidateScorer,
+    analyze_address_match_level,
+    calculate_address_similarity,
+    extract_address_parts,
+    extract_prefecture,
+    improve_address_matching,
+    normalize_address_numbers,
+    normalize_number,
+    parse_kanji_number,
+    tokenize_address
+)
+
+class TestAddressTokenizer(unittest.TestCase):
+    def test_tokenize(self):
+        """住所の構成要素への分割テスト"""
+        test_cases = [
+            {
+                'input': '長崎県西彼杵郡多良見町下郡1234',
+                'expected': ('長崎県', '西彼杵郡', '多良見町', '', '下郡', None, None, None, '1234')
+            },
+            {
+                'input': '埼玉県さいたま市浦和区高砂3丁目15番1号',
+                'expected': ('埼玉県', '', 'さいたま市', '浦和区', '高砂', '3', '15', '1', '')
+            },
+            {
+                'input': '東京都新宿区西新宿２－８－１ 都庁',
+                'expected': ('東京都', '', '新宿区', '', '西新宿', '2', '8', '1', '都庁')
+            },
+            # 区切り文字を含む市の名前
+            {
+                'input': '三重県四日市市諏訪町1-5',
+                'expected': ('三重県', '', '四日市市', '', '諏訪町', '1', '5', None, '')
+            },
+            {
+                'input': '東京都東村山市本町一丁目2-3',
+                'expected': ('東京都', '', '東村山市', '', '本町', '1', '2', '3', '')
+            },
+            # 「郡」を含む市の名前
+            {
+                'input': '奈良県大和郡山市北郡山町185-1',
+                'expected': ('奈良県', '', '大和郡山市', '', '北郡山町', '185', '1', None, '')
+            },
+            # 町名の直後に「市」で始まる町域名
+            {
+                'input': '岐阜県揖斐郡池田町市橋1-2',
+                'expected': ('岐阜県', '揖斐郡', '池田町', '', '市橋', '1', '2', None, '')
+            },
+            {
+                'input': '北海道余市郡余市町黒川町1',
+                'expected': ('北海道', '余市郡', '余市町', '', '黒川町', None, None, None, '1')
+            },
+            # 都道府県名のない住所
+            {
+                'input': '場所不明',
+                'expected': ('', '', '', '', '場所不明', None, None, None, '')
+            }
+        ]
+
+        for case in test_cases:
+            with self.subTest(input=case['input']):
+                self.assertEqual(tuple(tokenize_address(case['input']))[:-1], case['expected'])
+
+    def test_reuse_tokens(self):
+        """分割済みの住所を各関数で再利用するテスト"""
+        tokens = tokenize_address('静岡県静岡市葵区追手町9番地の50')
+        self.assertEqual(extract_address_parts(tokens), (None, '9', None))
+        self.assertEqual(extract_prefecture('静岡県静岡市葵区追手町'), ('静岡県', '静岡市葵区追手町'))
+        self.assertEqual(
+            analyze_address_match_level(tokens, '静岡県静岡市葵区追手町9番'),
+            {'chome_match': False, 'banchi_match': True, 'go_match': False}
+        )
+
+class TestKanjiNumbers(unittest.TestCase):
+    def test_parse_kanji_number(self):
+        """位取り・〇・全角数字の混在した数字の並びを読むテスト"""
+        test_cases = {
+            '十': '10', '十二': '12', '二十三': '23', '百五': '105', '千二百三': '1203',
+            '二〇三': '203', '一二': '12', '１２': '12', '２十３': '23', '08': '08'
+        }
+        for numeral, expected in test_cases.items():
+            with self.subTest(numeral=numeral):
+                self.assertEqual(parse_kanji_number(numeral), expected)
+
+    def test_address_number_context(self):
+        """丁目・番地・号の前の数字だけを変換し、地名の漢数字は保持するテスト"""
+        test_cases = {
+            '新宿区十二丁目二十三番地百五号': '新宿区12丁目23番地105号',
+            '新宿区１２丁目23番地１０５号': '新宿区12丁目23番地105号',
+            '札幌市中央区北十条西十一丁目': '札幌市中央区北十条西11丁目',
+            '港区麻布十番一丁目': '港区麻布十番1丁目',
+            '千代田区一番町': '千代田区一番町',
+            '東京都千代田区一番町5': '東京都千代田区一番町5',
+            # 「番」の後に数字・ハイフンが続く地名
+            '東京都港区麻布十番2-3-4': '東京都港区麻布十番2-3-4',
+            '東京都港区麻布十番２－３': '東京都港区麻布十番2－3',
+            # 丁目の直後の「番」は番地
+            '新宿区西新宿2丁目八番1号': '新宿区西新宿2丁目8番1号',
+            '中央区八丁堀三丁目八番一号': '中央区八丁堀3丁目8番1号',
+            '四万十市中村二〇三号': '四万十市中村203号'
+        }
+        for address, expected in test_cases.items():
+            with self.subTest(address=address):
+                self.assertEqual(normalize_address_numbers(address), expected)
+        self.assertEqual(normalize_number('二十三'), '23')
+
+        tokens = tokenize_address('東京都港区麻布十番2-3-4')
+        self.assertEqual((tokens.town, tokens.chome, tokens.banchi, tokens.go), ('麻布十番', '2', '3', '4'))
+
+class TestCandidateScorer(unittest.TestCase):
+    def test_edit_distance(self):
+        """編集距離が動的計画法で求めた値と一致するテスト"""
+        def reference(a, b):
+            previous = list(range(len(b) + 1))
+            for i, x in enumerate(a, 1):
+                current = [i]
+                for j, y in enumerate(b, 1):
+                    current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+                previous = current
+            return previous[-1]
+
+        words = ['', '新宿区', '新宿区西新宿2丁目8-1', '西新宿町2丁目', '新宿区西新宿2丁目8-1新宿区西新宿2丁目8-1新宿区西新宿2丁目8-1',
+                 '渋谷区道玄坂1丁目', '宿区西新宿2丁目8-11']
+        for a in words:
+            for b in words:
+                with self.subTest(a=a, b=b):
+                    self.assertEqual(CandidateScorer(a).edit_distance(b), reference(a, b))
+
+    def test_similarity(self):
+        """途中に文字が挿入された住所の類似度と、以前の計算方法のテスト"""
+        inserted = ('新宿区西新宿2丁目8-1', '新宿区西新宿町2丁目8-1')
+        self.assertGreater(calculate_address_similarity(*inserted), 0.8)
+        self.assertLess(calculate_address_similarity(*inserted, metric='legacy'), 0.5)
+        self.assertEqual(calculate_address_similarity('新宿区西新宿２丁目', '新宿区 西新宿二丁目'), 1.0)
+        self.assertEqual(calculate_address_similarity('新宿区西新宿2丁目', '新宿区西新宿2丁目8-1', metric='legacy'), 0.8)
+        self.assertEqual(
+            CandidateScorer('新宿区西新宿2丁目8-1').score(['新宿区西新宿2丁目8-1', '', '新宿区西新宿2丁目8-1']),
+            [1.0, 0.0, 1.0]
+        )
+        with self.assertRaises(ValueError):
+            CandidateScorer('新宿区', metric='unknown')
+
+    def test_improve_address_matching(self):
+        """番地まで一致する候補を町域までの候補より優先するテスト"""
+        candidates = ['東京都新宿区西新宿二丁目', '東京都新宿区西新宿二丁目8', '大阪府大阪市北区梅田一丁目8']
+        best, similarity = improve_address_matching('東京都新宿区西新宿2丁目8番1号', candidates)
+        self.assertEqual(best, '東京都新宿区西新宿二丁目8')
+        self.assertGreater(similarity, 0.9)
+        # 以前の計算方法では一方が他方を含む候補は全て0.8になり、先頭の候補を選ぶ
+        self.assertEqual(
+            improve_address_matching('東京都新宿区西新宿2丁目8番1号', candidates, metric='legacy'),
+            ('東京都新宿区西新宿二丁目', 0.9)
+        )
+        self.assertEqual(improve_address_matching('東京都新宿区', ['大阪府大阪市']), ('東京都新宿区', -1))
+
+class TestAddressSeries(unittest.TestCase):
+    def test_add_prefecture(self):
+        """都道府県名の付与のテスト"""
+        prefectures = pd.Series(['東京都', '不明', '東京都', None, '埼玉県'])
+        addresses = pd.Series(['新宿区1234', '場所不明', '東京都新宿区1234', '新宿区1234', None])
+        result = add_prefecture(prefectures, addresses)
+
+        self.assertEqual(result[:4].tolist(), ['東京都新宿区1234', '場所不明', '東京都新宿区1234', '新宿区1234'])
+        self.assertTrue(pd.isna(result[4]))
+
+        # 3文字・4文字の都道府県名が混在し、欠損値を含む場合
+        prefectures = pd.Series(['神奈川県', '大阪府', None, '神奈川県', '大阪府'])
+        addresses = pd.Series(['神奈川県横浜市1', '大阪府北区2', '港区3', '横浜市4', '北区5'])
+        for values in (prefectures, prefectures.astype('category'), prefectures.astype('str')):
+            with self.subTest(dtype=str(values.dtype)):
+                self.assertEqual(
+                    add_prefecture(values, addresses).tolist(),
+                    ['神奈川県横浜市1', '大阪府北区2', '港区3', '神奈川県横浜市4', '大阪府北区5']
+                )
+
+        # 文字列型の列で都道府県名を付ける行がない場合
+        addresses = pd.Series(['東京都新宿区1', '埼玉県川口市2'], dtype='str')
+        result = add_prefecture(pd.Series(['東京都', '埼玉県'], dtype='str'), addresses)
+        self.assertEqual(result.tolist(), addresses.tolist())
+
+    def test_matches_scalar(self):
+        """列版の正規化が1件ずつの関数と同じ結果になるテスト"""
+        addresses = pd.Series([
+            '東京都新宿区西新宿２丁目８番１号',
+            '静岡県静岡市葵区追手町九番地の五十',
+            '三重県津市広明町 13　ビル',
+            '北海道札幌市中央区北十条西十一丁目２十三番地百五号',
+            '東京都港区麻布十番一丁目',
+            '東京都港区麻布十番２－３－４',
+            ''
+        ])
+        numbers = normalize_address_numbers_series(addresses)
+        self.assertEqual(numbers.tolist(), [normalize_address_numbers(a) for a in addresses])
+        self.assertEqual(
+            strip_whitespace_series(numbers).tolist(),
+            [''.join(a.split()) for a in numbers]
+        )
+
+    def test_prefecture_series(self):
+        """列版の都道府県名の抽出が extract_prefecture と同じ結果になるテスト"""
+        addresses = pd.Series(['東京都新宿区1', '神奈川県横浜市2', '場所不明', '京都府京都市', '', None])
+        self.assertEqual(
+            prefecture_series(addresses).tolist(),
+            [extract_prefecture(a)[0] for a in addresses[:5]] + ['']
+        )
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
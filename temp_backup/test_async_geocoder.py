@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from async_geocoder import TokenBucket, geocode_concurrently
+from geocode_cache import NEGATIVE_TIMEOUT
+from gsi_geocoder import GsiGeocoder
+from mock_gsi_server import MockGsiServer
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """住所検索APIの代わりに、検索した住所をそのまま返すサーバー"""
+    delay = 0.1
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)['q'][0]
+        time.sleep(30 if '遅延' in query else self.delay)
+        body = [] if '不明' in query else [{
+            'geometry': {'coordinates': [139.0, 35.0 + len(query) / 100]},
+            'properties': {'title': query}
+        }]
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestAsyncGeocoder(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}/AddressSearch'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.geocoder = GsiGeocoder(
+            os.path.join(self.temp_dir.name, 'geocoding_cache.sqlite'), base_url=self.base_url, max_retries=0
+        )
+
+    def tearDown(self):
+        self.geocoder.close()
+        self.temp_dir.cleanup()
+
+    def test_order_and_concurrency(self):
+        """並行して取得した結果が入力と同じ順序で返るテスト"""
+        addresses = [(f'東京都新宿区西新宿{number}丁目', None, None) for number in range(1, 9)]
+        addresses.append(('場所不明', None, None))
+
+        start = time.monotonic()
+        results = geocode_concurrently(self.geocoder, addresses, concurrency=8, rate=100)
+        elapsed = time.monotonic() - start
+
+        # 1件0.1秒のリクエストを並行して処理する
+        self.assertLess(elapsed, 0.1 * len(addresses))
+        self.assertEqual(
+            [result['matched_address'] for result, _ in results[:-1]],
+            [address for address, _, _ in addresses[:-1]]
+        )
+        self.assertEqual(results[-1], (None, False))
+
+        # 2回目はキャッシュから返す
+        results = geocode_concurrently(self.geocoder, addresses, concurrency=8, rate=100)
+        self.assertTrue(all(is_cached for _, is_cached in results))
+
+    def test_rate_limit(self):
+        """トークンバケットで1秒あたりのリクエスト数を制限するテスト"""
+        addresses = [(f'東京都新宿区{number}', None, None) for number in range(5)]
+        start = time.monotonic()
+        geocode_concurrently(self.geocoder, addresses, concurrency=5, rate=20)
+        # 5件目のトークンは4/20秒後に貯まる
+        self.assertGreaterEqual(time.monotonic() - start, 4 / 20)
+
+    def test_timeout(self):
+        """タイムアウトした住所をネガティブキャッシュに記録するテスト"""
+        results = geocode_concurrently(
+            self.geocoder, [('遅延する住所', None, None), ('東京都新宿区1', None, None)],
+            rate=100, timeout=0.5
+        )
+        self.assertEqual(results[0], (None, False))
+        self.assertEqual(results[1][0]['matched_address'], '東京都新宿区1')
+        self.assertEqual(self.geocoder.cache.get('遅延する住所')['reason'], NEGATIVE_TIMEOUT)
+
+    def test_timeout_results_match_cache(self):
+        """応答時間がタイムアウト前後の場合も、返した結果とキャッシュが一致するテスト"""
+        addresses = [(f'東京都新宿区西新宿{number}丁目', None, None) for number in range(1, 9)]
+        with MockGsiServer(latency='uniform:0.1,0.5', seed=1) as server:
+            geocoder = GsiGeocoder(
+                os.path.join(self.temp_dir.name, 'latency_cache.sqlite'), base_url=server.url, max_retries=1
+            )
+            try:
+                results = geocode_concurrently(geocoder, addresses, concurrency=4, rate=100, timeout=0.3)
+                # 再試行中のスレッドが後からキャッシュに書き込まないこと
+                time.sleep(1.0)
+                outcomes = set()
+                for (address, _, _), (result, _) in zip(addresses, results):
+                    cached = geocoder.cache.get(geocoder._make_cache_key(address))
+                    if result is None:
+                        self.assertEqual(cached['reason'], NEGATIVE_TIMEOUT)
+                    else:
+                        self.assertNotIn('negative', cached)
+                        self.assertEqual(cached['latitude'], result['latitude'])
+                    outcomes.add(result is None)
+                # タイムアウトした住所としなかった住所の両方がある
+                self.assertEqual(outcomes, {True, False})
+            finally:
+                geocoder.close()
+
+    def test_token_bucket_capacity(self):
+        """バケットの容量までは待たずに取得できるテスト"""
+        async def acquire_all():
+            bucket = TokenBucket(rate=1, capacity=3)
+            start = time.monotonic()
+            for _ in range(3):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        self.assertLess(asyncio.run(acquire_all()), 0.5)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+from benchmark import compare_reports, generate_corpus, load_baseline, run_benchmarks, save_baseline
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus(self):
+        """同じシードで同じ住所の組を作成するテスト"""
+        corpus = generate_corpus(100, seed=1)
+        self.assertEqual(len(corpus), 100)
+        self.assertEqual(corpus, generate_corpus(100, seed=1))
+
+    def test_baseline_and_compare(self):
+        """ベースラインを保存し、劣化した項目だけを検出するテスト"""
+        report = run_benchmarks(sizes=[50], functions=['extract_prefecture'], verbose=False)
+        result = report['results']['extract_prefecture@50']
+        self.assertGreater(result['ops_per_sec'], 0)
+        self.assertGreater(result['alloc_bytes_per_op'], 0)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            baseline_file = os.path.join(temp_dir, 'baseline.json')
+            save_baseline(report, baseline_file)
+            baseline = load_baseline(baseline_file)
+        self.assertEqual(compare_reports(baseline, report), [])
+
+        slower = {'results': {'extract_prefecture@50': dict(result, ops_per_sec=result['ops_per_sec'] * 0.5)}}
+        regressions = compare_reports(baseline, slower, threshold=0.1)
+        self.assertEqual([regression['metric'] for regression in regressions], ['ops_per_sec'])
+        self.assertAlmostEqual(regressions[0]['change'], -0.5)
+
+    def test_unknown_function(self):
+        with self.assertRaises(ValueError):
+            run_benchmarks(sizes=[10], functions=['normalize'], verbose=False)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,170 @@
+import json
+import os
+import stat
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+import pandas as pd
+from address_series import normalize_city_names_as_of
+from address_utils import normalize_city_name_with_history
+from city_index import open_city_index, source_digest
+from city_mapping import CityResolver, compile_city_mapping
+
+class TestCityResolver(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.resolver = CityResolver.from_file('市区町村マッピング.json')
+
+    def test_chain_resolution(self):
+        """複数段の合併を一度で解決するテスト"""
+        mapping = {
+            '甲県A町': [{'new_city': '甲県B市', 'merge_date': '平成15年4月1日'}],
+            '甲県B市': [{'new_city': '甲県C市', 'merge_date': '平成20年1月1日'}],
+            '甲県C市': [{'new_city': '甲県C市', 'merge_date': '平成22年1月1日'}]
+        }
+        table = compile_city_mapping(mapping)
+
+        resolution = table['甲県A町']
+        self.assertEqual(resolution.final_city, '甲県C市')
+        self.assertEqual(resolution.merge_date, '平成20年1月1日')
+        self.assertEqual(resolution.chain, (
+            ('甲県B市', '平成15年4月1日'),
+            ('甲県C市', '平成20年1月1日')
+        ))
+        # 合併先の自分自身へのマッピングの日付は使わない
+        self.assertEqual(table['甲県B市'].merge_date, '平成20年1月1日')
+        self.assertEqual(table['甲県C市'].chain, (('甲県C市', '平成22年1月1日'),))
+        self.assertFalse(resolution.is_cycle)
+
+    def test_cycle_detection(self):
+        """循環しているマッピングの検出テスト"""
+        mapping = {
+            '甲県A町': [{'new_city': '甲県B町', 'merge_date': '平成15年4月1日'}],
+            '甲県B町': [{'new_city': '甲県A町', 'merge_date': '平成16年4月1日'}]
+        }
+        table = compile_city_mapping(mapping)
+
+        self.assertTrue(table['甲県A町'].is_cycle)
+        self.assertEqual(table['甲県A町'].final_city, '甲県B町')
+        self.assertEqual(table['甲県B町'].final_city, '甲県A町')
+
+    def test_self_mapping(self):
+        """自分自身へのマッピングのテスト"""
+        resolution = self.resolver.resolve('長崎県諫早市')
+        self.assertEqual(resolution.final_city, '長崎県諫早市')
+        self.assertFalse(resolution.is_cycle)
+        self.assertEqual(self.resolver.cycles, [])
+
+    def test_multiple_merges(self):
+        """複数回合併した市は最新の合併日を使用する"""
+        resolution = self.resolver.resolve('愛知県豊川市')
+        self.assertEqual(resolution.final_city, '愛知県豊川市')
+        self.assertEqual(resolution.merge_date, '平成22年2月1日')
+
+        # 同日の変更はリストの後ろを優先
+        resolution = self.resolver.resolve('山梨県西八代郡上九一色村')
+        self.assertEqual(resolution.final_city, '山梨県甲府市')
+
+    def test_as_of_intervals(self):
+        """指定日時点の名称を区間リストから求めるテスト"""
+        resolver = CityResolver({
+            '甲県A町': [{'new_city': '甲県B市', 'merge_date': '平成15年4月1日'}],
+            '甲県B市': [{'new_city': '甲県C市', 'merge_date': '平成20年1月1日'}]
+        })
+        self.assertEqual(resolver.city_as_of('甲県A町', date(2003, 3, 31).toordinal()), '甲県A町')
+        self.assertEqual(resolver.city_as_of('甲県A町', date(2003, 4, 1).toordinal()), '甲県B市')
+        self.assertEqual(resolver.city_as_of('甲県A町', date(2008, 1, 1).toordinal()), '甲県C市')
+        self.assertEqual(resolver.city_as_of('甲県A町', None), '甲県C市')
+
+    def test_bulk_as_of(self):
+        """行ごとの基準日による一括正規化が1件ずつの結果と一致するテスト"""
+        addresses = pd.Series([
+            '長崎県西彼杵郡多良見町 下郡1234',
+            '長崎県西彼杵郡多良見町 下郡1234',
+            '長崎県西彼杵郡多良見町 下郡1234',
+            '東京都新宿区 西新宿1234',
+            None
+        ])
+        dates = pd.Series(['2004-12-31', '2005-03-01', None, '2000-01-01', '2000-01-01'])
+        result = normalize_city_names_as_of(addresses, dates)
+
+        self.assertEqual(result[0], '長崎県西彼杵郡多良見町 下郡1234')
+        self.assertEqual(result[1], '長崎県諫早市 下郡1234')
+        self.assertEqual(result[2], '長崎県諫早市 下郡1234')
+        self.assertEqual(result[3], '東京都新宿区 西新宿1234')
+        self.assertTrue(pd.isna(result[4]))
+        for position in range(4):
+            self.assertEqual(
+                result[position],
+                normalize_city_name_with_history(addresses[position], dates[position])
+            )
+
+class TestCityIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source_file = os.path.join(self.temp_dir.name, 'mapping.json')
+        self.write_mapping({'甲県A町': [{'new_city': '甲県B市', 'merge_date': '平成15年4月1日'}]})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_mapping(self, mapping):
+        with open(self.source_file, 'w', encoding='utf-8') as f:
+            json.dump({'mapping': mapping}, f, ensure_ascii=False)
+
+    def test_reopen_without_hashing(self):
+        """元ファイルのサイズと更新日時が同じ場合はハッシュを計算せずに開くテスト"""
+        index = open_city_index(self.source_file)
+        self.assertEqual(index.final_city('甲県A町'), '甲県B市')
+        with mock.patch('city_index.source_digest') as digest:
+            open_city_index(self.source_file)
+        digest.assert_not_called()
+
+        # 内容が変わった場合は再構築する
+        self.write_mapping({'甲県A町': [{'new_city': '甲県CC市', 'merge_date': '平成15年4月1日'}]})
+        self.assertEqual(open_city_index(self.source_file).final_city('甲県A町'), '甲県CC市')
+
+    def test_refresh_modified_time(self):
+        """内容が同じで更新日時だけが変わった場合は、一度だけハッシュを計算してヘッダーを書き直すテスト"""
+        open_city_index(self.source_file)
+        stat = os.stat(self.source_file)
+        os.utime(self.source_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        with mock.patch('city_index.source_digest', wraps=source_digest) as digest, \
+                mock.patch('city_index.build_city_index') as build:
+            self.assertEqual(open_city_index(self.source_file).final_city('甲県A町'), '甲県B市')
+            open_city_index(self.source_file)
+        self.assertEqual(digest.call_count, 1)
+        build.assert_not_called()
+
+    def test_fallback_index_reused(self):
+        """書き込めずに一時ディレクトリに作成したインデックスを、次回は再構築せずに使うテスト"""
+        index_file = os.path.join(self.temp_dir.name, 'missing', 'mapping.idx')
+        fallback_dir = os.path.join(self.temp_dir.name, 'tmp')
+        os.makedirs(fallback_dir)
+        with mock.patch('city_index.tempfile.gettempdir', return_value=fallback_dir), \
+                mock.patch('sys.stdout'):
+            index = open_city_index(self.source_file, index_file)
+            self.assertEqual(index.index_file, os.path.join(fallback_dir, 'mapping.idx'))
+            with mock.patch('city_index.build_city_index') as build:
+                self.assertEqual(open_city_index(self.source_file, index_file).index_file, index.index_file)
+            build.assert_not_called()
+
+    def test_index_file_mode(self):
+        """インデックスファイルが一時ファイルのパーミッション（0600）のままにならないテスト"""
+        umask = os.umask(0o022)
+        try:
+            index = open_city_index(self.source_file)
+        finally:
+            os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(index.index_file).st_mode), 0o644)
+
+    def test_cached_misses(self):
+        """マッピングにない名称を解決するテスト"""
+        index = open_city_index(self.source_file)
+        self.assertIsNone(index.resolve('甲県D村'))
+        self.assertNotIn('甲県D村', index)
+        self.assertIn('甲県A町', index)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
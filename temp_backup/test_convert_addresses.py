@@ -0,0 +1,211 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+import convert_addresses
+from convert_addresses import (
+    INPUT_FILE,
+    MANIFEST_FILE,
+    ProgressTracker,
+    RunManifest,
+    _init_worker,
+    main,
+    process_batch,
+    stream_addresses
+)
+from gsi_geocoder import DEFAULT_CACHE_FILE, GSI_API_URL_ENV, LEGACY_CACHE_FILE, GsiGeocoder
+from mock_gsi_server import MockGsiServer
+
+class TestStreamAddresses(unittest.TestCase):
+    def test_stream_matches_batch(self):
+        """チャンクごとに追記した結果が、一度に処理した結果と同じになるテスト"""
+        df = pd.DataFrame({
+            'SAKAYA_DEALER_CODE': [f'S{number}' for number in range(7)],
+            'SAKAYA_DEALER_NAME': [f'店{number}' for number in range(7)],
+            'PREFECTURE': ['東京都', '東京都', '不明', '大阪府', '東京都', None, '大阪府'],
+            'ADDRESS': ['新宿区西新宿2-8-1', '新宿区西新宿２－８－１', '場所不明', '北区梅田1-1-1',
+                        '新宿区西新宿2-8-1', '大阪府北区梅田1-1-1', None]
+        })
+        with tempfile.TemporaryDirectory() as temp_dir, MockGsiServer() as server:
+            input_file = os.path.join(temp_dir, 'input.csv')
+            output_file = os.path.join(temp_dir, 'output.csv')
+            df.to_csv(input_file, index=False, encoding='utf-8')
+
+            with GsiGeocoder(os.path.join(temp_dir, 'cache.sqlite'), base_url=server.url) as geocoder:
+                total_count, low_similarity_count = stream_addresses(input_file, output_file, geocoder, 3)
+                expected, _ = process_batch(pd.read_csv(input_file, encoding='utf-8'), 1, None,
+                                            ProgressTracker(len(df)), geocoder, output_format=None)
+            streamed = pd.read_csv(output_file, encoding='utf-8')
+
+        self.assertEqual(total_count, 7)
+        self.assertEqual(low_similarity_count, int((expected['similarity'] < 0.2).sum()))
+        # 一度CSVに書き出した形で比較する
+        pd.testing.assert_frame_equal(streamed, pd.read_csv(io.StringIO(expected.to_csv(index=False))))
+
+class TestResume(unittest.TestCase):
+    """中断した実行を --resume で続きから再開するテスト"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = MockGsiServer().start()
+        self.env = mock.patch.dict(os.environ, {GSI_API_URL_ENV: self.server.url})
+        self.env.start()
+        os.chdir(self.temp_dir.name)
+        pd.DataFrame({
+            'SAKAYA_DEALER_CODE': [f'S{number}' for number in range(5)],
+            'SAKAYA_DEALER_NAME': [f'店{number}' for number in range(5)],
+            'PREFECTURE': ['東京都'] * 5,
+            'ADDRESS': [f'新宿区西新宿{number}-8-1' for number in range(1, 6)]
+        }).to_csv(INPUT_FILE, index=False, encoding='utf-8')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.env.stop()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def run_interrupted(self, argv, interrupt_at):
+        """interrupt_at 回目のバッチの処理中に Ctrl+C が押された場合の実行"""
+        calls = []
+
+        def interrupting_batch(*args, **kwargs):
+            calls.append(args[1])
+            if len(calls) == interrupt_at:
+                raise KeyboardInterrupt
+            return process_batch(*args, **kwargs)
+
+        with mock.patch('convert_addresses.process_batch', side_effect=interrupting_batch), \
+                self.assertRaises(SystemExit) as raised:
+            main(argv)
+        self.assertEqual(raised.exception.code, 130)
+
+    def resume(self, argv):
+        calls = []
+
+        def recording_batch(*args, **kwargs):
+            calls.append(args[1])
+            return process_batch(*args, **kwargs)
+
+        with mock.patch('convert_addresses.process_batch', side_effect=recording_batch):
+            main(argv + ['--resume'])
+        return calls
+
+    def test_resume_batches(self):
+        """完了したバッチを飛ばし、同じタイムスタンプのファイルに続きを書き出すテスト"""
+        argv = ['--chunk-size', '2']
+        self.run_interrupted(argv, interrupt_at=2)
+        manifest = RunManifest.load(MANIFEST_FILE)
+        self.assertEqual(manifest.data['status'], 'interrupted')
+        self.assertEqual((manifest.data['completed_batches'], manifest.data['rows_done']), ([1], 2))
+        self.assertEqual(len(manifest.data['output_files']), 1)
+        # 途中のバッチのファイルは作られない
+        self.assertEqual(sorted(name for name in os.listdir() if name.startswith('geocoding_results')),
+                         manifest.data['output_files'])
+
+        self.assertEqual(self.resume(argv), [2, 3])
+        manifest = RunManifest.load(MANIFEST_FILE)
+        self.assertEqual(manifest.data['status'], 'completed')
+        self.assertEqual(manifest.data['rows_done'], 5)
+        timestamp = manifest.data['timestamp']
+        self.assertEqual(manifest.data['output_files'],
+                         [f'geocoding_results_{timestamp}_batch_0{number}.csv' for number in (1, 2, 3)])
+
+        # 完了した実行を再開しても何もしない
+        self.assertEqual(self.resume(argv), [])
+
+    def test_resume_stream(self):
+        """途中までの追記を取り除いて続きを追記するテスト"""
+        argv = ['--stream', '--chunk-size', '2']
+        self.run_interrupted(argv, interrupt_at=3)
+        manifest = RunManifest.load(MANIFEST_FILE)
+        self.assertEqual(manifest.data['rows_done'], 4)
+        output_file = f"geocoding_results_{manifest.data['timestamp']}.csv"
+        # 書き出し途中で中断した行
+        with open(output_file, 'a', encoding='utf-8') as f:
+            f.write('S4,店4,東京')
+
+        self.assertEqual(self.resume(argv), [3])
+        result_df = pd.read_csv(output_file, encoding='utf-8')
+        self.assertEqual(list(result_df['SAKAYA_DEALER_CODE']), [f'S{number}' for number in range(5)])
+        self.assertEqual(list(result_df['match_status']), ['matched'] * 5)
+
+    def test_resume_rejects_changed_settings(self):
+        self.run_interrupted(['--chunk-size', '2'], interrupt_at=1)
+        with self.assertRaises(SystemExit) as raised, mock.patch('sys.stderr'):
+            main(['--chunk-size', '3', '--resume'])
+        self.assertEqual(raised.exception.code, 2)
+
+class TestWorkers(unittest.TestCase):
+    """バッチをプロセスプールで並行して処理するテスト"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = MockGsiServer(latency='constant:0.01').start()
+        self.env = mock.patch.dict(os.environ, {GSI_API_URL_ENV: self.server.url})
+        self.env.start()
+        os.chdir(self.temp_dir.name)
+        pd.DataFrame({
+            'SAKAYA_DEALER_CODE': [f'S{number}' for number in range(9)],
+            'SAKAYA_DEALER_NAME': [f'店{number}' for number in range(9)],
+            'PREFECTURE': ['東京都'] * 8 + ['不明'],
+            'ADDRESS': [f'新宿区西新宿{number % 4 + 1}-8-1' for number in range(8)] + ['場所不明']
+        }).to_csv(INPUT_FILE, index=False, encoding='utf-8')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.env.stop()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def run_main(self, argv):
+        """実行して出力ファイルの内容を返す"""
+        with mock.patch('sys.stdout'):
+            main(argv)
+        manifest = RunManifest.load(MANIFEST_FILE)
+        output_files = manifest.data['output_files']
+        frames = [pd.read_csv(output_file, encoding='utf-8') for output_file in output_files]
+        for output_file in output_files:
+            os.remove(output_file)
+        return [os.path.basename(name).split('_', 3)[-1] for name in output_files], frames
+
+    def test_batches_match_sequential(self):
+        """並行処理でも出力ファイル名と内容が順に処理した場合と同じになるテスト"""
+        names, frames = self.run_main(['--chunk-size', '2'])
+        parallel_names, parallel_frames = self.run_main(['--chunk-size', '2', '--workers', '3'])
+        self.assertEqual(parallel_names, names)
+        self.assertEqual(len(names), 5)
+        for expected, frame in zip(frames, parallel_frames):
+            pd.testing.assert_frame_equal(frame, expected)
+
+    def test_stream_keeps_order(self):
+        """並行処理でもチャンクを入力の順に追記するテスト"""
+        _, (streamed,) = self.run_main(['--stream', '--chunk-size', '2', '--workers', '2'])
+        self.assertEqual(list(streamed['SAKAYA_DEALER_CODE']), [f'S{number}' for number in range(9)])
+        self.assertEqual(list(streamed['match_status']), ['matched'] * 8 + ['unmatched'])
+        manifest = RunManifest.load(MANIFEST_FILE)
+        self.assertEqual(manifest.data['completed_batches'], [1, 2, 3, 4, 5])
+
+    def test_legacy_cache_imported_once(self):
+        """以前のJSONキャッシュは親プロセスで取り込み、ワーカーは取り込まずに終了時にキャッシュを閉じるテスト"""
+        with open(LEGACY_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'東京都千代田区1': {'latitude': 35.6, 'longitude': 139.7}}, f, ensure_ascii=False)
+
+        with mock.patch('convert_addresses.signal.signal'), \
+                mock.patch('convert_addresses.multiprocessing.util.Finalize') as finalize:
+            _init_worker(None, 2)
+        geocoder = convert_addresses._worker_geocoder
+        self.assertEqual(len(geocoder.cache), 0)
+        finalize.assert_called_once_with(geocoder, geocoder.close, exitpriority=10)
+        geocoder.close()
+
+        self.run_main(['--chunk-size', '2', '--workers', '2'])
+        with GsiGeocoder(DEFAULT_CACHE_FILE, import_legacy=False) as geocoder:
+            self.assertEqual(geocoder.cache.get('東京都千代田区1')['latitude'], 35.6)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
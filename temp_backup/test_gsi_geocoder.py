@@ -0,0 +1,233 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import numpy as np
+import pandas as pd
+import requests
+from geocode_cache import (
+    CACHE_VERSION,
+    NEGATIVE_NO_RESULTS,
+    NEGATIVE_TIMEOUT,
+    SqliteGeocodeCache,
+    TieredGeocodeCache,
+    import_json_cache
+)
+from gsi_geocoder import GsiGeocoder, process_dataframe
+
+def fake_geocode(self, address, store_code=None, store_name=None):
+    """APIを呼ばずに住所をそのまま返すジオコーディング"""
+    if '不明' in address:
+        return None, True
+    return {
+        'normalized_address': ''.join(address.split()),
+        'matched_address': address,
+        'latitude': 35.0,
+        'longitude': 139.0,
+        'similarity': 1.0,
+        'chome_match': True,
+        'banchi_match': False,
+        'go_match': False,
+        'store_code': store_code,
+        'store_name': store_name
+    }, True
+
+class TestGeocodingCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.temp_dir.name, 'geocoding_cache.json')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_legacy_cache(self):
+        """旧形式のキャッシュファイルを作成"""
+        result = {'latitude': 35.0, 'longitude': 139.0, 'normalized_address': '東京都新宿区西新宿2丁目'}
+        legacy = {
+            '東京都新宿区西新宿2丁目||001||店舗A': dict(result, store_code='001', store_name='店舗A'),
+            '東京都新宿区 西新宿2丁目||002||店舗B': dict(result, store_code='002', store_name='店舗B'),
+            '東京都新宿区西新宿2丁目': dict(result, store_code=None, store_name=None)
+        }
+        with open(self.cache_file, 'w', encoding='utf-8') as f:
+            json.dump(legacy, f, ensure_ascii=False)
+
+    def test_migrate_legacy_cache(self):
+        """旧形式のキャッシュを住所の正規形をキーとした形式に移行するテスト"""
+        self.write_legacy_cache()
+
+        geocoder = GsiGeocoder(self.cache_file)
+        self.assertEqual(list(geocoder.cache), ['東京都新宿区西新宿2丁目'])
+        self.assertEqual(len(list(geocoder.cache.stores())), 2)
+        self.assertTrue(os.path.exists(self.cache_file + '.bak'))
+        with open(self.cache_file, 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['version'], CACHE_VERSION)
+
+        # 店舗が違っても同じ住所ならキャッシュを使う
+        cached, is_cached = geocoder.geocode('東京都新宿区西新宿２丁目', '003', '店舗C')
+        self.assertTrue(is_cached)
+        self.assertEqual(cached['latitude'], 35.0)
+        self.assertEqual(cached['store_code'], '003')
+        self.assertIsNotNone(geocoder.cache.get_store('003||店舗C'))
+
+    def test_sqlite_cache(self):
+        """旧形式のJSONをSQLiteに取り込み、まとめて書き込むテスト"""
+        self.write_legacy_cache()
+        db_file = os.path.join(self.temp_dir.name, 'geocoding_cache.sqlite')
+
+        with SqliteGeocodeCache(db_file, batch_size=2) as cache:
+            self.assertEqual(import_json_cache(self.cache_file, cache), 1)
+            cache.set('東京都千代田区1', {'latitude': 35.6})
+            # 書き込み前でも同じ接続からは読める
+            self.assertEqual(cache.get('東京都千代田区1'), {'latitude': 35.6})
+
+            # 別の接続からはコミット済みの内容だけが見える
+            reader = SqliteGeocodeCache(db_file)
+            self.assertIsNone(reader.get('東京都千代田区1'))
+            self.assertEqual(reader.get('東京都新宿区西新宿2丁目')['latitude'], 35.0)
+            reader.close()
+
+        with SqliteGeocodeCache(db_file) as cache:
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.get_store('001||店舗A')['address'], '東京都新宿区西新宿2丁目')
+
+    def test_tiered_cache(self):
+        """メモリ上のLRUの追い出しと有効期限のテスト"""
+        db_file = os.path.join(self.temp_dir.name, 'geocoding_cache.sqlite')
+        cache = TieredGeocodeCache(SqliteGeocodeCache(db_file), max_entries=2, ttl=60)
+        for number in range(3):
+            cache.set(f'住所{number}', {'latitude': float(number)})
+
+        # 溢れた結果は保存先から読み込む
+        self.assertEqual(cache.get('住所0')['latitude'], 0.0)
+        self.assertEqual(cache.get('住所2')['latitude'], 2.0)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['backend_hits'], stats['evictions']), (1, 1, 2))
+        self.assertEqual(stats['memory_entries'], 2)
+
+        # 有効期限を過ぎた結果はキャッシュにないものとして扱う
+        cache.set('古い住所', {'latitude': 1.0, 'cached_at': 0})
+        self.assertIsNone(cache.get('古い住所'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+        cache.close()
+
+    def test_tiered_cache_concurrent_counts(self):
+        """複数のスレッドから引いても件数が失われないテスト"""
+        db_file = os.path.join(self.temp_dir.name, 'geocoding_cache.sqlite')
+        cache = TieredGeocodeCache(SqliteGeocodeCache(db_file))
+        cache.set('住所', {'latitude': 35.0})
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: cache.get('住所'), range(4000)))
+        self.assertEqual(cache.stats()['hits'], 4000)
+        cache.close()
+
+    def test_negative_cache(self):
+        """ジオコーディングできなかった住所のキャッシュのテスト"""
+        db_file = os.path.join(self.temp_dir.name, 'geocoding_cache.sqlite')
+        geocoder = GsiGeocoder(db_file, max_retries=0)
+        response = mock.Mock(status_code=200, **{'json.return_value': []})
+        with mock.patch.object(geocoder.session, 'get', return_value=response) as get:
+            self.assertEqual(geocoder.geocode('場所不明'), (None, False))
+            # 2回目はAPIを呼び出さない
+            self.assertEqual(geocoder.geocode('場所不明'), (None, True))
+            self.assertEqual(get.call_count, 1)
+            self.assertEqual(geocoder.cache.get('場所不明')['reason'], NEGATIVE_NO_RESULTS)
+
+            # 再取得を指定した場合はAPIを呼び出す
+            geocoder.retry_negatives = True
+            self.assertEqual(geocoder.geocode('場所不明'), (None, False))
+            self.assertEqual(get.call_count, 2)
+
+        # 一時的な失敗は短い有効期間で期限切れになる
+        with mock.patch.object(geocoder.session, 'get', side_effect=requests.Timeout('timeout')):
+            geocoder.geocode('東京都千代田区1')
+        entry = geocoder.cache.get('東京都千代田区1')
+        self.assertEqual(entry['reason'], NEGATIVE_TIMEOUT)
+        geocoder.cache.set('東京都千代田区1', dict(entry, cached_at=entry['cached_at'] - 2 * 60 * 60))
+        self.assertIsNone(geocoder.cache.get('東京都千代田区1'))
+        geocoder.close()
+
+    def test_injected_cache_expires_transient_negatives(self):
+        """指定したキャッシュでも一時的な失敗は有効期間が過ぎると再取得するテスト"""
+        db_file = os.path.join(self.temp_dir.name, 'geocoding_cache.sqlite')
+        backend = SqliteGeocodeCache(db_file)
+        geocoder = GsiGeocoder(cache=backend, max_retries=0, transient_ttl=60)
+        self.assertIsInstance(geocoder.cache, TieredGeocodeCache)
+
+        with mock.patch.object(geocoder.session, 'get', side_effect=requests.Timeout('timeout')):
+            geocoder.geocode('東京都千代田区1')
+        entry = backend.get('東京都千代田区1')
+        self.assertEqual(entry['reason'], NEGATIVE_TIMEOUT)
+        backend.set('東京都千代田区1', dict(entry, cached_at=entry['cached_at'] - 120))
+        geocoder.cache.clear_memory()
+        self.assertIsNone(geocoder.lookup_cache('東京都千代田区1'))
+
+        # TieredGeocodeCache はそのまま使う
+        geocoder.close()
+        tiered = TieredGeocodeCache(SqliteGeocodeCache(db_file))
+        with GsiGeocoder(cache=tiered) as geocoder:
+            self.assertIs(geocoder.cache, tiered)
+
+class TestProcessDataframe(unittest.TestCase):
+    def setUp(self):
+        # キャッシュファイルは一時ディレクトリに作成する
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def test_dedup(self):
+        """同じ住所を1回だけジオコーディングして各行に結合するテスト"""
+        df = pd.DataFrame({
+            'address': ['東京都新宿区西新宿２丁目', '東京都新宿区 西新宿2丁目', None, '場所不明', '場所不明'],
+            'store_code': [1, 2, 3, 4, 5],
+            'store_name': ['a', 'b', 'c', 'd', 'e']
+        })
+        callbacks = []
+        with mock.patch.object(GsiGeocoder, 'geocode', autospec=True, side_effect=fake_geocode) as geocode:
+            result = process_dataframe(
+                df, progress_callback=lambda name, address, result: callbacks.append(result.get('store_code'))
+            )
+
+        self.assertEqual(geocode.call_count, 2)
+        self.assertEqual(
+            result['match_status'].tolist(),
+            ['matched', 'matched', 'missing_address', 'unmatched', 'unmatched']
+        )
+        self.assertEqual(result['latitude'][1], 35.0)
+        self.assertEqual(result['normalized_address'][3], '場所不明')
+        self.assertEqual(result.attrs['dedup']['unique_addresses'], 2)
+        # 結果の列は型付きで持つ
+        self.assertIsInstance(result['match_status'].dtype, pd.CategoricalDtype)
+        self.assertEqual(result['latitude'].dtype, np.float64)
+        self.assertEqual(result['chome_match'].dtype, bool)
+        self.assertEqual(result['chome_match'].tolist(), [True, True, False, False, False])
+        # 進捗コールバックは行ごとに呼ばれる
+        self.assertEqual(callbacks, [1, 2, None, None])
+
+    def test_stores_recorded_in_one_batch(self):
+        """2行目以降の店舗情報を1回の書き込みでまとめて記録するテスト"""
+        df = pd.DataFrame({
+            'address': ['東京都新宿区西新宿２丁目', '東京都新宿区 西新宿2丁目', '東京都新宿区西新宿2丁目', '場所不明'],
+            'store_code': [1, 2, 3, 4],
+            'store_name': ['a', 'b', 'c', 'd']
+        })
+        geocoder = GsiGeocoder(cache=SqliteGeocodeCache('geocoding_cache.sqlite'))
+        with mock.patch.object(GsiGeocoder, 'geocode', autospec=True, side_effect=fake_geocode), \
+                mock.patch.object(geocoder.cache, 'get_store', wraps=geocoder.cache.get_store) as get_store, \
+                mock.patch.object(geocoder.cache, 'set_stores', wraps=geocoder.cache.set_stores) as set_stores:
+            process_dataframe(df, geocoder=geocoder)
+
+        # 最初の行はジオコーディング時に記録済みのため含めず、行ごとの読み込みもしない
+        self.assertEqual(get_store.call_count, 0)
+        set_stores.assert_called_once()
+        self.assertEqual(sorted(set_stores.call_args.args[0]), ['2||b', '3||c'])
+        self.assertEqual(dict(geocoder.cache.stores())['3||c']['address'], '東京都新宿区西新宿2丁目')
+        geocoder.close()
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
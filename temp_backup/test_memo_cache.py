@@ -0,0 +1,59 @@
+import unittest
+from address_utils import normalize_address_numbers, tokenize_address
+from city_mapping import MAPPING_FILE
+from memo_cache import MISSING, MemoCache, clear_memo_caches, memo_stats, memoize
+from normalize_address import AddressNormalizer
+
+class TestMemoCache(unittest.TestCase):
+    def test_lru(self):
+        """上限を超えた場合に最近使っていない結果から追い出すテスト"""
+        cache = MemoCache('test_lru', max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 1, 'evictions': 1, 'hit_ratio': 2 / 3, 'entries': 2})
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()['hits'], 0)
+
+    def test_memoize(self):
+        """同じ引数の呼び出しは元の関数を呼び出さないテスト"""
+        calls = []
+
+        @memoize(max_entries=10, name='test_memoize')
+        def join(a, b='-'):
+            calls.append((a, b))
+            return a + b
+
+        self.assertEqual([join('x'), join('x'), join('x', b='+'), join('x', b='+')], ['x-', 'x-', 'x+', 'x+'])
+        self.assertEqual(calls, [('x', '-'), ('x', '+')])
+        self.assertEqual(memo_stats()['test_memoize']['hits'], 2)
+        clear_memo_caches()
+        join('x')
+        self.assertEqual(len(calls), 3)
+
+    def test_normalization_functions(self):
+        """正規化・分割関数のメモ化が結果を変えないテスト"""
+        clear_memo_caches()
+        for _ in range(2):
+            self.assertEqual(normalize_address_numbers('新宿区西新宿二丁目８番１号'), '新宿区西新宿2丁目8番1号')
+            self.assertEqual(tokenize_address('東京都新宿区西新宿2丁目8番1号').banchi, '8')
+        stats = memo_stats()
+        self.assertGreaterEqual(stats['normalize_address_numbers']['hits'], 1)
+        self.assertEqual(stats['tokenize_address']['hits'], 1)
+
+    def test_address_normalizer(self):
+        """AddressNormalizer が同じ住所の結果を再利用し、変更のリストは複製して返すテスト"""
+        normalizer = AddressNormalizer(MAPPING_FILE)
+        first = normalizer.normalize('長崎県西彼杵郡多良見町下郡1234')
+        first[1].clear()
+        second = normalizer.normalize('長崎県西彼杵郡多良見町下郡1234')
+        self.assertEqual(second[0], first[0])
+        self.assertTrue(second[1])
+        self.assertEqual(normalizer.memo.stats()['hits'], 1)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
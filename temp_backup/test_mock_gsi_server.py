@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from gsi_geocoder import GSI_API_URL_ENV, GsiGeocoder
+from load_test import generate_addresses, run_load_test
+from mock_gsi_server import MockGsiServer, parse_latency
+
+class TestMockGsiServer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_fixtures_and_unmatched(self):
+        """フィクスチャの座標を返し、都道府県名のない住所は空の結果を返すテスト"""
+        fixtures = {'東京都新宿区西新宿2丁目8番1号': (35.689, 139.692)}
+        with MockGsiServer(fixtures=fixtures) as server, \
+                GsiGeocoder(os.path.join(self.temp_dir.name, 'cache.sqlite'), base_url=server.url) as geocoder:
+            result, _ = geocoder.geocode('東京都新宿区西新宿2丁目8番1号')
+            self.assertEqual((result['latitude'], result['longitude']), (35.689, 139.692))
+            self.assertIsNone(geocoder.geocode('場所不明')[0])
+            self.assertEqual(server.snapshot(), {'requests': 2, 'status': {200: 2}})
+
+    def test_error_injection(self):
+        """429・500を返す割合を指定できるテスト"""
+        server = MockGsiServer(throttle_rate=0.5, error_rate=0.5, seed=0)
+        statuses = {server.respond('東京都新宿区')[0] for _ in range(50)}
+        server.stop()
+        self.assertEqual(statuses, {429, 500})
+
+        server = MockGsiServer(rate_limit=3)
+        statuses = [server.respond('東京都新宿区')[0] for _ in range(5)]
+        server.stop()
+        self.assertEqual(statuses, [200, 200, 200, 429, 429])
+
+    def test_base_url_from_environment(self):
+        """環境変数で住所検索APIのURLを差し替えるテスト"""
+        with mock.patch.dict(os.environ, {GSI_API_URL_ENV: 'http://127.0.0.1:1/AddressSearch'}):
+            with GsiGeocoder(os.path.join(self.temp_dir.name, 'cache.sqlite')) as geocoder:
+                self.assertEqual(geocoder.base_url, 'http://127.0.0.1:1/AddressSearch')
+
+    def test_parse_latency(self):
+        """応答時間の分布の指定を解釈するテスト"""
+        self.assertEqual(parse_latency('constant:0.2')(None), 0.2)
+        with self.assertRaises(ValueError):
+            parse_latency('normal:1')
+
+    def test_latency_sample_is_bounded(self):
+        """処理時間の記録が上限の件数を超えて増えないテスト"""
+        server = MockGsiServer(latency_samples=100, seed=1)
+        try:
+            for number in range(1000):
+                server.record_latency(number / 1000)
+            sample = server.latency_sample()
+            self.assertEqual(len(sample), 100)
+            self.assertEqual(server.stats['latency_count'], 1000)
+            # 後半に記録した処理時間も標本に含まれる
+            self.assertTrue(any(value >= 0.5 for value in sample))
+        finally:
+            server.stop()
+
+    def test_load_test(self):
+        """負荷試験で重複した住所は1回だけAPIを呼び出すテスト"""
+        df = generate_addresses(40, unique_ratio=0.5)
+        self.assertEqual(len(df), 40)
+        report = run_load_test(rows=40, unique_ratio=0.5, use_async=True, rate_limit=100)
+        self.assertEqual(report['api_calls'], 20)
+        self.assertAlmostEqual(report['api_calls_per_row'], 0.5)
+        self.assertEqual(report['latency_source'], 'client')
+        self.assertLess(report['memory']['bytes'], report['memory']['object_bytes'])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
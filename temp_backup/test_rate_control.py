@@ -0,0 +1,107 @@
+import os
+import socket
+import tempfile
+import unittest
+from unittest import mock
+from gsi_geocoder import GsiGeocoder
+from rate_control import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    FAILURE_THROTTLED,
+    AdaptiveRateController,
+    CircuitBreaker,
+    partitioned_rate_controller,
+    retry_delay
+)
+
+class TestAdaptiveRateController(unittest.TestCase):
+    def test_aimd(self):
+        """成功で少しずつ上げ、失敗で半分に下げるテスト"""
+        controller = AdaptiveRateController(initial_rate=2.0, cooldown=0)
+        for _ in range(4):
+            controller.record_success(0.1)
+        self.assertGreater(controller.rate, 2.0)
+
+        rate = controller.rate
+        controller.record_failure(FAILURE_THROTTLED, 0.1)
+        self.assertAlmostEqual(controller.rate, rate / 2)
+
+        # 応答が遅い場合も下げる
+        rate = controller.rate
+        controller.record_success(5.0)
+        self.assertAlmostEqual(controller.rate, rate / 2)
+
+        metrics = controller.metrics()
+        self.assertEqual((metrics['requests'], metrics['throttled'], metrics['slow_responses']), (6, 1, 1))
+
+    def test_circuit_breaker(self):
+        """失敗が続くとブレーカーが開き、一定時間後に1件だけ試すテスト"""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CIRCUIT_CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CIRCUIT_OPEN)
+
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CIRCUIT_HALF_OPEN)
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CIRCUIT_CLOSED)
+        self.assertEqual(breaker.trips, 1)
+
+    def test_partitioned_rate_controller(self):
+        """プロセス数で割ったリクエスト数の合計が1プロセスの場合と同じになるテスト"""
+        controller = partitioned_rate_controller(4, initial_rate=2.0, max_rate=20.0)
+        self.assertAlmostEqual(controller.rate * 4, 2.0)
+        self.assertAlmostEqual(controller.max_rate * 4, 20.0)
+
+    def test_retry_delay(self):
+        """再試行の待ち時間が上限と Retry-After を守るテスト"""
+        for attempt in range(10):
+            self.assertLessEqual(retry_delay(attempt, base=0.5, cap=4.0), 4.0)
+        self.assertGreaterEqual(retry_delay(0, retry_after=2.0), 2.0)
+
+    def test_geocoder_retry(self):
+        """429の後に再試行して成功するテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            geocoder = GsiGeocoder(os.path.join(temp_dir, 'geocoding_cache.sqlite'))
+            throttled = mock.Mock(status_code=429, headers={'Retry-After': '0'})
+            ok = mock.Mock(status_code=200, **{'json.return_value': [{
+                'geometry': {'coordinates': [139.0, 35.0]},
+                'properties': {'title': '東京都新宿区西新宿二丁目'}
+            }]})
+            with mock.patch.object(geocoder.session, 'get', side_effect=[throttled, ok]), \
+                    mock.patch('gsi_geocoder.time.sleep'):
+                result, is_cached = geocoder.geocode('東京都新宿区西新宿2丁目')
+            geocoder.close()
+
+        self.assertEqual(result['latitude'], 35.0)
+        metrics = geocoder.rate_controller.metrics()
+        self.assertEqual((metrics['retries'], metrics['throttled'], metrics['successes']), (1, 1, 1))
+
+    def test_connection_error_opens_breaker(self):
+        """接続できない場合も失敗として記録して再試行し、続くとブレーカーが開くテスト"""
+        # 閉じたポート
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        controller = AdaptiveRateController(breaker=CircuitBreaker(failure_threshold=4, reset_timeout=60))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            geocoder = GsiGeocoder(
+                os.path.join(temp_dir, 'geocoding_cache.sqlite'),
+                base_url=f'http://127.0.0.1:{port}/AddressSearch', rate_controller=controller, max_retries=1
+            )
+            with mock.patch('gsi_geocoder.time.sleep'):
+                for number in range(3):
+                    geocoder.fetch(f'東京都新宿区西新宿{number}丁目')
+            geocoder.close()
+
+        metrics = controller.metrics()
+        self.assertEqual(metrics['circuit_state'], CIRCUIT_OPEN)
+        # 1件目・2件目は再試行を含めて2回ずつ、3件目はブレーカーが開いたためリクエストしない
+        self.assertEqual((metrics['connection'], metrics['retries']), (4, 2))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from convert_addresses import INPUT_FILE, MANIFEST_FILE, RunManifest, main
+from gsi_geocoder import GSI_API_URL_ENV
+from mock_gsi_server import MockGsiServer
+from result_dataset import read_results, write_result_batch
+
+def sample_results():
+    return pd.DataFrame({
+        'SAKAYA_DEALER_CODE': ['S1', 2, None],
+        'ADDRESS': ['新宿区1', '場所不明', None],
+        'normalized_address': ['東京都新宿区1', '場所不明', None],
+        'matched_address': ['東京都新宿区1', None, None],
+        'latitude': [35.0, np.nan, np.nan],
+        'longitude': [139.0, np.nan, np.nan],
+        'similarity': [1.0, 0.0, 0.0],
+        'chome_match': [True, False, False],
+        'banchi_match': [False, False, False],
+        'go_match': [False, False, False],
+        'match_status': ['matched', 'unmatched', 'missing_address']
+    })
+
+class TestResultDataset(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dataset_dir = os.path.join(self.temp_dir.name, 'results')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_typed_partitions(self):
+        """型付きで保存し、都道府県・match_status で絞り込んで読み込むテスト"""
+        write_result_batch(sample_results(), self.dataset_dir, 1)
+        write_result_batch(sample_results(), self.dataset_dir, 2)
+        # 同じバッチを書き直した場合は上書きする
+        write_result_batch(sample_results(), self.dataset_dir, 2)
+
+        df = read_results(self.dataset_dir)
+        self.assertEqual(len(df), 6)
+        self.assertEqual(df['latitude'].dtype, np.float64)
+        self.assertEqual(df['chome_match'].dtype, bool)
+        self.assertIsInstance(df['match_status'].dtype, pd.CategoricalDtype)
+        self.assertEqual(set(df['prefecture']), {'東京都', '不明'})
+        # 入力の列は文字列として保存する
+        self.assertEqual(sorted(df['SAKAYA_DEALER_CODE'].dropna()), ['2', '2', 'S1', 'S1'])
+
+        matched = read_results(self.dataset_dir, columns=['latitude', 'longitude'],
+                               prefecture='東京都', match_status=['matched'])
+        self.assertEqual(matched.to_dict('list'), {'latitude': [35.0, 35.0], 'longitude': [139.0, 139.0]})
+
+    def test_rewrite_batch_with_changed_partitions(self):
+        """処理し直したバッチの分割が変わっても前回の行が残らないテスト"""
+        write_result_batch(sample_results(), self.dataset_dir, 1)
+        write_result_batch(sample_results(), self.dataset_dir, 2)
+
+        # 再開時は住所が見つからなくなった（matched → unmatched）
+        rewritten = sample_results().iloc[:1].assign(
+            matched_address=None, latitude=np.nan, longitude=np.nan, match_status='unmatched'
+        )
+        write_result_batch(rewritten, self.dataset_dir, 1)
+
+        df = read_results(self.dataset_dir)
+        self.assertEqual(len(df), 4)
+        tokyo = read_results(self.dataset_dir, columns=['match_status'], prefecture='東京都')
+        self.assertEqual(sorted(tokyo['match_status'].astype(str)), ['matched', 'unmatched'])
+
+    def test_convert_addresses_parquet(self):
+        """convert_addresses の Parquet 出力が CSV 出力と同じ内容になるテスト"""
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        try:
+            pd.DataFrame({
+                'SAKAYA_DEALER_CODE': [f'S{number}' for number in range(5)],
+                'SAKAYA_DEALER_NAME': [f'店{number}' for number in range(5)],
+                'PREFECTURE': ['東京都', '大阪府', '東京都', '不明', '大阪府'],
+                'ADDRESS': ['新宿区1-1-1', '北区梅田1-1', '新宿区1-1-1', '場所不明', None]
+            }).to_csv(INPUT_FILE, index=False, encoding='utf-8')
+            with MockGsiServer() as server, mock.patch.dict(os.environ, {GSI_API_URL_ENV: server.url}), \
+                    mock.patch('sys.stdout'):
+                main(['--chunk-size', '2'])
+                csv_files = RunManifest.load(MANIFEST_FILE).data['output_files']
+                main(['--chunk-size', '2', '--stream', '--format', 'parquet'])
+                dataset_dir = RunManifest.load(MANIFEST_FILE).data['output_files'][0]
+            expected = pd.concat([pd.read_csv(name) for name in csv_files], ignore_index=True)
+            df = read_results(dataset_dir)
+        finally:
+            os.chdir(cwd)
+
+        df = df.sort_values('SAKAYA_DEALER_CODE', ignore_index=True)
+        self.assertEqual(df['match_status'].astype(str).tolist(), expected['match_status'].tolist())
+        self.assertEqual(df['prefecture'].astype(str).tolist(), ['東京都', '大阪府', '東京都', '不明', '不明'])
+        np.testing.assert_array_equal(df['latitude'].to_numpy(), expected['latitude'].to_numpy())
+
+    def test_convert_addresses_rejects_existing_dataset(self):
+        """再開でない実行では、同じ分に作った既存のデータセットに追記しないテスト"""
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        try:
+            os.makedirs('geocoding_results_202601010000')
+            with mock.patch('convert_addresses.datetime') as datetime_mock, \
+                    mock.patch('sys.stderr'), self.assertRaises(SystemExit):
+                datetime_mock.now.return_value.strftime.return_value = '202601010000'
+                main(['--format', 'parquet'])
+            self.assertFalse(os.path.exists(MANIFEST_FILE))
+        finally:
+            os.chdir(cwd)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)